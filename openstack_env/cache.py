@@ -0,0 +1,113 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "openstack-env", "auth.json")
+
+# Entries are dropped this many seconds before the token actually expires, so
+# that a token read from the cache stays valid for the whole run.
+EXPIRY_MARGIN = 300
+
+
+class AuthCache(object):
+    def __init__(self, path=DEFAULT_PATH, expiry_margin=EXPIRY_MARGIN):
+        self._path = path
+        self._expiry_margin = expiry_margin
+
+    @property
+    def path(self):
+        return self._path
+
+    @staticmethod
+    def key(auth_url, user_name, tenant):
+        value = "\n".join((auth_url, user_name, tenant))
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._locked(fcntl and fcntl.LOCK_SH):
+            entry = self._read().get(key)
+
+        if entry and entry["expires"] - self._expiry_margin > time.time():
+            return entry["value"]
+
+    def set(self, key, value, expires):
+        with self._locked(fcntl and fcntl.LOCK_EX):
+            entries = self._read()
+            entries[key] = {"value": value, "expires": expires}
+            self._write(self._prune(entries))
+
+    def invalidate(self, key):
+        with self._locked(fcntl and fcntl.LOCK_EX):
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+    @contextlib.contextmanager
+    def _locked(self, operation):
+        directory = os.path.dirname(self._path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        with open(self._path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self._path) as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        descriptor, path = tempfile.mkstemp(
+            dir=os.path.dirname(self._path), prefix=".auth")
+        try:
+            with os.fdopen(descriptor, "w") as cache_file:
+                json.dump(entries, cache_file)
+            os.chmod(path, 0o600)
+            os.rename(path, self._path)
+        except Exception:
+            os.remove(path)
+            raise
+
+    def _prune(self, entries):
+        now = time.time()
+        return dict(
+            (key, entry) for key, entry in entries.items()
+            if entry["expires"] > now
+        )
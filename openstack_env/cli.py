@@ -20,17 +20,84 @@
 
 import argparse
 import json
+import logging
+import os
 import sys
 
+from openstack_env import cache
+from openstack_env import compaction
 from openstack_env import context
-from openstack_env import main
+from openstack_env import daemon
+from openstack_env import exceptions as e
+from openstack_env import fanout
+from openstack_env import manifests
+from openstack_env import openstack
+from openstack_env import scheduler
+
+
+def _limit(value):
+    service, __, limit = value.partition("=")
+
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+
+    # A pool needs at least one worker.
+    if limit < 1:
+        raise argparse.ArgumentTypeError(
+            "Invalid limit \"%s\", expected SERVICE=COUNT with a positive "
+            "COUNT" % value
+        )
+    return service, limit
+
+
+def _rate(value):
+    service, __, rate = value.partition("=")
+    rate, __, burst = rate.partition(":")
+
+    try:
+        return service, (float(rate), int(burst) if burst else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Invalid rate \"%s\", expected SERVICE=RATE[:BURST]" % value
+        )
+
+
+# Commands and the functions of openstack_env.main which carry them out.
+COMMANDS = {
+    "apply": "upload",
+    "destroy": "destroy",
+}
+
+SERVE = "serve"
+WATCH = "watch"
 
 
 def _build_parser():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("-c", "--credentials", required=True, type=file)
-    parser.add_argument("-r", "--resources", required=True, nargs="+")
+    parser.add_argument("command", nargs="?",
+                        choices=sorted(list(COMMANDS) + [SERVE, WATCH]),
+                        default="apply")
+    parser.add_argument("-c", "--credentials", nargs="+",
+                        type=argparse.FileType("r"))
+    parser.add_argument("-r", "--resources", nargs="+")
+    parser.add_argument("-l", "--limit", action="append", type=_limit,
+                        default=[], dest="limits")
+    parser.add_argument("--auth-cache", default=cache.DEFAULT_PATH)
+    parser.add_argument("--no-auth-cache", action="store_true")
+    parser.add_argument("--pool-size", type=int, default=openstack.POOL_SIZE)
+    parser.add_argument("--parse-processes", type=int)
+    parser.add_argument("--validate", action="store_true")
+    parser.add_argument("--state")
+    parser.add_argument("--refresh", action="store_true")
+    parser.add_argument("--compact-rules", action="store_true")
+    parser.add_argument("--replace", action="store_true")
+    parser.add_argument("--trace")
+    parser.add_argument("--rate", action="append", type=_rate, default=[],
+                        dest="rates")
+    parser.add_argument("--socket", nargs="?", const=daemon.DEFAULT_SOCKET)
 
     return parser
 
@@ -38,23 +105,168 @@ def _build_parser():
 parser = _build_parser()
 
 
-def _read_resources(paths):
-    resources = []
+def _read_credentials(credential_files):
+    clouds = []
+
+    # Every file holds either one set of credentials or a list of them.
+    for credentials_file in credential_files:
+        credentials = json.load(credentials_file)
+        if isinstance(credentials, dict):
+            credentials = [credentials]
+        clouds.extend(credentials)
+
+    return clouds
+
+
+def _validate(resources):
+    for resource in resources:
+        context.get_resource_manager(resource)
+
+    scheduler.build_graph(resources)
+
+
+def _auth_cache(args):
+    if args.no_auth_cache:
+        return None
+    return cache.AuthCache(args.auth_cache)
+
+
+def _serve(args):
+    # Imported up front, the point of the daemon is to pay for it once.
+    from openstack_env import main  # noqa
+
+    try:
+        daemon.serve(args.socket or daemon.DEFAULT_SOCKET,
+                     daemon.Daemon(_auth_cache(args)))
+    except e.OpenStackEnvException as ex:
+        parser.exit(1, "%s\n" % ex.message)
 
-    for path in paths:
-        resource_loader = context.get_resource_loader(path)
-        resources += resource_loader.load(path)
 
-    return resources
+def _request(args, clouds):
+    if args.trace:
+        parser.error("argument --trace is not supported with --socket")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # The daemon runs elsewhere, so every path is made absolute.
+    message = {
+        "operation": COMMANDS[args.command],
+        "credentials": clouds,
+        "resources": [os.path.abspath(path) for path in args.resources],
+        "options": {
+            "limits": dict(args.limits),
+            "pool_size": args.pool_size,
+            "state_path": args.state and os.path.abspath(args.state),
+            "refresh": args.refresh,
+            "compact_rules": args.compact_rules,
+            "rates": dict(args.rates),
+        },
+    }
+
+    succeeded = False
+    try:
+        for event in daemon.request(args.socket, message):
+            daemon.report(event)
+            if event["event"] == "done":
+                succeeded = event["succeeded"]
+    except e.OpenStackEnvException as ex:
+        parser.exit(1, "%s\n" % ex.message)
+
+    if not succeeded:
+        parser.exit(1)
+
+
+def _watch(args, clouds):
+    if len(clouds) != 1:
+        parser.error("watch applies to a single cloud")
+    if args.socket or args.trace:
+        parser.error("watch does not support --socket and --trace")
+
+    from openstack_env import watch
+
+    watch.watch(
+        clouds[0],
+        args.resources,
+        limits=dict(args.limits),
+        auth_cache=_auth_cache(args),
+        pool_size=args.pool_size,
+        state_path=args.state,
+        refresh=args.refresh,
+        rates=dict(args.rates),
+        compact_rules=args.compact_rules,
+        recreate=args.replace,
+    )
 
 
 def run(args=None):
     args = parser.parse_args(args or sys.argv[1:])
 
-    credentials = json.load(args.credentials)
-    resources = _read_resources(args.resources)
+    if args.command == SERVE:
+        _serve(args)
+        return
+
+    if not args.resources:
+        parser.error("argument -r/--resources is required")
+
+    if args.validate:
+        try:
+            resources = list(
+                manifests.load(args.resources, args.parse_processes))
+            _validate(resources)
+        except e.OpenStackEnvException as ex:
+            parser.exit(1, "%s\n" % ex.message)
+
+        parser.exit(0, "%d resources are valid\n" % len(resources))
+
+    if not args.credentials:
+        parser.error("argument -c/--credentials is required")
+
+    clouds = _read_credentials(args.credentials)
+    if args.command == WATCH:
+        _watch(args, clouds)
+        return
+
+    if args.socket:
+        _request(args, clouds)
+        return
+
+    # Imported here so that --help and --validate do not load the clients.
+    from openstack_env import main
+
+    resources = manifests.load(args.resources, args.parse_processes)
+    if args.compact_rules:
+        resources = compaction.compact_security_rules(resources)
+
+    auth_cache = _auth_cache(args)
+    operation = getattr(main, COMMANDS[args.command])
+
+    if len(clouds) == 1:
+        results = main.apply(clouds[0], resources, dict(args.limits),
+                             auth_cache, args.pool_size, args.state,
+                             args.refresh, args.trace, dict(args.rates),
+                             operation)
+
+        # Resources which already existed do not fail the run, as with
+        # several clouds.
+        if any(fanout.status(result) == "failed" for result in results):
+            parser.exit(1)
+        return
+
+    summaries = fanout.apply(
+        clouds,
+        resources,
+        limits=dict(args.limits),
+        auth_cache=auth_cache,
+        pool_size=args.pool_size,
+        state_path=args.state,
+        refresh=args.refresh,
+        trace_path=args.trace,
+        rates=dict(args.rates),
+        operation=operation,
+    )
 
-    main.upload(credentials, resources)
+    if not all(fanout.succeeded(summary) for summary in summaries):
+        parser.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,175 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import binascii
+import logging
+import socket
+
+from openstack_env import exceptions as e
+from openstack_env import resources as r
+
+logger = logging.getLogger(__name__)
+
+# Only these protocols have port ranges; ICMP uses the ports for type and
+# code, which must not be merged.
+PORT_PROTOCOLS = ("tcp", "udp")
+
+ADDRESS_FAMILIES = (
+    (socket.AF_INET, 32),
+    (socket.AF_INET6, 128),
+)
+
+
+def compact_security_rules(resources):
+    rule_type = r.SecurityRuleResourceDefinition.resource_type
+    rules = {}
+    dependencies = set()
+    count = 0
+
+    # Rules with explicit dependencies keep their identity, everything else
+    # passes through untouched while the rules are collected.
+    for resource in resources:
+        dependencies.update(resource.depends_on)
+
+        if resource.resource_type != rule_type or resource.depends_on:
+            yield resource
+            continue
+
+        try:
+            network = parse_cidr(resource.cidr)
+        except ValueError as ex:
+            raise e.InvalidResourceException(resource, str(ex))
+
+        count += 1
+        rule = (
+            resource.protocol.lower(),
+            int(resource.from_port),
+            int(resource.to_port),
+            network,
+        )
+        rules.setdefault(rule, {})[resource.key] = resource
+
+    # So do the rules other resources depend on, which are only known once
+    # everything has been read.
+    kept = []
+    for rule, definitions in list(rules.items()):
+        keys = sorted(key for key in definitions if key in dependencies)
+        if keys:
+            del rules[rule]
+            kept.extend(definitions[key] for key in keys)
+
+    merged = merge_cidrs(merge_ports(set(rules)))
+
+    logger.info("Compacted %d security rules into %d", count,
+                len(merged) + len(kept))
+
+    for resource in sorted(kept, key=lambda resource: resource.key):
+        yield resource
+
+    for protocol, from_port, to_port, network in merged:
+        yield r.SecurityRuleResourceDefinition(
+            protocol=protocol,
+            from_port=from_port,
+            to_port=to_port,
+            cidr=format_cidr(network),
+        )
+
+
+def merge_ports(rules):
+    groups = {}
+    merged = []
+
+    for protocol, from_port, to_port, network in rules:
+        if protocol in PORT_PROTOCOLS:
+            groups.setdefault((protocol, network), []).append(
+                (from_port, to_port))
+        else:
+            merged.append((protocol, from_port, to_port, network))
+
+    for (protocol, network), ranges in groups.items():
+        for from_port, to_port in merge_intervals(ranges):
+            merged.append((protocol, from_port, to_port, network))
+
+    return merged
+
+
+def merge_cidrs(rules):
+    groups = {}
+    merged = []
+
+    for protocol, from_port, to_port, network in rules:
+        family, bits, address, prefix = network
+        group = (protocol, from_port, to_port, family, bits)
+        groups.setdefault(group, []).append(
+            (address, address + (1 << (bits - prefix)) - 1))
+
+    for (protocol, from_port, to_port, family, bits), ranges in groups.items():
+        for start, end in merge_intervals(ranges):
+            for address, prefix in range_to_cidrs(start, end, bits):
+                merged.append((protocol, from_port, to_port,
+                               (family, bits, address, prefix)))
+
+    return sorted(merged)
+
+
+def merge_intervals(intervals):
+    merged = []
+
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return [tuple(interval) for interval in merged]
+
+
+def range_to_cidrs(start, end, bits):
+    while start <= end:
+        # The largest block aligned at start that does not go past end.
+        size = (start & -start).bit_length() - 1 if start else bits
+        while start + (1 << size) - 1 > end:
+            size -= 1
+
+        yield start, bits - size
+        start += 1 << size
+
+
+def parse_cidr(cidr):
+    address, __, prefix = cidr.partition("/")
+
+    for family, bits in ADDRESS_FAMILIES:
+        try:
+            packed = socket.inet_pton(family, address)
+        except (socket.error, ValueError):
+            continue
+
+        prefix = int(prefix) if prefix else bits
+        value = int(binascii.hexlify(packed), 16)
+        value &= ~((1 << (bits - prefix)) - 1)
+        return family, bits, value, prefix
+
+    raise ValueError("Invalid CIDR \"%s\"" % cidr)
+
+
+def format_cidr(network):
+    family, bits, address, prefix = network
+    packed = binascii.unhexlify("%0*x" % (bits // 4, address))
+    return "%s/%d" % (socket.inet_ntop(family, packed), prefix)
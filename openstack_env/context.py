@@ -18,34 +18,33 @@
 # under the License.
 
 
+import os.path
+
 from openstack_env import exceptions as e
-from openstack_env import resource_loaders as rl
-from openstack_env import resource_managers as rm
+from openstack_env import registry
 
-resource_managers = [
-    rm.SecurityRuleResourceManager(),
-    rm.KeyPairResourceManager(),
-    rm.FlavorResourceManager(),
-    rm.ImageResourceManager(),
-]
 
+def get_resource_definition(resource_type):
+    resource_definition = registry.resource_definitions.get(resource_type)
+    if resource_definition is None:
+        raise e.UnsupportedResourceTypeException(resource_type)
 
-def get_resource_manager(resource):
-    for resource_manager in resource_managers:
-        if resource_manager.supports(resource):
-            return resource_manager
+    return resource_definition
 
-    raise e.UnsupportedResourceTypeException(resource["type"])
 
+def get_resource_manager(resource):
+    resource_manager = registry.resource_managers.get(resource.resource_type)
+    if resource_manager is None:
+        raise e.UnsupportedResourceTypeException(resource.resource_type)
 
-resource_loaders = [
-    rl.JsonFileResourceDefinitionLoader(),
-]
+    return resource_manager
 
 
 def get_resource_loader(path):
-    for resource_loader in resource_loaders:
-        if resource_loader.supports(path):
-            return resource_loader
+    __, extension = os.path.splitext(path)
+
+    resource_loader = registry.resource_loaders.get(extension[1:].lower())
+    if resource_loader is None:
+        raise e.UnsupportedResourceDefinitionTypeException(path)
 
-    raise e.UnsupportedResourceDefinitionTypeException(path)
+    return resource_loader
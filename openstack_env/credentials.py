@@ -18,31 +18,77 @@
 # under the License.
 
 
-from openstack_env import openstack
+import calendar
+import threading
 
+from keystoneclient import access
 from keystoneclient.auth.identity import v2 as keystone_identity
 from keystoneclient import session as keystone_session
 
+from openstack_env import cache as auth_cache
+
+
+class CachedPassword(keystone_identity.Password):
+    def __init__(self, cache=None, cache_key=None, **kwargs):
+        super(CachedPassword, self).__init__(**kwargs)
+        self._cache = cache
+        self._cache_key = cache_key
+        self._lock = threading.Lock()
+
+    def get_access(self, session, **kwargs):
+        with self._lock:
+            return super(CachedPassword, self).get_access(session, **kwargs)
+
+    def get_auth_ref(self, session, **kwargs):
+        if self._cache:
+            body = self._cache.get(self._cache_key)
+            if body:
+                return access.AccessInfo.factory(body=body)
+
+        auth_ref = super(CachedPassword, self).get_auth_ref(session, **kwargs)
+
+        if self._cache:
+            self._cache.set(
+                self._cache_key,
+                {"access": dict(auth_ref)},
+                calendar.timegm(auth_ref.expires.utctimetuple()),
+            )
+
+        return auth_ref
+
+    def invalidate(self):
+        if self._cache:
+            self._cache.invalidate(self._cache_key)
+        return super(CachedPassword, self).invalidate()
+
 
 class Credentials(object):
     @classmethod
-    def from_dict(cls, credentials):
+    def from_dict(cls, credentials, cache=None):
         if isinstance(credentials, cls):
             return credentials
 
         if isinstance(credentials, dict):
-            return cls(**credentials)
+            return cls(cache=cache, **credentials)
 
         raise ValueError()
 
-    def __init__(self, user_name, password, tenant, auth_url, **kwargs):
+    def __init__(self, user_name, password, tenant, auth_url, cache=None,
+                 **kwargs):
         self._user_name = user_name
         self._password = password
         self._tenant = tenant
         self._auth_url = auth_url
-        self._identity = openstack.identity(self)
-        self._auth_token = None
-        self._tenant_id = None
+        self._auth = CachedPassword(
+            cache=cache,
+            cache_key=auth_cache.AuthCache.key(auth_url, user_name, tenant),
+            auth_url=auth_url,
+            username=user_name,
+            password=password,
+            tenant_name=tenant,
+        )
+        self._session = keystone_session.Session(auth=self._auth)
+        self._lock = threading.Lock()
 
     @property
     def user_name(self):
@@ -61,20 +107,51 @@ class Credentials(object):
         return self._auth_url
 
     @property
-    def auth_token(self):
-        if not self._auth_token:
-            auth = keystone_identity.Password(
-                auth_url=self.auth_url,
-                username=self.user_name,
-                password=self.password,
-                tenant_name=self.tenant,
-            )
-            self._auth_token = auth.get_token(keystone_session.Session(auth))
+    def auth(self):
+        return self._auth
 
-        return self._auth_token
+    @property
+    def auth_ref(self):
+        return self._auth.get_access(self._session)
+
+    @property
+    def auth_token(self):
+        return self.auth_ref.auth_token
 
     @property
     def tenant_id(self):
-        if not self._tenant_id:
-            self._tenant_id = self._identity.tenants.find(name=self.tenant).id
-        return self._tenant_id
+        return self.auth_ref.tenant_id
+
+    def endpoint(self, service_type):
+        return self.auth_ref.service_catalog.url_for(
+            service_type=service_type,
+            endpoint_type="publicURL",
+        )
+
+    def endpoints(self, endpoint_type="publicURL"):
+        endpoints = [(self._auth_url, "identity")]
+
+        catalog = self.auth_ref.service_catalog.get_endpoints()
+        for service_type, service_endpoints in catalog.items():
+            for endpoint in service_endpoints:
+                if endpoint.get(endpoint_type):
+                    endpoints.append((endpoint[endpoint_type], service_type))
+
+        return endpoints
+
+    def mount(self, adapter):
+        # Lets token requests share the pooled (and possibly instrumented)
+        # adapter of the service clients.
+        self._session.session.mount("http://", adapter)
+        self._session.session.mount("https://", adapter)
+
+    def invalidate(self, auth_token=None):
+        with self._lock:
+            auth_ref = self._auth.auth_ref
+            if not auth_ref:
+                return False
+
+            if auth_token and auth_token != auth_ref.auth_token:
+                return False
+
+            return self._auth.invalidate()
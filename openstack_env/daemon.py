@@ -0,0 +1,330 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from six.moves import socketserver
+
+from openstack_env import compaction
+from openstack_env import exceptions as e
+from openstack_env import fanout
+from openstack_env import manifests
+from openstack_env import openstack
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(
+    os.path.expanduser("~"), ".cache", "openstack-env", "osenv.sock")
+
+# Functions of openstack_env.main which a request may ask for.
+OPERATIONS = ("upload", "destroy")
+
+# The daemon is not the only one changing the clouds, so inventories older
+# than this many seconds are listed again before the next request uses them.
+INVENTORY_TTL = 300
+
+
+def send(stream, message):
+    stream.write((json.dumps(message) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def receive(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def request(path, message):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        try:
+            connection.connect(path)
+        except socket.error as ex:
+            raise e.DaemonException(
+                "cannot connect to \"%s\": %s" % (path, ex))
+
+        stream = connection.makefile("rwb")
+        send(stream, message)
+
+        # Events are yielded as they arrive, until the daemon is done.
+        while True:
+            event = receive(stream)
+            if event is None:
+                raise e.DaemonException("connection closed unexpectedly")
+
+            yield event
+            if event["event"] == "done":
+                return
+    finally:
+        connection.close()
+
+
+def report(event):
+    if event["event"] == "result":
+        if event["error"]:
+            logger.warning("%s: %s", event["cloud"], event["error"])
+        else:
+            logger.info("%s: resource \"%s\" %s", event["cloud"],
+                        event["resource"], event["status"])
+    elif event["event"] == "summary":
+        fanout.log_summary(event)
+    elif event["event"] == "error":
+        logger.error(event["message"])
+
+
+def _message(error):
+    return getattr(error, "message", None) or str(error)
+
+
+class Clients(object):
+    def __init__(self, connect, ttl=INVENTORY_TTL, clock=time.time):
+        self._connect = connect
+        self._ttl = ttl
+        self._clock = clock
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(credentials, pool_size, rates):
+        value = json.dumps([credentials, pool_size, rates], sort_keys=True)
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    def get(self, credentials, pool_size, rates):
+        key = self.key(credentials, pool_size, rates)
+        now = self._clock()
+
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = [
+                    self._connect(credentials, pool_size, rates), now]
+
+            entry = self._clients[key]
+            if now - entry[1] > self._ttl:
+                entry[0].reset_inventory()
+                entry[1] = now
+
+        return entry[0]
+
+
+class Daemon(object):
+    def __init__(self, auth_cache=None, ttl=INVENTORY_TTL):
+        self._auth_cache = auth_cache
+        self._clients = Clients(self.connect, ttl)
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def connect(self, credentials, pool_size, rates):
+        from openstack_env import main
+
+        return main.connect(credentials, self._auth_cache, pool_size,
+                            rates=rates)
+
+    def run(self, credentials, resources, operation, options, client,
+            callback):
+        from openstack_env import main
+
+        return main.apply(
+            credentials,
+            resources,
+            options.get("limits"),
+            state_path=options.get("state_path"),
+            refresh=options.get("refresh", False),
+            operation=getattr(main, operation),
+            openstack=client,
+            callback=callback,
+        )
+
+    def handle(self, message, emit):
+        operation = message.get("operation")
+        if operation not in OPERATIONS:
+            raise e.DaemonException("unknown operation \"%s\"" % operation)
+
+        options = message.get("options") or {}
+        clouds = message.get("credentials") or []
+        if not clouds:
+            raise e.DaemonException("no credentials given")
+
+        # Parsed in this process: forking a pool from a threaded server is
+        # not safe, and the manifests are small next to the API calls.
+        resources = list(manifests.load(message.get("resources") or [], 1))
+        if options.get("compact_rules"):
+            resources = list(compaction.compact_security_rules(resources))
+
+        if len(clouds) == 1:
+            return [self._apply(clouds[0], resources, operation, options,
+                                emit, multiple=False)]
+
+        summaries = [None] * len(clouds)
+
+        def apply(index, credentials):
+            summaries[index] = self._apply(
+                credentials, resources, operation, options, emit)
+
+        threads = []
+        for index, credentials in enumerate(clouds):
+            thread = threading.Thread(target=apply, args=(index, credentials))
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        return summaries
+
+    def _apply(self, credentials, resources, operation, options, emit,
+               multiple=True):
+        name = fanout.cloud_name(credentials)
+        if multiple:
+            options = dict(options, state_path=fanout.cloud_path(
+                options.get("state_path"), name))
+
+        def callback(result):
+            emit({
+                "event": "result",
+                "cloud": name,
+                "resource": str(result.resource),
+                "status": fanout.status(result),
+                "error": result.error and _message(result.error),
+            })
+
+        start = time.time()
+        try:
+            client = self._clients.get(
+                credentials,
+                options.get("pool_size") or openstack.POOL_SIZE,
+                options.get("rates"),
+            )
+            results = self.run(credentials, resources, operation, options,
+                               client, callback)
+        except Exception as ex:
+            summary = fanout.summarize(
+                name, [], time.time() - start, _message(ex))
+        else:
+            summary = fanout.summarize(name, results, time.time() - start)
+
+        fanout.log_summary(summary)
+        emit(dict(summary, event="summary"))
+        return summary
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        lock = threading.Lock()
+        connected = [True]
+
+        def emit(event):
+            # A client which went away does not stop the apply, the results
+            # still end up in the state store.
+            with lock:
+                if not connected[0]:
+                    return
+                try:
+                    send(self.wfile, event)
+                except (IOError, socket.error):
+                    logger.warning("Client disconnected, carrying on")
+                    connected[0] = False
+
+        try:
+            message = receive(self.rfile)
+            if message is None:
+                return
+            summaries = self.server.daemon.handle(message, emit)
+        except Exception as ex:
+            logger.exception("Request failed")
+            emit({"event": "error", "message": _message(ex)})
+            emit({"event": "done", "succeeded": False})
+            return
+
+        emit({
+            "event": "done",
+            "succeeded": all(
+                fanout.succeeded(summary) for summary in summaries),
+        })
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, daemon):
+        self.path = path
+        self.daemon = daemon
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        _remove_stale(path)
+
+        # Requests carry credentials, so only the owner may connect. The
+        # socket is created with these permissions rather than changed after
+        # binding, which would leave a window for others to connect.
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _remove_stale(path):
+    if not os.path.exists(path):
+        return
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except socket.error as ex:
+        if ex.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+            raise
+        # Left behind by a daemon which did not shut down cleanly.
+        os.unlink(path)
+    else:
+        raise e.DaemonException("already running on \"%s\"" % path)
+    finally:
+        connection.close()
+
+
+def serve(path, daemon):
+    server = Server(path, daemon)
+    logger.info("Listening on \"%s\"", path)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
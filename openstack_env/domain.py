@@ -19,20 +19,37 @@
 
 
 import abc
+import hashlib
+import json
+import operator
 
 import six
 
+from openstack_env import exceptions as e
+
 
 @six.add_metaclass(abc.ABCMeta)
 class ResourceManager(object):
+    service = None
+
     @abc.abstractmethod
     def supports(self, resource):
         return
 
+    # May return a future resolving to the uploaded resource instead of the
+    # resource itself when it has to wait for the cloud to finish the work.
     @abc.abstractmethod
     def upload(self, resource, client):
         return
 
+    # Raises ResourceNotFoundException when there is nothing to delete. May
+    # return a future, like upload.
+    def delete(self, resource, client):
+        raise e.UnsupportedOperationException(resource, "delete")
+
+    def exists(self, resource, client):
+        return False
+
 
 @six.add_metaclass(abc.ABCMeta)
 class ResourceDefinitionLoader(object):
@@ -40,11 +57,237 @@ class ResourceDefinitionLoader(object):
     def supports(self, path):
         return
 
+    # Returns an iterable of resource definitions, which may be read lazily.
     @abc.abstractmethod
     def load(self, path):
         return
 
 
-@six.add_metaclass(abc.ABCMeta)
+REQUIRED = object()
+
+
+class Field(object):
+    # Local fields are only used on this side, e.g. where the content of a
+    # resource is read from, and are not kept by the cloud.
+    def __init__(self, name, source=None, default=REQUIRED, convert=None,
+                 local=False):
+        self.name = name
+        self.source = source or name
+        self.default = default
+        self.convert = convert
+        self.local = local
+
+    @property
+    def slot(self):
+        return "_" + self.name
+
+
+class ResourceDefinitionMeta(abc.ABCMeta):
+    # Builds the complete field spec of a definition class from the fields it
+    # declares, the fields of its parents and the common fields, and turns it
+    # into __slots__, read-only properties and generated __init__ and
+    # from_dict methods. Without an instance __dict__ and with read-only
+    # properties, definitions cannot be changed once built.
+    def __new__(mcs, name, bases, namespace):
+        parent_spec = ()
+        common_fields = namespace.get("common_fields", ())
+        existing_slots = set()
+
+        for base in bases:
+            parent_spec = parent_spec or getattr(base, "field_spec", ())
+            common_fields = common_fields or getattr(
+                base, "common_fields", ())
+            for klass in base.__mro__:
+                existing_slots.update(getattr(klass, "__slots__", ()))
+
+        # A class may redeclare a field of its parent, to change its default,
+        # which keeps the place of the parent field.
+        declared = list(namespace.get("fields", ()))
+        fields = ()
+        for field in parent_spec:
+            if field in common_fields:
+                continue
+            for redeclared in declared:
+                if redeclared.name == field.name:
+                    declared.remove(redeclared)
+                    field = redeclared
+                    break
+            fields += (field,)
+        fields += tuple(declared)
+        if fields:
+            fields += tuple(common_fields)
+
+        namespace["field_spec"] = fields
+        namespace["__slots__"] = tuple(
+            field.slot for field in fields
+            if field.slot not in existing_slots
+        )
+
+        for field in fields:
+            if field.name not in namespace and not any(
+                    hasattr(base, field.name) for base in bases):
+                namespace[field.name] = property(
+                    operator.attrgetter(field.slot))
+
+        cls = super(ResourceDefinitionMeta, mcs).__new__(
+            mcs, name, bases, namespace)
+
+        if fields:
+            cls.__init__, from_dict = _generate_methods(fields)
+            cls.from_dict = classmethod(from_dict)
+
+        return cls
+
+
+_METHODS_TEMPLATE = """
+def __init__(self, %(arguments)s):
+%(init_assignments)s
+
+def from_dict(cls, item):
+    self = new(cls)
+    try:
+%(item_assignments)s
+    except KeyError as ex:
+        raise InvalidResourceException(
+            item.get("name", cls.resource_type),
+            "missing field \\"%%s\\"" %% ex.args[0],
+        )
+    return self
+"""
+
+
+def _generate_methods(fields):
+    # Like collections.namedtuple, the methods are generated from source so
+    # that building millions of definitions stays cheap.
+    namespace = {
+        "REQUIRED": REQUIRED,
+        "InvalidResourceException": e.InvalidResourceException,
+        "missing": _missing,
+        "new": object.__new__,
+    }
+    arguments = []
+    init_assignments = []
+    item_assignments = []
+
+    for index, field in enumerate(fields):
+        namespace["default_%d" % index] = field.default
+        namespace["convert_%d" % index] = field.convert
+
+        arguments.append("%s=default_%d" % (field.name, index))
+
+        if field.default is REQUIRED:
+            init_assignments.append(
+                "    if %s is REQUIRED: missing(self, %r)" % (
+                    field.name, field.name))
+            item_value = "item[%r]" % field.source
+        else:
+            item_value = "item.get(%r, default_%d)" % (field.source, index)
+
+        if field.convert:
+            value = "%s if %s is None or %s is default_%d else %s" % (
+                field.name, field.name, field.name, index,
+                "convert_%d(%s)" % (index, field.name))
+            item_assignments.append("        %s = %s" % (
+                field.name, item_value))
+        else:
+            value = item_value
+        init_assignments.append("    self.%s = %s" % (
+            field.slot, value if field.convert else field.name))
+        item_assignments.append("        self.%s = %s" % (field.slot, value))
+
+    source = _METHODS_TEMPLATE % {
+        "arguments": ", ".join(arguments),
+        "init_assignments": "\n".join(init_assignments),
+        "item_assignments": "\n".join(item_assignments),
+    }
+    six.exec_(source, namespace)
+
+    return namespace["__init__"], namespace["from_dict"]
+
+
+def _missing(definition, name):
+    raise TypeError("%s is missing \"%s\"" % (type(definition).__name__, name))
+
+
+@six.add_metaclass(ResourceDefinitionMeta)
 class ResourceDefinition(object):
-    pass
+    __slots__ = ()
+
+    resource_type = None
+
+    common_fields = (
+        Field("depends_on", default=(), convert=tuple, local=True),
+    )
+
+    @property
+    def key(self):
+        return "%s:%s" % (self.resource_type, self.name)
+
+    @property
+    def requires(self):
+        return ()
+
+    @property
+    def values(self):
+        return tuple(getattr(self, field.slot) for field in self.field_spec)
+
+    @property
+    def digest(self):
+        return self._digest(self.field_spec)
+
+    # Changes only when what the cloud keeps of the resource changes.
+    @property
+    def cloud_digest(self):
+        return self._digest(
+            [field for field in self.field_spec if not field.local])
+
+    def _digest(self, fields):
+        content = json.dumps([
+            self.resource_type,
+            [[field.name, getattr(self, field.slot)] for field in fields],
+        ])
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self.values))
+
+    def __reduce__(self):
+        return type(self), self.values
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join(
+            "%s=%r" % (field.name, getattr(self, field.slot))
+            for field in self.field_spec
+        ))
+
+    def __str__(self):
+        return self.key
+
+
+class Result(object):
+    def __init__(self, resource, value=None, error=None):
+        self._resource = resource
+        self._value = value
+        self._error = error
+
+    @property
+    def resource(self):
+        return self._resource
+
+    @property
+    def value(self):
+        return self._value
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def succeeded(self):
+        return self._error is None
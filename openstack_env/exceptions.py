@@ -18,8 +18,18 @@
 # under the License.
 
 
+def _restore(cls, attributes):
+    exception = cls.__new__(cls)
+    exception.__dict__.update(attributes)
+    return exception
+
+
 class OpenStackEnvException(Exception):
-    pass
+    # Subclasses take their own arguments, so unpickling (as when errors
+    # cross process boundaries) restores the attributes instead of calling
+    # __init__ again.
+    def __reduce__(self):
+        return _restore, (type(self), self.__dict__)
 
 
 class UnsupportedResourceTypeException(OpenStackEnvException):
@@ -27,6 +37,8 @@ class UnsupportedResourceTypeException(OpenStackEnvException):
         super(UnsupportedResourceTypeException, self).__init__()
         self.resource_type = resource_type
 
+        self.message = "Unsupported resource type \"%s\"" % resource_type
+
 
 class ResourceAlreadyExistsException(OpenStackEnvException):
     def __init__(self, resource):
@@ -36,6 +48,24 @@ class ResourceAlreadyExistsException(OpenStackEnvException):
         self.message = "Resource \"%s\" already exists!" % resource
 
 
+class ResourceNotFoundException(OpenStackEnvException):
+    def __init__(self, resource):
+        super(ResourceNotFoundException, self).__init__()
+        self.resource = resource
+
+        self.message = "Resource \"%s\" does not exist" % resource
+
+
+class UnsupportedOperationException(OpenStackEnvException):
+    def __init__(self, resource, operation):
+        super(UnsupportedOperationException, self).__init__()
+        self.resource = resource
+        self.operation = operation
+
+        self.message = "Resource \"%s\" does not support %s" % (
+            resource, operation)
+
+
 class UnsupportedResourceDefinitionTypeException(OpenStackEnvException):
     def __init__(self, path):
         super(UnsupportedResourceDefinitionTypeException, self).__init__()
@@ -44,4 +74,79 @@ class UnsupportedResourceDefinitionTypeException(OpenStackEnvException):
 
 
 class TimeoutException(OpenStackEnvException):
-    pass
+    message = "Operation timed out"
+
+
+class UnknownDependencyException(OpenStackEnvException):
+    def __init__(self, resource, dependency):
+        super(UnknownDependencyException, self).__init__()
+        self.resource = resource
+        self.dependency = dependency
+
+        self.message = "Resource \"%s\" depends on unknown resource \"%s\"" % (
+            resource, dependency)
+
+
+class DependencyCycleException(OpenStackEnvException):
+    def __init__(self, resources):
+        super(DependencyCycleException, self).__init__()
+        self.resources = resources
+
+        self.message = "Dependency cycle between resources: %s" % ", ".join(
+            "\"%s\"" % resource for resource in resources)
+
+
+class DependencyFailedException(OpenStackEnvException):
+    def __init__(self, resource, dependency):
+        super(DependencyFailedException, self).__init__()
+        self.resource = resource
+        self.dependency = dependency
+
+        self.message = "Skipping \"%s\": dependency \"%s\" failed" % (
+            resource, dependency)
+
+
+class ImageStatusException(OpenStackEnvException):
+    def __init__(self, image_id, status):
+        super(ImageStatusException, self).__init__()
+        self.image_id = image_id
+        self.status = status
+
+        self.message = "Image \"%s\" went into status \"%s\"" % (
+            image_id, status)
+
+
+class ChecksumMismatchException(OpenStackEnvException):
+    def __init__(self, resource, expected, actual):
+        super(ChecksumMismatchException, self).__init__()
+        self.resource = resource
+        self.expected = expected
+        self.actual = actual
+
+        self.message = "Checksum of \"%s\" is \"%s\", expected \"%s\"" % (
+            resource, actual, expected)
+
+
+class InvalidResourceException(OpenStackEnvException):
+    def __init__(self, resource, reason):
+        super(InvalidResourceException, self).__init__()
+        self.resource = resource
+        self.reason = reason
+
+        self.message = "Invalid resource \"%s\": %s" % (resource, reason)
+
+
+class UnsupportedCompressionException(OpenStackEnvException):
+    def __init__(self, compression):
+        super(UnsupportedCompressionException, self).__init__()
+        self.compression = compression
+
+        self.message = "Unsupported compression \"%s\"" % compression
+
+
+class DaemonException(OpenStackEnvException):
+    def __init__(self, reason):
+        super(DaemonException, self).__init__()
+        self.reason = reason
+
+        self.message = "osenv daemon: %s" % reason
@@ -0,0 +1,89 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import functools
+import threading
+
+from concurrent import futures
+
+DEFAULT_LIMIT = 4
+
+DEFAULT_LIMITS = {
+    "compute": 8,
+    "images": 4,
+    "data_processing": 4,
+}
+
+
+class ServiceExecutor(object):
+    def __init__(self, limits=None):
+        self._limits = dict(DEFAULT_LIMITS)
+        self._limits.update(limits or {})
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def limit(self, service):
+        return self._limits.get(service, DEFAULT_LIMIT)
+
+    def submit(self, service, fn, *args, **kwargs):
+        result = futures.Future()
+
+        task = self._get_pool(service).submit(fn, *args, **kwargs)
+        task.add_done_callback(functools.partial(_chain, result))
+
+        return result
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+
+        for pool in pools:
+            pool.shutdown(wait)
+
+    def _get_pool(self, service):
+        with self._lock:
+            if service not in self._pools:
+                self._pools[service] = futures.ThreadPoolExecutor(
+                    max_workers=self.limit(service),
+                )
+            return self._pools[service]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def _chain(result, task):
+    # A task may return a future of its own (e.g. an image waiting to become
+    # active), in which case the worker is released and the result follows
+    # that future instead.
+    try:
+        value = task.result()
+    except Exception as ex:
+        result.set_exception(ex)
+        return
+
+    if isinstance(value, futures.Future):
+        value.add_done_callback(functools.partial(_chain, result))
+    else:
+        result.set_result(value)
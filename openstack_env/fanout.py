@@ -0,0 +1,153 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import logging
+import multiprocessing
+import re
+import time
+
+from openstack_env import exceptions as e
+from openstack_env import state as st
+
+logger = logging.getLogger(__name__)
+
+# Parsed once in the parent and inherited by the forked workers, so that the
+# manifests are neither parsed nor pickled once per cloud.
+_resources = None
+
+
+def cloud_name(credentials):
+    return credentials.get("name") or "%s@%s" % (
+        credentials.get("tenant"), credentials.get("auth_url"))
+
+
+def cloud_path(path, name):
+    # One state database or trace per cloud, next to the given path.
+    if not path:
+        return path
+    return "%s.%s" % (path, re.sub(r"[^\w.-]+", "_", name).strip("_"))
+
+
+def status(result):
+    if isinstance(result.value, st.AppliedResource):
+        return "unchanged"
+    if result.succeeded:
+        return "succeeded"
+    if isinstance(result.error, e.ResourceAlreadyExistsException):
+        return "existing"
+    return "failed"
+
+
+def summarize(name, results, duration, error=None):
+    summary = {
+        "cloud": name,
+        "total": len(results),
+        "succeeded": 0,
+        "unchanged": 0,
+        "existing": 0,
+        "failed": 0,
+        "duration": duration,
+        "error": error,
+    }
+
+    for result in results:
+        summary[status(result)] += 1
+
+    return summary
+
+
+def _share(resources):
+    global _resources
+    _resources = resources
+
+
+def _pool(processes, resources):
+    _share(resources)
+
+    try:
+        return multiprocessing.get_context("fork").Pool(processes)
+    except (AttributeError, ValueError):
+        # Without fork every worker gets its own copy of the resources.
+        return multiprocessing.Pool(processes, _share, (resources,))
+
+
+def _apply(cloud):
+    from openstack_env import main
+
+    name, credentials, options = cloud
+
+    formatter = logging.Formatter("[%s] %%(message)s" % name)
+    for handler in main.package_logger.handlers:
+        handler.setFormatter(formatter)
+
+    start = time.time()
+    try:
+        results = main.apply(credentials, _resources, **options)
+    except Exception as ex:
+        return summarize(name, [], time.time() - start, str(ex))
+
+    return summarize(name, results, time.time() - start)
+
+
+def apply(clouds, resources, state_path=None, trace_path=None, **options):
+    resources = list(resources)
+
+    tasks = []
+    for credentials in clouds:
+        name = cloud_name(credentials)
+        cloud_options = dict(
+            options,
+            state_path=cloud_path(state_path, name),
+            trace_path=cloud_path(trace_path, name),
+        )
+        tasks.append((name, credentials, cloud_options))
+
+    pool = _pool(len(tasks), resources)
+    summaries = []
+
+    try:
+        # Clouds are reported as they finish, a slow region does not hold
+        # back the others.
+        for summary in pool.imap_unordered(_apply, tasks):
+            summaries.append(summary)
+            log_summary(summary)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return sorted(summaries, key=lambda summary: summary["cloud"])
+
+
+def log_summary(summary):
+    if summary["error"]:
+        logger.error("%s: failed after %.1f s: %s", summary["cloud"],
+                     summary["duration"], summary["error"])
+        return
+
+    logger.info(
+        "%s: %d resources in %.1f s, %d succeeded, %d unchanged, "
+        "%d already existed, %d failed", summary["cloud"], summary["total"],
+        summary["duration"], summary["succeeded"], summary["unchanged"],
+        summary["existing"], summary["failed"])
+
+
+def succeeded(summary):
+    return not summary["error"] and not summary["failed"]
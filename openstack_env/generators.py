@@ -0,0 +1,103 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import itertools
+
+import six
+from six.moves import range
+
+from openstack_env import exceptions as e
+
+MATRIX = "matrix"
+RANGE = "range"
+INDEX = "index"
+
+
+def _values(name, values, item):
+    if isinstance(values, dict) and RANGE in values:
+        bounds = values[RANGE]
+        try:
+            # Inclusive of the stop value, which reads better in manifests
+            # ("ports 8000 to 8010") than Python's half-open ranges.
+            start, stop = int(bounds[0]), int(bounds[1])
+            step = int(bounds[2]) if len(bounds) > 2 else 1
+        except (IndexError, TypeError, ValueError):
+            raise _invalid(item, "range of \"%s\" must be [start, stop] or "
+                                 "[start, stop, step]" % name)
+        if not step:
+            raise _invalid(item, "range of \"%s\" has a zero step" % name)
+        return range(start, stop + (1 if step > 0 else -1), step)
+
+    if isinstance(values, (list, tuple)):
+        return values
+
+    raise _invalid(item, "values of \"%s\" must be a list or a range" % name)
+
+
+def _invalid(item, reason):
+    return e.InvalidResourceException(
+        item.get("name") or item.get("type"), reason)
+
+
+def _render(value, variables, item):
+    if not isinstance(value, six.string_types) or "{" not in value:
+        return value
+
+    # A lone placeholder keeps the type of its value, so that numeric
+    # fields stay numbers.
+    if value[0] == "{" and value[-1] == "}" and value[1:-1] in variables:
+        return variables[value[1:-1]]
+
+    try:
+        return value.format(**variables)
+    except (KeyError, IndexError, ValueError) as ex:
+        raise _invalid(item, "cannot fill in \"%s\": %s" % (value, ex))
+
+
+def expand(item):
+    # Entries with a matrix stand for one resource per combination of its
+    # values. Combinations are produced one at a time, however many there
+    # are, with the values set as fields and filled into string templates
+    # along with the running index. Variables are combined in sorted order,
+    # the last one changing fastest, whatever order the manifest uses.
+    matrix = item.get(MATRIX)
+    if matrix is None:
+        yield item
+        return
+
+    if not isinstance(matrix, dict) or not matrix:
+        raise _invalid(item, "matrix must be a non-empty mapping")
+
+    names = sorted(matrix)
+    template = dict(
+        (key, value) for key, value in item.items() if key != MATRIX)
+    values = [_values(name, matrix[name], item) for name in names]
+
+    for index, combination in enumerate(itertools.product(*values)):
+        variables = dict(zip(names, combination))
+        variables[INDEX] = index
+
+        expanded = dict(
+            (key, _render(value, variables, item))
+            for key, value in template.items()
+        )
+        for name, value in zip(names, combination):
+            expanded.setdefault(name, value)
+        yield expanded
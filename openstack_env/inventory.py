@@ -0,0 +1,149 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+
+PAGE_SIZE = 1000
+
+
+def rule_key(protocol, from_port, to_port, cidr):
+    return protocol.lower(), int(from_port), int(to_port), cidr
+
+
+def _security_rule_key(rule):
+    return rule_key(rule.ip_protocol, rule.from_port, rule.to_port,
+                    rule.ip_range.get("cidr"))
+
+
+def _paginate(list_items, page_size=PAGE_SIZE, **kwargs):
+    marker = None
+
+    while True:
+        page = list_items(marker=marker, limit=page_size, **kwargs)
+        for item in page:
+            yield item
+
+        if len(page) < page_size:
+            return
+
+        marker = page[-1].id
+
+
+class Collection(object):
+    def __init__(self, list_items, **keys):
+        self._list_items = list_items
+        self._keys = keys
+        self._indexes = None
+        self._aliases = []
+        self._lock = threading.Lock()
+
+    def find(self, index, value):
+        return self._load()[index].get(value)
+
+    def contains(self, index, value):
+        return value in self._load()[index]
+
+    def add(self, item):
+        with self._lock:
+            if self._indexes is not None:
+                self._index(self._indexes, item)
+
+    def alias(self, index, value, item):
+        # Makes an item findable by a value which is not its own, such as
+        # the manifest name of an image whose content was already there.
+        indexes = self._load()
+
+        with self._lock:
+            if value not in indexes[index]:
+                indexes[index][value] = item
+                self._aliases.append((index, value, item))
+
+    def unalias(self, index, value):
+        with self._lock:
+            for alias in self._aliases:
+                if alias[:2] == (index, value):
+                    self._aliases.remove(alias)
+                    self._indexes[index].pop(value, None)
+                    return
+
+    def is_alias(self, index, value):
+        with self._lock:
+            return any(alias[:2] == (index, value) for alias in self._aliases)
+
+    def remove(self, item):
+        with self._lock:
+            if self._indexes is None:
+                return
+
+            for index, key in self._keys.items():
+                value = key(item)
+                if self._indexes[index].get(value) is item:
+                    del self._indexes[index][value]
+
+            for alias in list(self._aliases):
+                index, value, aliased = alias
+                if aliased is item:
+                    self._aliases.remove(alias)
+                    if self._indexes[index].get(value) is item:
+                        del self._indexes[index][value]
+
+    def _load(self):
+        with self._lock:
+            if self._indexes is None:
+                indexes = dict((index, {}) for index in self._keys)
+                for item in self._list_items():
+                    self._index(indexes, item)
+                self._indexes = indexes
+            return self._indexes
+
+    def _index(self, indexes, item):
+        for index, key in self._keys.items():
+            value = key(item)
+            if value is not None:
+                indexes[index].setdefault(value, item)
+
+
+class Inventory(object):
+    def __init__(self, client):
+        self.flavors = Collection(
+            lambda: _paginate(client.compute.flavors.list, is_public=None),
+            name=lambda flavor: flavor.name,
+            id=lambda flavor: flavor.id,
+        )
+        self.key_pairs = Collection(
+            lambda: client.compute.keypairs.list(),
+            name=lambda key_pair: key_pair.name,
+        )
+        self.security_rules = Collection(
+            lambda: client.compute.security_group_default_rules.list(),
+            rule=_security_rule_key,
+        )
+        self.images = Collection(
+            lambda: client.images.images.list(page_size=PAGE_SIZE),
+            name=lambda image: image.name,
+            id=lambda image: image.id,
+            checksum=lambda image: getattr(image, "checksum", None),
+            size=lambda image: getattr(image, "size", None),
+        )
+        # Sahara only lists the images registered with it.
+        self.data_processing_images = Collection(
+            lambda: client.data_processing.images.list(),
+            id=lambda image: image.id,
+        )
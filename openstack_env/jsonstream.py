@@ -0,0 +1,128 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class Reader(object):
+    def __init__(self, json_file, chunk_size=CHUNK_SIZE):
+        self._file = json_file
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def peek(self):
+        self._skip_whitespace()
+        return self._buffer[self._position:self._position + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected '%s' but found '%s'" % (
+                char, self.peek()))
+        self._position += 1
+
+    def accept(self, char):
+        if self.peek() == char:
+            self._position += 1
+            return True
+        return False
+
+    def decode(self):
+        self._skip_whitespace()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A value ending exactly at the end of the buffer may have been
+            # cut in the middle (e.g. a number), so make sure it is complete.
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._position = end
+            return value
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            self._position = _WHITESPACE.match(
+                self._buffer, self._position).end()
+
+            if self._position < len(self._buffer) or not self._fill():
+                return
+
+
+def iter_array(json_file, key, chunk_size=CHUNK_SIZE):
+    reader = Reader(json_file, chunk_size)
+
+    reader.expect("{")
+    if reader.accept("}"):
+        raise KeyError(key)
+
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+
+        if name == key:
+            for item in _iter_items(reader):
+                yield item
+            return
+
+        reader.decode()
+
+        if not reader.accept(","):
+            reader.expect("}")
+            raise KeyError(key)
+
+
+def _iter_items(reader):
+    reader.expect("[")
+    if reader.accept("]"):
+        return
+
+    while True:
+        yield reader.decode()
+
+        if not reader.accept(","):
+            reader.expect("]")
+            return
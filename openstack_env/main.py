@@ -20,33 +20,195 @@
 
 import logging
 
+from concurrent import futures
+
 from openstack_env import context
 from openstack_env import credentials as c
+from openstack_env import domain as d
 from openstack_env import exceptions as e
+from openstack_env import executor
 from openstack_env import openstack as os
+from openstack_env import scheduler
+from openstack_env import state as st
+from openstack_env import throttling
+from openstack_env import tracing
 
 logger = logging.getLogger(__name__)
 
-logger.setLevel('INFO')
-logger.addHandler(logging.StreamHandler())
+package_logger = logging.getLogger("openstack_env")
+package_logger.setLevel('INFO')
+package_logger.addHandler(logging.StreamHandler())
 
-openstack = None
 
+def upload_resource(resource, openstack):
+    logger.info("Creating resource \"%s\"", resource)
+    return _call(resource, openstack, "upload")
 
-def upload_resource(resource):
-    try:
+
+def delete_resource(resource, openstack):
+    logger.info("Deleting resource \"%s\"", resource)
+    return _call(resource, openstack, "delete")
+
+
+def _call(resource, openstack, operation):
+    with openstack.tracer.resource(resource):
         resource_manager = context.get_resource_manager(resource)
+        auth_token = openstack.credentials.auth_token
+
+        try:
+            return getattr(resource_manager, operation)(resource, openstack)
+        except Exception as ex:
+            if not os.is_unauthorized(ex):
+                raise
+
+            logger.info("Token expired, re-authenticating")
+            openstack.invalidate(auth_token)
+            return getattr(resource_manager, operation)(resource, openstack)
+
+
+def get_service(resource):
+    try:
+        return context.get_resource_manager(resource).service
+    except e.OpenStackEnvException:
+        return None
 
-        logger.info("Creating resource \"%s\"", resource)
-        return resource_manager.upload(resource, openstack)
+
+def get_result(resource, task):
+    try:
+        return d.Result(resource, value=task.result())
     except e.OpenStackEnvException as ex:
-        logging.warning(ex.message)
+        logger.warning(ex.message)
+        return d.Result(resource, error=ex)
+    except Exception as ex:
+        logger.error("Failed to create resource \"%s\": %s", resource, ex)
+        return d.Result(resource, error=ex)
+
+
+def get_deletion_result(resource, task):
+    try:
+        return d.Result(resource, value=task.result())
+    except e.ResourceNotFoundException:
+        logger.info("Resource \"%s\" does not exist", resource)
+        return d.Result(resource)
+    except Exception:
+        return get_result(resource, task)
+
+
+def is_unchanged(resource, openstack, state, refresh=False):
+    if not state.is_current(resource):
+        return False
+
+    if refresh:
+        resource_manager = context.get_resource_manager(resource)
+        if not resource_manager.exists(resource, openstack):
+            logger.info("Resource \"%s\" is gone, creating it again", resource)
+            state.remove(resource.key)
+            return False
+
+    return True
 
 
-def upload(credentials, resources):
-    global openstack
+def record_result(state, result):
+    if isinstance(result.value, st.AppliedResource):
+        return
 
-    openstack = os.client(c.Credentials.from_dict(credentials))
+    if result.succeeded:
+        state.record(result.resource, getattr(result.value, "id", None))
+    elif (isinstance(result.error, e.ResourceAlreadyExistsException) and
+            state.get(result.resource.key) is None):
+        state.record(result.resource)
+
+
+def connect(credentials, auth_cache=None, pool_size=os.POOL_SIZE,
+            tracer=None, rates=None):
+    return os.client(
+        c.Credentials.from_dict(credentials, auth_cache),
+        pool_size,
+        tracer,
+        throttling.Throttle(rates, concurrency=pool_size),
+    )
+
+
+def upload(credentials, resources, limits=None, auth_cache=None,
+           pool_size=os.POOL_SIZE, state=None, refresh=False, tracer=None,
+           rates=None, openstack=None, callback=None):
+    # A warm client may be handed in, it is only connected otherwise.
+    if openstack is None:
+        openstack = connect(credentials, auth_cache, pool_size, tracer, rates)
+
+    with executor.ServiceExecutor(limits) as pool:
+        def submit(resource):
+            if state and is_unchanged(resource, openstack, state, refresh):
+                task = futures.Future()
+                task.set_result(state.get(resource.key))
+                return task
+
+            service = get_service(resource)
+            return pool.submit(service, upload_resource, resource, openstack)
+
+        def collect(resource, task):
+            result = get_result(resource, task)
+            if state:
+                record_result(state, result)
+            if callback:
+                callback(result)
+            return result
+
+        results = scheduler.Scheduler(submit, collect).run(resources)
+
+    if state:
+        unchanged = len([
+            result for result in results
+            if isinstance(result.value, st.AppliedResource)
+        ])
+        logger.info("%d of %d resources unchanged", unchanged, len(results))
+
+    return results
+
+
+def destroy(credentials, resources, limits=None, auth_cache=None,
+            pool_size=os.POOL_SIZE, state=None, refresh=False, tracer=None,
+            rates=None, openstack=None, callback=None):
+    if openstack is None:
+        openstack = connect(credentials, auth_cache, pool_size, tracer, rates)
+
+    with executor.ServiceExecutor(limits) as pool:
+        def submit(resource):
+            service = get_service(resource)
+            return pool.submit(service, delete_resource, resource, openstack)
+
+        def collect(resource, task):
+            result = get_deletion_result(resource, task)
+            if state and result.succeeded:
+                state.remove(resource.key)
+            if callback:
+                callback(result)
+            return result
+
+        # Dependents go first, everything else is deleted in parallel.
+        return scheduler.Scheduler(submit, collect).run(
+            resources, reverse=True)
+
+
+def apply(credentials, resources, limits=None, auth_cache=None,
+          pool_size=os.POOL_SIZE, state_path=None, refresh=False,
+          trace_path=None, rates=None, operation=upload, openstack=None,
+          callback=None):
+    tracer = None
+    if trace_path:
+        tracer = tracing.Tracer()
+
+    try:
+        if not state_path:
+            return operation(credentials, resources, limits, auth_cache,
+                             pool_size, tracer=tracer, rates=rates,
+                             openstack=openstack, callback=callback)
 
-    for resource in resources:
-        upload_resource(resource)
+        with st.StateStore(state_path) as state:
+            return operation(credentials, resources, limits, auth_cache,
+                             pool_size, state, refresh, tracer, rates,
+                             openstack, callback)
+    finally:
+        if tracer:
+            tracer.write(trace_path)
+            tracer.log_summary()
@@ -0,0 +1,147 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import glob
+import itertools
+import multiprocessing
+import os
+
+from six.moves import zip
+
+from openstack_env import context
+from openstack_env import exceptions as e
+from openstack_env import generators
+from openstack_env import registry
+
+# Below this many files, forking a pool costs more than it saves.
+PARALLEL_THRESHOLD = 16
+
+GLOB_CHARACTERS = "*?["
+
+
+def _is_manifest(path):
+    __, extension = os.path.splitext(path)
+    return (not os.path.basename(path).startswith(".") and
+            registry.resource_loaders.get(extension[1:].lower()) is not None)
+
+
+def _walk(directory):
+    paths = []
+
+    for root, directories, files in os.walk(directory):
+        directories[:] = [name for name in directories
+                          if not name.startswith(".")]
+        for name in files:
+            path = os.path.join(root, name)
+            if _is_manifest(path):
+                paths.append(path)
+
+    return sorted(paths)
+
+
+def _glob(pattern):
+    try:
+        return sorted(glob.glob(pattern, recursive=True))
+    except TypeError:
+        # No "**" before Python 3.5.
+        return sorted(glob.glob(pattern))
+
+
+def expand(paths):
+    # Directories and patterns expand in sorted order, so that the resources
+    # always come out in the same order.
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(_walk(path))
+        elif any(character in path for character in GLOB_CHARACTERS):
+            matches = _glob(path)
+            if not matches:
+                raise e.UnsupportedResourceDefinitionTypeException(path)
+            for match in matches:
+                if os.path.isdir(match):
+                    files.extend(_walk(match))
+                elif _is_manifest(match):
+                    files.append(match)
+        else:
+            files.append(path)
+
+    return files
+
+
+def load_file(path):
+    resource_loader = context.get_resource_loader(path)
+    items = getattr(resource_loader, "items", None)
+    if items is None:
+        return list(resource_loader.load(path))
+
+    # Matrix entries are sent back as they are and expanded lazily by the
+    # caller, a worker would otherwise hold and pickle the whole expansion.
+    entries = []
+    for item in items(path):
+        if isinstance(item, dict) and generators.MATRIX in item:
+            entries.append(_Template(item))
+        else:
+            entries.extend(resource_loader.expand([item]))
+    return entries
+
+
+def load(paths, processes=None):
+    files = expand(paths)
+
+    # Fails early on unsupported files, before anything is parsed.
+    resource_loaders = [context.get_resource_loader(path) for path in files]
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes < 2 or len(files) < PARALLEL_THRESHOLD:
+        return itertools.chain.from_iterable(
+            resource_loader.load(path)
+            for resource_loader, path in zip(resource_loaders, files)
+        )
+
+    # The pool is forked here rather than when the resources are first read,
+    # which may be after the upload threads have started.
+    pool = multiprocessing.Pool(min(processes, len(files)))
+    return _load_parallel(pool, files)
+
+
+class _Template(object):
+    def __init__(self, item):
+        self.item = item
+
+
+def _load_parallel(pool, files):
+    try:
+        # imap keeps the order of the files, whatever order they are parsed in.
+        for path, entries in zip(files, pool.imap(load_file, files)):
+            for entry in entries:
+                if isinstance(entry, _Template):
+                    resource_loader = context.get_resource_loader(path)
+                    for resource in resource_loader.expand([entry.item]):
+                        yield resource
+                else:
+                    yield entry
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -18,95 +18,193 @@
 # under the License.
 
 
-import glanceclient as glance_client
-from keystoneclient.v2_0 import client as identity_client
-from novaclient import client as compute_client
-from saharaclient.api import client as data_processing_client
+import threading
+
+from openstack_env import inventory
+from openstack_env import lazy
+from openstack_env import throttling
+from openstack_env import tracing
+from openstack_env import watchers
+
+# Service clients are imported on first use, so that a run which never talks
+# to a service does not pay for importing its client.
+glance_client = lazy.module("glanceclient")
+keystone_session = lazy.module("keystoneclient.session")
+identity_client = lazy.module("keystoneclient.v2_0.client")
+compute_client = lazy.module("novaclient.client")
+requests = lazy.module("requests")
+adapters = lazy.module("requests.adapters")
+data_processing_client = lazy.module("saharaclient.api.client")
 
 GLANCE_VERSION = 1
 NOVA_VERSION = 2
 
+POOL_SIZE = 16
 
-def client(credentials):
-    return OpenStack(credentials)
 
+def client(credentials, pool_size=POOL_SIZE, tracer=None, throttle=None):
+    return OpenStack(credentials, pool_size, tracer, throttle)
 
-def identity(credentials):
-    return identity_client.Client(
-        username=credentials.user_name,
-        password=credentials.password,
-        tenant_name=credentials.tenant,
-        auth_url=credentials.auth_url,
+
+def http_adapter(pool_size=POOL_SIZE):
+    return adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
     )
 
 
-def compute(credentials):
-    return compute_client.Client(
-        version=NOVA_VERSION,
-        username=credentials.user_name,
-        api_key=credentials.password,
-        project_id=credentials.tenant,
-        auth_url=credentials.auth_url,
+def session(credentials, adapter):
+    http_session = requests.Session()
+    http_session.mount("http://", adapter)
+    http_session.mount("https://", adapter)
+
+    return keystone_session.Session(
+        auth=credentials.auth,
+        session=http_session,
     )
 
 
-def images(credentials):
-    return glance_client.Client(
+def identity(session):
+    return identity_client.Client(session=session)
+
+
+def compute(session):
+    return compute_client.Client(NOVA_VERSION, session=session)
+
+
+def images(credentials, adapter):
+    image_client = glance_client.Client(
         version=GLANCE_VERSION,
         endpoint=_get_url("image", credentials),
         token=credentials.auth_token,
     )
 
+    # Glance does not accept a keystone session, but sharing the adapter
+    # still lets it reuse the pooled connections.
+    image_client.http_client.session.mount("http://", adapter)
+    image_client.http_client.session.mount("https://", adapter)
 
-def data_processing(credentials):
-    sahara_url = _get_url("data-processing", credentials)
-    sahara_url += "/" + credentials.tenant_id
+    return image_client
+
+
+def data_processing(credentials, session):
+    sahara_url = _get_url("data-processing", credentials).rstrip("/")
+    if not sahara_url.endswith("/" + credentials.tenant_id):
+        sahara_url += "/" + credentials.tenant_id
 
     return data_processing_client.Client(
-        input_auth_token=credentials.auth_token,
-        project_name=credentials.tenant,
+        session=session,
         sahara_url=sahara_url,
     )
 
 
-def _get_url(service_type, credentials):
-    i_client = identity(credentials)
+def is_unauthorized(error):
+    status = getattr(error, "http_status", None)
+    return (status or getattr(error, "code", None)) == 401
 
-    service = i_client.services.find(type=service_type)
-    endpoint = i_client.endpoints.find(service_id=service.id)
 
-    return endpoint.publicurl
+def _get_url(service_type, credentials):
+    return credentials.endpoint(service_type)
 
 
 class OpenStack(object):
-    def __init__(self, credentials):
+    def __init__(self, credentials, pool_size=POOL_SIZE, tracer=None,
+                 throttle=None):
         self._credentials = credentials
+        self._tracer = tracer or tracing.NULL_TRACER
+        if tracer:
+            tracer.services = credentials.endpoints
+        self._throttle = throttle or throttling.Throttle(
+            concurrency=pool_size)
+        self._throttle.services = self.service_type
+
+        # Throttling wraps tracing, so that every retry shows up in traces.
+        self._adapter = self._throttle.instrument(
+            self._tracer.instrument(http_adapter(pool_size)))
+        self._credentials.mount(self._adapter)
+        self._session = session(credentials, self._adapter)
         self._compute = None
         self._images = None
+        self._images_token = None
         self._identity = None
         self._data_processing = None
-        self._auth_token = None
+        self._image_watcher = None
+        self._inventory = None
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self):
+        return self._credentials
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    def invalidate(self, auth_token=None):
+        return self._credentials.invalidate(auth_token)
+
+    def service_type(self, url):
+        # Token requests must not look at the catalog they are fetching.
+        if url.startswith(self._credentials.auth_url):
+            return "identity"
+
+        for endpoint, service_type in self._credentials.endpoints():
+            if url.startswith(endpoint):
+                return service_type
+        return None
 
     @property
     def compute(self):
-        if not self._compute:
-            self._compute = compute(self._credentials)
+        with self._lock:
+            if not self._compute:
+                self._compute = compute(self._session)
         return self._compute
 
     @property
     def images(self):
-        if not self._images:
-            self._images = images(self._credentials)
+        auth_token = self._credentials.auth_token
+
+        with self._lock:
+            if not self._images or self._images_token != auth_token:
+                self._images = images(self._credentials, self._adapter)
+                self._images_token = auth_token
         return self._images
 
     @property
     def identity(self):
-        if not self._identity:
-            self._identity = identity(self._credentials)
+        with self._lock:
+            if not self._identity:
+                self._identity = identity(self._session)
         return self._identity
 
     @property
     def data_processing(self):
-        if not self._data_processing:
-            self._data_processing = data_processing(self._credentials)
+        with self._lock:
+            if not self._data_processing:
+                self._data_processing = data_processing(
+                    self._credentials, self._session)
         return self._data_processing
+
+    @property
+    def image_watcher(self):
+        with self._lock:
+            if not self._image_watcher:
+                self._image_watcher = watchers.ImageStatusWatcher(
+                    self, tracer=self._tracer)
+        return self._image_watcher
+
+    @property
+    def inventory(self):
+        with self._lock:
+            if not self._inventory:
+                self._inventory = inventory.Inventory(self)
+        return self._inventory
+
+    def reset_inventory(self):
+        # Listed again on next use, for clients that outlive a single run.
+        with self._lock:
+            self._inventory = None
@@ -0,0 +1,144 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import importlib
+import threading
+
+import six
+
+from openstack_env import lazy
+
+pkg_resources = lazy.module("pkg_resources")
+
+DEFINITIONS_GROUP = "openstack_env.resource_definitions"
+MANAGERS_GROUP = "openstack_env.resource_managers"
+LOADERS_GROUP = "openstack_env.resource_loaders"
+
+
+def load_target(target):
+    module_name, __, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class Registry(object):
+    # Maps a name to a lazily imported plugin. Built-in plugins are registered
+    # as "module:attribute" strings, anything unknown is looked up among the
+    # setuptools entry points of the group, which are only scanned once and
+    # only when a name is missing.
+    def __init__(self, group, factory=None):
+        self._group = group
+        self._factory = factory
+        self._targets = {}
+        self._plugins = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+
+    @property
+    def group(self):
+        return self._group
+
+    def register(self, name, target):
+        with self._lock:
+            self._targets[name] = target
+            self._plugins.pop(name, None)
+
+    def get(self, name):
+        try:
+            return self._plugins[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._plugins:
+                self._plugins[name] = self._load(name)
+            return self._plugins[name]
+
+    def names(self):
+        with self._lock:
+            self._discover()
+            return sorted(self._targets)
+
+    def _load(self, name):
+        if name not in self._targets:
+            self._discover()
+
+        target = self._targets.get(name)
+        if target is None:
+            return None
+
+        if isinstance(target, six.string_types):
+            plugin = load_target(target)
+        else:
+            plugin = target.load()
+
+        if self._factory is not None:
+            plugin = self._factory(plugin)
+        return plugin
+
+    def _discover(self):
+        if self._discovered:
+            return
+        self._discovered = True
+
+        try:
+            entry_points = list(pkg_resources.iter_entry_points(self._group))
+        except ImportError:
+            return
+
+        for entry_point in entry_points:
+            # Built-in plugins take precedence over third-party ones.
+            self._targets.setdefault(entry_point.name, entry_point)
+
+
+def instantiate(plugin):
+    return plugin()
+
+
+resource_definitions = Registry(DEFINITIONS_GROUP)
+resource_managers = Registry(MANAGERS_GROUP, factory=instantiate)
+resource_loaders = Registry(LOADERS_GROUP, factory=instantiate)
+
+for name, attribute in (
+    ("security_rule", "SecurityRuleResourceDefinition"),
+    ("key_pair", "KeyPairResourceDefinition"),
+    ("flavor", "FlavorResourceDefinition"),
+    ("image", "ImageResourceDefinition"),
+    ("dp_image", "DataProcessingImageResourceDefinition"),
+):
+    resource_definitions.register(
+        name, "openstack_env.resources:" + attribute)
+
+for name, attribute in (
+    ("security_rule", "SecurityRuleResourceManager"),
+    ("key_pair", "KeyPairResourceManager"),
+    ("flavor", "FlavorResourceManager"),
+    ("image", "ImageResourceManager"),
+    ("dp_image", "DataProcessingImageResourceManager"),
+):
+    resource_managers.register(
+        name, "openstack_env.resource_managers:" + attribute)
+
+for name, attribute in (
+    ("json", "JsonFileResourceDefinitionLoader"),
+    ("yaml", "YamlFileResourceDefinitionLoader"),
+    ("yml", "YamlFileResourceDefinitionLoader"),
+):
+    resource_loaders.register(
+        name, "openstack_env.resource_loaders:" + attribute)
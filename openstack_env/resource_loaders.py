@@ -18,75 +18,69 @@
 # under the License.
 
 
+import abc
 import json
 import os.path
 
+from openstack_env import context
 from openstack_env import domain as d
-from openstack_env import resources as r
+from openstack_env import generators
+from openstack_env import jsonstream
+from openstack_env import lazy
 
+yaml = lazy.module("yaml")
+
+
+class FileResourceDefinitionLoader(d.ResourceDefinitionLoader):
+    extensions = ()
 
-class JsonFileResourceDefinitionLoader(d.ResourceDefinitionLoader):
     def supports(self, path):
         __, extension = os.path.splitext(path)
-        return ".json" == extension
+        return extension.lower() in self.extensions
 
     def load(self, path):
-        with open(path) as json_file:
-            items = json.load(json_file)["resources"]
+        for resource in self.expand(self.items(path)):
+            yield resource
+
+    # Returns the raw items of a file, which may be read lazily.
+    @abc.abstractmethod
+    def items(self, path):
+        return
 
-        return [self.parse(item) for item in items]
+    def expand(self, items):
+        for item in items:
+            for expanded in generators.expand(item):
+                yield self.parse(expanded)
 
     def parse(self, item):
-        if item["type"] == "security_rule":
-            return self.parse_security_rule(item)
-
-        if item["type"] == "key_pair":
-            return self.parse_key_pair(item)
-
-        if item["type"] == "flavor":
-            return self.parse_flavor(item)
-
-        if item["type"] == "image":
-            return self.parse_image(item)
-
-        if item["type"] == "dp_image":
-            return self.parse_data_processing_image(item)
-
-    def parse_security_rule(self, item):
-        return r.SecurityRuleResourceDefinition(
-            protocol=item["protocol"],
-            from_port=item["from"],
-            to_port=item["to"],
-            cidr=item["cidr"],
-        )
-
-    def parse_key_pair(self, item):
-        return r.KeyPairResourceDefinition(
-            name=item["name"],
-            path=item["path"],
-        )
-
-    def parse_flavor(self, item):
-        return r.FlavorResourceDefinition(
-            name=item["name"],
-            ram_size=item["ram"],
-            cpu_count=item["vcpus"],
-            disk_size=item["disk"],
-            id=item["id"],
-            ephemeral_disk_size=item["ephemeral"],
-            swap_size=item["swap"],
-            is_public=item["is_public"],
-        )
-
-    def parse_image(self, item):
-        return r.ImageResourceDefinition(
-            name=item["name"],
-            url=item["url"],
-            disk_format=item["disk_format"],
-            container_format=item["container_format"],
-            is_public=item["is_public"],
-        )
-
-    def parse_data_processing_image(self, item):
-        # TODO: Implement
-        raise NotImplementedError()
+        resource_definition = context.get_resource_definition(
+            item.get("type"))
+        return resource_definition.from_dict(item)
+
+
+class JsonFileResourceDefinitionLoader(FileResourceDefinitionLoader):
+    extensions = (".json",)
+
+    def __init__(self, streaming=True):
+        self._streaming = streaming
+
+    def items(self, path):
+        with open(path) as json_file:
+            if self._streaming:
+                items = jsonstream.iter_array(json_file, "resources")
+            else:
+                items = json.load(json_file)["resources"]
+
+            for item in items:
+                yield item
+
+
+class YamlFileResourceDefinitionLoader(FileResourceDefinitionLoader):
+    extensions = (".yaml", ".yml")
+
+    def items(self, path):
+        # The LibYAML based loader is several times faster, when available.
+        loader = getattr(yaml, "CSafeLoader", None) or yaml.SafeLoader
+
+        with open(path) as yaml_file:
+            return yaml.load(yaml_file, Loader=loader)["resources"]
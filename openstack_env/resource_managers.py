@@ -18,27 +18,96 @@
 # under the License.
 
 
-import time
+import collections
+import io
+import logging
+import os
 
-import glanceclient.openstack.common.apiclient.exceptions as ge
-import novaclient.exceptions as ne
+from concurrent import futures
 
 from openstack_env import domain as d
 from openstack_env import exceptions as e
+from openstack_env import inventory
+from openstack_env import lazy
 from openstack_env import resources as r
+from openstack_env import streams
+from openstack_env import watchers
+
+ne = lazy.module("novaclient.exceptions")
+
+logger = logging.getLogger(__name__)
+
+
+# What Sahara knows about an image, as kept in the inventory after changing
+# it.
+Registration = collections.namedtuple(
+    "Registration", ("id", "username", "tags"))
 
 
 class ResourceTypeAware(object):
     def supports(self, resource):
-        return isinstance(resource, self.type)
+        return resource.resource_type == self.type.resource_type
+
+
+def _is_not_found(error):
+    # Nova and Glance report missing items with a 404 code, Sahara with a
+    # 404 error code.
+    return 404 in (getattr(error, "code", None),
+                   getattr(error, "error_code", None))
+
+
+def _then(future, function):
+    # The function runs in the thread which completes the future (the image
+    # watcher for images), so it should only make a few quick calls.
+    result = futures.Future()
+
+    def done(future):
+        try:
+            result.set_result(function(future.result()))
+        except Exception as ex:
+            result.set_exception(ex)
+
+    future.add_done_callback(done)
+    return result
+
+
+def _delete(resource, collection, item, delete):
+    if item is None:
+        raise e.ResourceNotFoundException(resource)
+
+    try:
+        delete()
+    except Exception as ex:
+        if not _is_not_found(ex):
+            raise
+        collection.remove(item)
+        raise e.ResourceNotFoundException(resource)
+
+    collection.remove(item)
 
 
 class SecurityRuleResourceManager(ResourceTypeAware, d.ResourceManager):
     type = r.SecurityRuleResourceDefinition
+    service = "compute"
+
+    def exists(self, resource, client):
+        return client.inventory.security_rules.contains(
+            "rule", self.key(resource))
+
+    def key(self, resource):
+        return inventory.rule_key(
+            resource.protocol,
+            resource.from_port,
+            resource.to_port,
+            resource.cidr,
+        )
 
     def upload(self, resource, client):
+        if self.exists(resource, client):
+            raise e.ResourceAlreadyExistsException(resource)
+
         try:
-            return client.compute.security_group_default_rules.create(
+            rule = client.compute.security_group_default_rules.create(
                 ip_protocol=resource.protocol,
                 from_port=resource.from_port,
                 to_port=resource.to_port,
@@ -47,25 +116,64 @@ class SecurityRuleResourceManager(ResourceTypeAware, d.ResourceManager):
         except ne.Conflict:
             raise e.ResourceAlreadyExistsException(resource)
 
+        client.inventory.security_rules.add(rule)
+        return rule
+
+    def delete(self, resource, client):
+        rules = client.inventory.security_rules
+        rule = rules.find("rule", self.key(resource))
+
+        _delete(resource, rules, rule, lambda: (
+            client.compute.security_group_default_rules.delete(rule.id)))
+
 
 class KeyPairResourceManager(ResourceTypeAware, d.ResourceManager):
     type = r.KeyPairResourceDefinition
+    service = "compute"
+
+    def exists(self, resource, client):
+        return client.inventory.key_pairs.contains("name", resource.name)
 
     def upload(self, resource, client):
+        if self.exists(resource, client):
+            raise e.ResourceAlreadyExistsException(resource)
+
         try:
             with open(resource.path) as key_file:
                 key = key_file.read()
-                return client.compute.keypairs.create(resource.name, key)
+                key_pair = client.compute.keypairs.create(resource.name, key)
         except ne.Conflict:
             raise e.ResourceAlreadyExistsException(resource)
 
+        client.inventory.key_pairs.add(key_pair)
+        return key_pair
+
+    def delete(self, resource, client):
+        key_pairs = client.inventory.key_pairs
+        key_pair = key_pairs.find("name", resource.name)
+
+        _delete(resource, key_pairs, key_pair,
+                lambda: client.compute.keypairs.delete(key_pair))
+
 
 class FlavorResourceManager(ResourceTypeAware, d.ResourceManager):
     type = r.FlavorResourceDefinition
+    service = "compute"
+
+    def exists(self, resource, client):
+        return self.find(resource, client) is not None
+
+    def find(self, resource, client):
+        flavors = client.inventory.flavors
+        return (flavors.find("name", resource.name) or
+                flavors.find("id", resource.id))
 
     def upload(self, resource, client):
+        if self.exists(resource, client):
+            raise e.ResourceAlreadyExistsException(resource)
+
         try:
-            return client.compute.flavors.create(
+            flavor = client.compute.flavors.create(
                 name=resource.name,
                 ram=resource.ram_size,
                 vcpus=resource.cpu_count,
@@ -78,44 +186,221 @@ class FlavorResourceManager(ResourceTypeAware, d.ResourceManager):
         except ne.Conflict:
             raise e.ResourceAlreadyExistsException(resource)
 
+        client.inventory.flavors.add(flavor)
+        return flavor
+
+    def delete(self, resource, client):
+        flavor = self.find(resource, client)
+
+        _delete(resource, client.inventory.flavors, flavor,
+                lambda: client.compute.flavors.delete(flavor.id))
+
 
 class ImageResourceManager(ResourceTypeAware, d.ResourceManager):
     type = r.ImageResourceDefinition
+    service = "images"
 
     def exists(self, resource, client):
-        try:
-            client.images.images.find(name=resource.name)
-        except ge.NotFound:
-            return False
-        else:
-            return True
+        return client.inventory.images.contains("name", resource.name)
 
     def upload(self, resource, client):
         if self.exists(resource, client):
             raise e.ResourceAlreadyExistsException(resource)
 
-        image = client.images.images.create(
-            name=resource.name,
-            copy_from=resource.url,
-            disk_format=resource.disk_format,
-            container_format=resource.container_format,
-            is_public=resource.is_public,
-        )
+        checksum = self.get_checksum(resource, client)
+        duplicate = self.find_duplicate(checksum, client)
+        if duplicate:
+            logger.info("Image \"%s\" has the same content as existing image "
+                        "\"%s\" (%s), skipping upload",
+                        resource, duplicate.name, duplicate.id)
+            # Found by its manifest name from now on, for the resources
+            # which depend on it and for exists().
+            client.inventory.images.alias("name", resource.name, duplicate)
+            return duplicate
+
+        fields = {
+            "name": resource.name,
+            "disk_format": resource.disk_format,
+            "container_format": resource.container_format,
+            "is_public": resource.is_public,
+        }
+        if checksum:
+            fields["checksum"] = checksum
+
+        if resource.path:
+            image = self.upload_file(resource, client, fields)
+        elif not resource.url:
+            raise e.InvalidResourceException(
+                resource, "either \"url\" or \"path\" is required")
+        else:
+            image = client.images.images.create(
+                copy_from=resource.url, **fields)
+        client.inventory.images.add(image)
+
+        if image.status == watchers.ACTIVE:
+            return image
+
+        return client.image_watcher.watch(image, watchers.ACTIVE)
+
+    def delete(self, resource, client):
+        images = client.inventory.images
+        image = images.find("name", resource.name)
+
+        if images.is_alias("name", resource.name):
+            logger.info("Image \"%s\" shares the existing image \"%s\" (%s), "
+                        "leaving it in place", resource, image.name, image.id)
+            images.unalias("name", resource.name)
+            return None
+
+        _delete(resource, images, image,
+                lambda: client.images.images.delete(image.id))
+
+        # Deletions are awaited together, the watcher polls all pending
+        # images with the same listing.
+        return client.image_watcher.watch(image, watchers.DELETED)
+
+    def get_checksum(self, resource, client):
+        if resource.checksum:
+            return resource.checksum.lower()
+
+        # Compressed files would have to be decompressed just to find their
+        # digest, so those are only deduplicated by a manifest checksum.
+        if not resource.path or streams.detect_compression(resource.path):
+            return None
+
+        # Hashing ahead means reading the file twice, which is only worth it
+        # when an image of the same size could be a duplicate. Otherwise the
+        # digest is computed while uploading.
+        size = os.path.getsize(resource.path)
+        if client.inventory.images.contains("size", size):
+            return streams.file_md5(resource.path)
+
+    def find_duplicate(self, checksum, client):
+        if checksum:
+            return client.inventory.images.find("checksum", checksum)
+
+    def upload_file(self, resource, client, fields):
+        compression = streams.detect_compression(resource.path)
+
+        with io.open(resource.path, "rb",
+                     buffering=streams.CHUNK_SIZE) as image_file:
+            if compression:
+                source = streams.DecompressingReader(image_file, compression)
+            else:
+                source = image_file
+                fields["size"] = os.path.getsize(resource.path)
+
+            reader = streams.ChecksummingReader(source)
+            try:
+                image = client.images.images.create(data=reader, **fields)
+            finally:
+                if compression:
+                    source.close()
+
+        logger.info("Uploaded image \"%s\": %s, md5 %s, sha256 %s",
+                    resource, reader.report(), reader.md5, reader.sha256)
+        if compression:
+            logger.info("Decompressed %s image \"%s\": %s",
+                        compression, resource, source.report())
 
-        self.wait_for_status(image, "active", client)
+        if image.checksum and image.checksum != reader.md5:
+            raise e.ChecksumMismatchException(
+                resource, reader.md5, image.checksum)
 
         return image
 
-    def get_status(self, image, client):
-        return client.images.images.get(image.id).status
+    def wait_for_status(self, image, status, client, timeout=None):
+        return client.image_watcher.watch(image, status, timeout).result()
 
-    def wait_for_status(self, image, status, client, timeout=3600, period=10):
-        start_time = time.time()
 
-        while time.time() - start_time < timeout:
-            if self.get_status(image, client) == status:
-                return
+class DataProcessingImageResourceManager(ResourceTypeAware,
+                                         d.ResourceManager):
+    type = r.DataProcessingImageResourceDefinition
+    service = "data_processing"
 
-            time.sleep(period)
+    def __init__(self):
+        self._images = ImageResourceManager()
+
+    def exists(self, resource, client):
+        image = client.inventory.images.find("name", resource.name)
+        return image is not None and self.is_registered(
+            resource, self.find_registration(image, client))
+
+    def find_registration(self, image, client):
+        return client.inventory.data_processing_images.find("id", image.id)
+
+    def is_registered(self, resource, registration):
+        return (registration is not None and
+                registration.username == resource.user and
+                set(resource.tags).issubset(registration.tags))
+
+    def upload(self, resource, client):
+        image = self.get_image(resource, client)
+
+        # An image still being saved is registered once it is active, the
+        # worker is not held meanwhile.
+        if isinstance(image, futures.Future):
+            return _then(image, lambda image: self.register(
+                resource, image, client))
+        return self.register(resource, image, client)
+
+    def register(self, resource, image, client):
+        registration = self.find_registration(image, client)
+        if self.is_registered(resource, registration):
+            raise e.ResourceAlreadyExistsException(resource)
+
+        # At most one call registers the user and one adds all the missing
+        # tags, tags set by others are kept.
+        images = client.data_processing.images
+        if registration is None or registration.username != resource.user:
+            images.update_image(image.id, resource.user)
+
+        tags = set(registration.tags if registration else ())
+        if not tags.issuperset(resource.tags):
+            images.update_tags(image.id, sorted(tags.union(resource.tags)))
+
+        registrations = client.inventory.data_processing_images
+        if registration is not None:
+            registrations.remove(registration)
+        registrations.add(Registration(
+            image.id, resource.user, sorted(tags.union(resource.tags))))
+        return image
+
+    def get_image(self, resource, client):
+        image = client.inventory.images.find("name", resource.name)
+
+        if image is None:
+            if not (resource.url or resource.path):
+                raise e.InvalidResourceException(
+                    resource, "image \"%s\" does not exist" % resource.name)
+            for field in ("disk_format", "container_format", "is_public"):
+                if getattr(resource, field) is None:
+                    raise e.InvalidResourceException(
+                        resource, "\"%s\" is required to upload the image"
+                        % field)
+            image = self._images.upload(resource, client)
+
+        if (not isinstance(image, futures.Future) and
+                image.status != watchers.ACTIVE):
+            # Shares the polling with every other image being waited for.
+            image = client.image_watcher.watch(image, watchers.ACTIVE)
+        return image
+
+    def delete(self, resource, client):
+        registrations = client.inventory.data_processing_images
+        image = client.inventory.images.find("name", resource.name)
+        registration = None
+        if image is not None:
+            registration = self.find_registration(image, client)
+
+        try:
+            _delete(resource, registrations, registration,
+                    lambda: client.data_processing.images.unregister_image(
+                        image.id))
+        except e.ResourceNotFoundException:
+            if not (resource.url or resource.path):
+                raise
 
-        raise e.TimeoutException()
+        # An image uploaded for this resource goes away with it.
+        if resource.url or resource.path:
+            return self._images.delete(resource, client)
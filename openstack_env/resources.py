@@ -22,122 +22,77 @@ from openstack_env import domain as d
 
 
 class SecurityRuleResourceDefinition(d.ResourceDefinition):
-    def __init__(self, protocol, from_port, to_port, cidr):
-        self._protocol = protocol
-        self._from_port = from_port
-        self._to_port = to_port
-        self._cidr = cidr
+    resource_type = "security_rule"
 
-    @property
-    def protocol(self):
-        return self._protocol
-
-    @property
-    def from_port(self):
-        return self._from_port
-
-    @property
-    def to_port(self):
-        return self._to_port
+    fields = (
+        d.Field("protocol"),
+        d.Field("from_port", source="from"),
+        d.Field("to_port", source="to"),
+        d.Field("cidr"),
+    )
 
     @property
-    def cidr(self):
-        return self._cidr
+    def key(self):
+        return "%s:%s:%s-%s:%s" % (
+            self.resource_type,
+            self.protocol,
+            self.from_port,
+            self.to_port,
+            self.cidr,
+        )
 
 
 class KeyPairResourceDefinition(d.ResourceDefinition):
-    def __init__(self, name, path):
-        self._name = name
-        self._path = path
+    resource_type = "key_pair"
 
-    @property
-    def name(self):
-        return self._name
-
-    @property
-    def path(self):
-        return self._path
+    fields = (
+        d.Field("name"),
+        d.Field("path", local=True),
+    )
 
 
 class FlavorResourceDefinition(d.ResourceDefinition):
-    def __init__(self, name, ram_size, cpu_count, disk_size, id,
-                 ephemeral_disk_size, swap_size, is_public):
-        self._name = name
-        self._ram_size = ram_size
-        self._cpu_count = cpu_count
-        self._disk_size = disk_size
-        self._id = id
-        self._ephemeral_disk_size = ephemeral_disk_size
-        self._swap_size = swap_size
-        self._is_public = is_public
-
-    @property
-    def name(self):
-        return self._name
-
-    @property
-    def ram_size(self):
-        return self._ram_size
-
-    @property
-    def cpu_count(self):
-        return self._cpu_count
-
-    @property
-    def disk_size(self):
-        return self._disk_size
-
-    @property
-    def id(self):
-        return self._id
+    resource_type = "flavor"
 
-    @property
-    def ephemeral_disk_size(self):
-        return self._ephemeral_disk_size
-
-    @property
-    def swap_size(self):
-        return self._swap_size
-
-    @property
-    def is_public(self):
-        return self._is_public
+    fields = (
+        d.Field("name"),
+        d.Field("ram_size", source="ram"),
+        d.Field("cpu_count", source="vcpus"),
+        d.Field("disk_size", source="disk"),
+        d.Field("id"),
+        d.Field("ephemeral_disk_size", source="ephemeral"),
+        d.Field("swap_size", source="swap"),
+        d.Field("is_public"),
+    )
 
 
 class ImageResourceDefinition(d.ResourceDefinition):
-    def __init__(self, name, url, disk_format, container_format, is_public):
-        self._name = name
-        self._url = url
-        self._disk_format = disk_format
-        self._container_format = container_format
-        self._is_public = is_public
+    resource_type = "image"
 
-    @property
-    def name(self):
-        return self._name
-
-    @property
-    def url(self):
-        return self._url
-
-    @property
-    def disk_format(self):
-        return self._disk_format
-
-    @property
-    def container_format(self):
-        return self._container_format
-
-    @property
-    def is_public(self):
-        return self._is_public
+    fields = (
+        d.Field("name"),
+        d.Field("disk_format"),
+        d.Field("container_format"),
+        d.Field("is_public"),
+        d.Field("url", default=None, local=True),
+        d.Field("path", default=None, local=True),
+        d.Field("checksum", default=None, local=True),
+    )
 
 
 class DataProcessingImageResourceDefinition(ImageResourceDefinition):
-    @property
-    def user(self):
-        return self._user
+    resource_type = "dp_image"
+
+    # An existing image is only registered, the image fields are needed
+    # just when it is uploaded from "url" or "path".
+    fields = (
+        d.Field("disk_format", default=None),
+        d.Field("container_format", default=None),
+        d.Field("is_public", default=None),
+        d.Field("user"),
+        d.Field("tags", default=(), convert=tuple),
+    )
 
     @property
-    def tags(self):
-        return self._tags
+    def requires(self):
+        return ("%s:%s" % (ImageResourceDefinition.resource_type, self.name),)
@@ -0,0 +1,241 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from concurrent import futures
+from six.moves import queue
+
+from openstack_env import exceptions as e
+
+
+def succeeded(result):
+    return result.succeeded or isinstance(
+        result.error, e.ResourceAlreadyExistsException)
+
+
+class Node(object):
+    def __init__(self, index, resource):
+        self.index = index
+        self.resource = resource
+        self.dependencies = set()
+        self.dependents = []
+        self.unresolved = 0
+        self.scheduled = False
+        self.error = None
+        self.result = None
+
+    @property
+    def ready(self):
+        return not (self.scheduled or self.dependencies or self.unresolved)
+
+    def add_dependency(self, node):
+        if node.result is not None:
+            if not succeeded(node.result):
+                self.error = e.DependencyFailedException(
+                    self.resource, node.resource)
+        elif node not in self.dependencies:
+            self.dependencies.add(node)
+            node.dependents.append(self)
+
+
+class Graph(object):
+    def __init__(self):
+        self.nodes = []
+        self._nodes_by_key = {}
+        self._waiting = {}
+
+    def add(self, resource):
+        node = Node(len(self.nodes), resource)
+        self.nodes.append(node)
+
+        for key in resource.depends_on:
+            self._link(node, key, True)
+
+        for key in resource.requires:
+            self._link(node, key, False)
+
+        if resource.key not in self._nodes_by_key:
+            self._nodes_by_key[resource.key] = node
+
+            for waiter, __ in self._waiting.pop(resource.key, ()):
+                waiter.unresolved -= 1
+                waiter.add_dependency(node)
+
+        return node
+
+    def close(self):
+        # Dependencies on resources that never appeared: explicit ones are
+        # errors, inferred ones are expected to exist in the cloud already.
+        unknown = []
+
+        for key, waiters in self._waiting.items():
+            for node, explicit in waiters:
+                node.unresolved -= 1
+                if explicit:
+                    unknown.append((node, key))
+
+        self._waiting = {}
+
+        return sorted(unknown, key=lambda item: item[0].index)
+
+    def reverse(self):
+        # Turns "depends on" into "is needed by", for tearing down. Only
+        # valid before anything has been scheduled.
+        for node in self.nodes:
+            node.dependencies, node.dependents = (
+                set(node.dependents), list(node.dependencies))
+
+    def cycles(self):
+        pending = [node for node in self.nodes if not node.scheduled]
+        counts = dict(
+            (node, len([dependency for dependency in node.dependencies
+                        if not dependency.scheduled]))
+            for node in pending
+        )
+        ready = [node for node in pending if not counts[node]]
+
+        while ready:
+            node = ready.pop()
+            del counts[node]
+
+            for dependent in node.dependents:
+                if dependent in counts:
+                    counts[dependent] -= 1
+                    if not counts[dependent]:
+                        ready.append(dependent)
+
+        return sorted(counts, key=lambda node: node.index)
+
+    def _link(self, node, key, explicit):
+        dependency = self._nodes_by_key.get(key)
+
+        if dependency is None:
+            node.unresolved += 1
+            self._waiting.setdefault(key, []).append((node, explicit))
+        else:
+            node.add_dependency(dependency)
+
+
+def build_graph(resources):
+    graph = Graph()
+
+    for resource in resources:
+        graph.add(resource)
+
+    for node, key in graph.close():
+        raise e.UnknownDependencyException(node.resource, key)
+
+    cycle = graph.cycles()
+    if cycle:
+        raise e.DependencyCycleException([node.resource for node in cycle])
+
+    return graph.nodes
+
+
+class Scheduler(object):
+    def __init__(self, submit, get_result):
+        self._submit = submit
+        self._get_result = get_result
+
+    def run(self, resources, reverse=False):
+        graph = Graph()
+        completed = queue.Queue()
+
+        def start(node):
+            node.scheduled = True
+
+            if node.error:
+                task = futures.Future()
+                task.set_exception(node.error)
+                completed.put((node, task))
+            else:
+                task = self._submit(node.resource)
+                task.add_done_callback(
+                    lambda task: completed.put((node, task)))
+
+        def finish(node, task):
+            node.result = self._get_result(node.resource, task)
+
+            for dependent in node.dependents:
+                if dependent.scheduled:
+                    continue
+
+                if not succeeded(node.result):
+                    dependent.error = e.DependencyFailedException(
+                        dependent.resource, node.resource)
+                    start(dependent)
+                    continue
+
+                dependent.dependencies.discard(node)
+                if dependent.ready:
+                    start(dependent)
+
+        # Resources are scheduled while they are still being read, handling
+        # whatever has completed in the meantime. In reverse, nothing can
+        # start before every dependent is known.
+        pending = 0
+        for resource in resources:
+            node = graph.add(resource)
+            pending += 1
+
+            if reverse:
+                continue
+
+            if node.error or node.ready:
+                start(node)
+
+            while True:
+                try:
+                    finished, task = completed.get_nowait()
+                except queue.Empty:
+                    break
+                finish(finished, task)
+                pending -= 1
+
+        unknown = graph.close()
+
+        if reverse:
+            # Whatever is missing from the manifest is not ours to wait for.
+            graph.reverse()
+        else:
+            for node, key in unknown:
+                if not node.scheduled:
+                    node.error = e.UnknownDependencyException(
+                        node.resource, key)
+                    start(node)
+
+        for node in graph.nodes:
+            if node.ready:
+                start(node)
+
+        cycle = graph.cycles()
+        if cycle:
+            error = e.DependencyCycleException(
+                [node.resource for node in cycle])
+
+            for node in cycle:
+                node.error = error
+                start(node)
+
+        while pending:
+            node, task = completed.get()
+            finish(node, task)
+            pending -= 1
+
+        return [node.result for node in graph.nodes]
@@ -0,0 +1,131 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    key TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    cloud_digest TEXT,
+    remote_id TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+COMMIT_INTERVAL = 500
+
+
+class AppliedResource(object):
+    def __init__(self, key, digest, remote_id, cloud_digest=None):
+        self._key = key
+        self._digest = digest
+        self._remote_id = remote_id
+        self._cloud_digest = cloud_digest
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def digest(self):
+        return self._digest
+
+    # Not known for resources recorded by older versions.
+    @property
+    def cloud_digest(self):
+        return self._cloud_digest
+
+    @property
+    def id(self):
+        return self._remote_id
+
+    def __str__(self):
+        return self._key
+
+
+class StateStore(object):
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(SCHEMA)
+        self._upgrade()
+        self._commit_interval = commit_interval
+        self._uncommitted = 0
+        self._applied = None
+
+    def get(self, key):
+        return self._load().get(key)
+
+    def is_current(self, resource):
+        applied = self.get(resource.key)
+        return applied is not None and applied.digest == resource.digest
+
+    def record(self, resource, remote_id=None):
+        applied = AppliedResource(resource.key, resource.digest, remote_id,
+                                  resource.cloud_digest)
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO resources "
+            "(key, type, digest, cloud_digest, remote_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (applied.key, resource.resource_type, applied.digest,
+             applied.cloud_digest, remote_id, time.time()),
+        )
+        self._load()[applied.key] = applied
+        self._changed()
+
+    def remove(self, key):
+        self._connection.execute("DELETE FROM resources WHERE key = ?", (key,))
+        self._load().pop(key, None)
+        self._changed()
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+    def _load(self):
+        if self._applied is None:
+            rows = self._connection.execute(
+                "SELECT key, digest, remote_id, cloud_digest FROM resources")
+            self._applied = dict(
+                (row[0], AppliedResource(*row)) for row in rows)
+        return self._applied
+
+    def _upgrade(self):
+        # Databases written before cloud digests were kept.
+        columns = [row[1] for row in self._connection.execute(
+            "PRAGMA table_info(resources)")]
+        if "cloud_digest" not in columns:
+            self._connection.execute(
+                "ALTER TABLE resources ADD COLUMN cloud_digest TEXT")
+
+    def _changed(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self._commit_interval:
+            self._connection.commit()
+            self._uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
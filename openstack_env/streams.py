@@ -0,0 +1,327 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import hashlib
+import io
+import os.path
+import threading
+import time
+import zlib
+
+from six.moves import queue
+
+from openstack_env import exceptions as e
+
+CHUNK_SIZE = 1024 * 1024
+
+# Number of decompressed chunks buffered between the decompression thread and
+# the upload.
+QUEUE_SIZE = 8
+
+MIB = 1024.0 * 1024.0
+
+GZIP = "gzip"
+XZ = "xz"
+ZSTD = "zstd"
+
+EXTENSIONS = {
+    ".gz": GZIP,
+    ".xz": XZ,
+    ".zst": ZSTD,
+}
+
+MAGIC_NUMBERS = (
+    (b"\x1f\x8b", GZIP),
+    (b"\xfd7zXZ\x00", XZ),
+    (b"\x28\xb5\x2f\xfd", ZSTD),
+)
+
+
+class ChecksummingReader(object):
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self._source = source
+        self._chunk_size = chunk_size
+        self._md5 = hashlib.md5()
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+        self._started = None
+        self._finished = None
+
+    @property
+    def md5(self):
+        return self._md5.hexdigest()
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def duration(self):
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.time()) - self._started
+
+    @property
+    def throughput(self):
+        duration = self.duration
+        return self._size / duration if duration else 0.0
+
+    def read(self, size=-1):
+        if self._started is None:
+            self._started = time.time()
+
+        if size is None or size < 0:
+            size = self._chunk_size
+
+        data = self._source.read(size)
+        if data:
+            self._md5.update(data)
+            self._sha256.update(data)
+            self._size += len(data)
+        else:
+            self._finished = time.time()
+
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self._chunk_size)
+            if not data:
+                return
+            yield data
+
+    def report(self):
+        return "%.1f MiB in %.1f s (%.1f MiB/s)" % (
+            self._size / MIB, self.duration, self.throughput / MIB)
+
+
+def file_md5(path, chunk_size=CHUNK_SIZE):
+    md5 = hashlib.md5()
+
+    with io.open(path, "rb", buffering=chunk_size) as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+
+def detect_compression(path):
+    __, extension = os.path.splitext(path)
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+
+    with io.open(path, "rb") as source:
+        header = source.read(8)
+
+    for magic_number, compression in MAGIC_NUMBERS:
+        if header.startswith(magic_number):
+            return compression
+
+
+def decompressor(compression):
+    if compression == GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if compression == XZ:
+        try:
+            import lzma
+        except ImportError:
+            try:
+                from backports import lzma
+            except ImportError:
+                raise e.UnsupportedCompressionException(compression)
+        return lzma.LZMADecompressor()
+
+    if compression == ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise e.UnsupportedCompressionException(compression)
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    raise e.UnsupportedCompressionException(compression)
+
+
+class DecompressingReader(object):
+    def __init__(self, source, compression, chunk_size=CHUNK_SIZE,
+                 queue_size=QUEUE_SIZE):
+        self._source = source
+        self._compression = compression
+        self._decompressor = decompressor(compression)
+        self._chunk_size = chunk_size
+        self._chunks = queue.Queue(queue_size)
+        self._buffer = b""
+        self._offset = 0
+        self._done = False
+        self._closed = False
+        self._compressed_size = 0
+        self._size = 0
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._decompress)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def compressed_size(self):
+        return self._compressed_size
+
+    @property
+    def size(self):
+        return self._size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._chunk_size
+
+        while self._offset >= len(self._buffer) and not self._done:
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                self._done = True
+                raise chunk
+            if chunk is None:
+                self._done = True
+            else:
+                self._buffer = chunk
+                self._offset = 0
+
+        # Slices from an offset, the rest of the chunk is not copied on
+        # every read.
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def close(self):
+        self._closed = True
+
+        # Unblock the decompression thread if it waits for free space.
+        while self._thread.is_alive():
+            try:
+                self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def report(self):
+        duration = time.time() - self._started or 1.0
+        return (
+            "compressed %.1f MiB (%.1f MiB/s), "
+            "uncompressed %.1f MiB (%.1f MiB/s)" % (
+                self._compressed_size / MIB,
+                self._compressed_size / MIB / duration,
+                self._size / MIB,
+                self._size / MIB / duration,
+            )
+        )
+
+    def _decompress(self):
+        try:
+            if self._compression == ZSTD:
+                self._decompress_stream()
+            else:
+                self._decompress_chunks()
+
+            if not self._closed:
+                self._chunks.put(None)
+        except Exception as ex:
+            self._chunks.put(ex)
+
+    def _decompress_chunks(self):
+        for chunk in iter(lambda: self._source.read(self._chunk_size), b""):
+            self._compressed_size += len(chunk)
+
+            for data in self._bounded(chunk):
+                if self._closed:
+                    return
+                self._put(data)
+
+        flush = getattr(self._decompressor, "flush", None)
+        if flush:
+            self._put(flush())
+
+    def _bounded(self, chunk):
+        # Every call returns at most one chunk. Disk images are mostly
+        # zeros, and a compressed chunk of zeros would otherwise become a
+        # thousand times larger in memory.
+        while chunk:
+            current = self._decompressor
+
+            if hasattr(current, "unconsumed_tail"):
+                # zlib keeps the input it did not get to.
+                yield current.decompress(chunk, self._chunk_size)
+                chunk = current.unconsumed_tail
+            elif hasattr(current, "needs_input"):
+                # lzma keeps it internally, until it asks for more.
+                yield current.decompress(chunk, self._chunk_size)
+                while not current.eof and not current.needs_input:
+                    yield current.decompress(b"", self._chunk_size)
+                chunk = b""
+            else:
+                # Older lzma backports cannot cap their output.
+                yield current.decompress(chunk)
+                chunk = b""
+
+            # Concatenated streams (e.g. multi-member gzip) need a fresh
+            # decompressor for each member.
+            if not chunk:
+                chunk = getattr(current, "unused_data", b"")
+                if chunk:
+                    self._decompressor = decompressor(self._compression)
+
+    def _decompress_stream(self):
+        import zstandard
+
+        source = _CountingReader(self._source)
+        zstd = zstandard.ZstdDecompressor()
+        try:
+            reader = zstd.stream_reader(
+                source, read_size=self._chunk_size, read_across_frames=True)
+        except TypeError:
+            # Versions which stop after the first frame.
+            reader = zstd.stream_reader(source, read_size=self._chunk_size)
+
+        for data in iter(lambda: reader.read(self._chunk_size), b""):
+            self._compressed_size = source.size
+            if self._closed:
+                return
+            self._put(data)
+        self._compressed_size = source.size
+
+    def _put(self, data):
+        if data:
+            self._size += len(data)
+            self._chunks.put(data)
+
+
+class _CountingReader(object):
+    def __init__(self, source):
+        self._source = source
+        self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def read(self, size=-1):
+        data = self._source.read(size)
+        self._size += len(data)
+        return data
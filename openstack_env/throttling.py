@@ -0,0 +1,278 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import calendar
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import six
+from six.moves.urllib import parse
+
+from openstack_env import lazy
+
+requests_exceptions = lazy.module("requests.exceptions")
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+# Rejected before being processed, so safe to send again whatever the method.
+THROTTLED_STATUSES = (413, 429)
+# May have been processed, so only idempotent requests are sent again.
+UNAVAILABLE_STATUSES = (502, 503, 504)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+MAX_RETRY_AFTER = 300
+
+
+def transient_errors():
+    return requests_exceptions.ConnectionError, requests_exceptions.Timeout
+
+
+def endpoint_key(url):
+    url = parse.urlsplit(url)
+    return "%s://%s/%s" % (url.scheme, url.netloc,
+                           url.path.lstrip("/").split("/", 1)[0])
+
+
+def retry_after(response, now=None):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        delay = float(value)
+    except ValueError:
+        date = email.utils.parsedate(value)
+        if not date:
+            return None
+        if now is None:
+            now = time.time()
+        delay = calendar.timegm(date) - now
+
+    return min(max(delay, 0), MAX_RETRY_AFTER)
+
+
+def is_replayable(body):
+    # Streamed bodies, such as image uploads, are consumed by the first try.
+    return body is None or isinstance(
+        body, (six.binary_type, six.text_type))
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        self._rate = float(rate)
+        self._capacity = float(burst or max(rate, 1))
+        self._tokens = self._capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def acquire(self):
+        # Takes a token right away and, when the bucket is empty, waits until
+        # it would have been refilled. Callers queue up in arrival order.
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self._rate
+
+        if delay > 0:
+            self._sleep(delay)
+
+
+class AdaptiveLimiter(object):
+    # Caps the number of requests in flight. The cap grows by one for every
+    # window of successful requests and halves whenever the cloud throttles
+    # us (additive increase, multiplicative decrease).
+    def __init__(self, maximum, minimum=1, decrease=0.5):
+        self._maximum = maximum
+        self._minimum = minimum
+        self._decrease = decrease
+        self._limit = float(maximum)
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return max(self._minimum, int(self._limit))
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self._active -= 1
+
+            if throttled:
+                self._limit = max(self._minimum,
+                                  self._limit * self._decrease)
+                logger.info("Throttled, reducing concurrency to %d",
+                            self.limit)
+            else:
+                self._limit = min(self._maximum,
+                                  self._limit + 1.0 / self._limit)
+
+            self._condition.notify_all()
+
+
+class Endpoint(object):
+    def __init__(self, name, concurrency, rate=None, burst=None,
+                 clock=time.time, sleep=time.sleep):
+        self._name = name
+        self._limiter = AdaptiveLimiter(concurrency)
+        self._bucket = None
+        if rate:
+            self._bucket = TokenBucket(rate, burst, clock, sleep)
+        self._clock = clock
+        self._sleep = sleep
+        self._resume_at = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def limiter(self):
+        return self._limiter
+
+    def acquire(self):
+        delay = self._resume_at - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+        if self._bucket:
+            self._bucket.acquire()
+        self._limiter.acquire()
+
+    def release(self, throttled=False):
+        self._limiter.release(throttled)
+
+    def pause(self, delay):
+        # Retry-After applies to the whole endpoint, not just one request.
+        self._resume_at = max(self._resume_at, self._clock() + delay)
+
+
+class Throttle(object):
+    def __init__(self, rates=None, concurrency=DEFAULT_CONCURRENCY,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=MAX_BACKOFF, errors=None, clock=time.time,
+                 sleep=time.sleep):
+        self._rates = rates or {}
+        self._concurrency = concurrency
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._errors = errors
+        self._clock = clock
+        self._sleep = sleep
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self.services = None
+
+    def endpoint(self, url):
+        key = endpoint_key(url)
+
+        endpoint = self._endpoints.get(key)
+        if endpoint:
+            return endpoint
+
+        # Resolved outside of the lock, as reading the service catalog may
+        # have to authenticate through this very throttle.
+        service = self.services(url) if self.services else None
+        rate, burst = self._rates.get(service, (None, None))
+        endpoint = Endpoint(service or key, self._concurrency, rate, burst,
+                            self._clock, self._sleep)
+
+        with self._lock:
+            return self._endpoints.setdefault(key, endpoint)
+
+    def instrument(self, adapter):
+        send = adapter.send
+
+        def throttled_send(request, **kwargs):
+            return self.send(send, request, **kwargs)
+
+        adapter.send = throttled_send
+        return adapter
+
+    def send(self, send, request, **kwargs):
+        endpoint = self.endpoint(request.url)
+        idempotent = request.method in IDEMPOTENT_METHODS
+        replayable = is_replayable(request.body)
+        attempt = 0
+
+        while True:
+            endpoint.acquire()
+            try:
+                response = send(request, **kwargs)
+            except Exception as ex:
+                endpoint.release()
+                if (not idempotent or not replayable or
+                        attempt >= self._retries or
+                        not isinstance(ex, self._errors or
+                                       transient_errors())):
+                    raise
+                delay = self.delay(attempt)
+                reason = str(ex)
+            else:
+                status = response.status_code
+                throttled = status in THROTTLED_STATUSES
+                endpoint.release(throttled)
+
+                if (not replayable or attempt >= self._retries or not (
+                        throttled or
+                        idempotent and status in UNAVAILABLE_STATUSES)):
+                    return response
+
+                delay = retry_after(response, self._clock())
+                if delay is None:
+                    delay = self.delay(attempt)
+                if throttled:
+                    endpoint.pause(delay)
+                reason = "HTTP %d" % status
+                response.close()
+
+            attempt += 1
+            logger.info("%s %s failed with %s, retrying in %.1f s",
+                        request.method, request.url, reason, delay)
+            self._sleep(delay)
+
+    def delay(self, attempt):
+        # Exponential backoff with full jitter.
+        return random.uniform(0, min(self._max_backoff,
+                                     self._backoff * 2 ** attempt))
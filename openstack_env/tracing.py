@@ -0,0 +1,254 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import collections
+import contextlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from six.moves.urllib import parse
+
+logger = logging.getLogger(__name__)
+
+HTTP = "http"
+RESOURCE = "resource"
+WAIT = "wait"
+
+UNKNOWN_SERVICE = "unknown"
+
+# Path segments which identify a single item: UUIDs, hex tokens such as
+# tenant ids, and numbers.
+ID_PATTERN = re.compile(
+    r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|"
+    r"[0-9a-f]{16,}|[0-9]+)$",
+    re.IGNORECASE,
+)
+
+Span = collections.namedtuple(
+    "Span", "category name start duration thread resource args")
+
+
+def url_template(url):
+    return "/".join(
+        "{id}" if ID_PATTERN.match(segment) else segment
+        for segment in parse.urlsplit(url).path.split("/")
+    )
+
+
+def _size(body):
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        # Streamed bodies, such as image uploads, have no length.
+        return None
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+class Tracer(object):
+    def __init__(self):
+        self._spans = []
+        self._threads = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.services = None
+
+    @property
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    @property
+    def current_resource(self):
+        return getattr(self._local, "resource", None)
+
+    @contextlib.contextmanager
+    def resource(self, resource):
+        previous = self.current_resource
+        self._local.resource = str(resource)
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            self.record(RESOURCE, str(resource), start, time.time() - start)
+            self._local.resource = previous
+
+    def record(self, category, name, start, duration, resource=None,
+               **args):
+        thread = threading.current_thread()
+        span = Span(category, name, start, duration, thread.ident,
+                    resource or self.current_resource, args)
+
+        with self._lock:
+            self._spans.append(span)
+            self._threads[thread.ident] = thread.name
+
+    def instrument(self, adapter):
+        send = adapter.send
+
+        def traced_send(request, **kwargs):
+            start = time.time()
+            response = None
+
+            try:
+                response = send(request, **kwargs)
+                return response
+            finally:
+                url = request.url.split("?", 1)[0]
+                template = url_template(url)
+                received = None
+                if response is not None:
+                    received = response.headers.get("Content-Length")
+
+                self.record(
+                    HTTP,
+                    "%s %s" % (request.method, template),
+                    start,
+                    time.time() - start,
+                    method=request.method,
+                    url=url,
+                    template=template,
+                    status=getattr(response, "status_code", None),
+                    sent=_size(request.body),
+                    received=int(received) if received else None,
+                )
+
+        adapter.send = traced_send
+        return adapter
+
+    def service_resolver(self):
+        endpoints = []
+        if self.services:
+            try:
+                endpoints = sorted(self.services(), key=lambda endpoint:
+                                   -len(endpoint[0]))
+            except Exception as ex:
+                logger.warning("Failed to read the service catalog: %s", ex)
+
+        def resolve(url):
+            for prefix, service in endpoints:
+                if url.startswith(prefix):
+                    return service
+            return parse.urlsplit(url).netloc or UNKNOWN_SERVICE
+
+        return resolve
+
+    def summary(self):
+        resolve = self.service_resolver()
+        calls = {}
+
+        for span in self.spans:
+            if span.category == HTTP:
+                service = resolve(span.args["url"])
+                calls.setdefault(service, []).append(span)
+
+        summary = {}
+        for service, spans in calls.items():
+            durations = sorted(span.duration for span in spans)
+            summary[service] = {
+                "calls": len(spans),
+                "errors": len([
+                    span for span in spans
+                    if span.args["status"] is None or
+                    span.args["status"] >= 400
+                ]),
+                "total": sum(durations),
+                "p50": _percentile(durations, 50),
+                "p99": _percentile(durations, 99),
+                "max": durations[-1],
+                "sent": sum(span.args["sent"] or 0 for span in spans),
+                "received": sum(span.args["received"] or 0 for span in spans),
+            }
+        return summary
+
+    def log_summary(self):
+        summary = self.summary()
+
+        for service in sorted(summary):
+            stats = summary[service]
+            logger.info(
+                "%s: %d calls, %d errors, %.1f s total, p50 %.1f ms, "
+                "p99 %.1f ms, max %.1f ms, %d bytes sent, %d received",
+                service, stats["calls"], stats["errors"], stats["total"],
+                stats["p50"] * 1000, stats["p99"] * 1000,
+                stats["max"] * 1000, stats["sent"], stats["received"])
+
+    def trace_events(self):
+        resolve = self.service_resolver()
+        pid = os.getpid()
+        events = []
+
+        with self._lock:
+            spans = list(self._spans)
+            threads = dict(self._threads)
+
+        for thread, name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                           "tid": thread, "args": {"name": name}})
+
+        for span in spans:
+            args = dict(span.args)
+            args["resource"] = span.resource
+            category = span.category
+            if category == HTTP:
+                category = resolve(span.args["url"])
+
+            events.append({
+                "name": span.name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(span.start * 1e6),
+                "dur": int(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread,
+                "args": args,
+            })
+
+        return events
+
+    def write(self, path):
+        with open(path, "w") as trace_file:
+            json.dump({
+                "traceEvents": self.trace_events(),
+                "displayTimeUnit": "ms",
+                "otherData": {"summary": self.summary()},
+            }, trace_file)
+
+
+class NullTracer(Tracer):
+    # Used when tracing is off: keeps track of the current resource, but
+    # records nothing and leaves the HTTP adapter alone.
+    def record(self, *args, **kwargs):
+        pass
+
+    def instrument(self, adapter):
+        return adapter
+
+
+NULL_TRACER = NullTracer()
@@ -0,0 +1,332 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import collections
+import logging
+import os
+import time
+
+from openstack_env import compaction
+from openstack_env import exceptions as e
+from openstack_env import fanout
+from openstack_env import manifests
+from openstack_env import openstack
+from openstack_env import state as st
+
+# Optional, installed with the "watch" extra. Without it the manifests are
+# polled for changes.
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+logger = logging.getLogger(__name__)
+
+# Editors write a file in several steps and people save several files at
+# once, so a change is only acted upon after this many quiet seconds.
+DEBOUNCE = 0.5
+
+POLL_INTERVAL = 1.0
+
+Changes = collections.namedtuple("Changes", ("added", "changed", "removed"))
+
+
+def diff(previous, resources):
+    current = dict((resource.key, resource.digest) for resource in resources)
+
+    return Changes(
+        sorted(key for key in current if key not in previous),
+        sorted(key for key in current
+               if key in previous and previous[key] != current[key]),
+        sorted(key for key in previous if key not in current),
+    )
+
+
+def snapshot(paths):
+    try:
+        files = manifests.expand(paths)
+    except e.OpenStackEnvException:
+        # A file being replaced, changed again once it is back.
+        return None
+
+    stats = {}
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stats[path] = (stat.st_mtime, stat.st_size)
+    return stats
+
+
+def _directories(paths):
+    # Whole trees for directories and patterns, only the parent directory
+    # for single files. Directories rather than files are watched, so that
+    # files replaced by renaming them are still noticed.
+    for path in paths:
+        if os.path.isdir(path):
+            yield path, True
+            continue
+
+        prefix = path
+        for character in manifests.GLOB_CHARACTERS:
+            prefix = prefix.split(character, 1)[0]
+
+        if prefix != path:
+            yield os.path.dirname(prefix) or os.curdir, True
+        else:
+            yield os.path.dirname(path) or os.curdir, False
+
+
+class PollingMonitor(object):
+    def __init__(self, paths, interval=POLL_INTERVAL, clock=time.time,
+                 sleep=time.sleep):
+        self._paths = paths
+        self._interval = interval
+        self._clock = clock
+        self._sleep = sleep
+        self._snapshot = snapshot(paths)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else self._clock() + timeout
+
+        while True:
+            current = snapshot(self._paths)
+            if current != self._snapshot:
+                self._snapshot = current
+                return True
+
+            if deadline is None:
+                self._sleep(self._interval)
+                continue
+
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                return False
+            self._sleep(min(self._interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyMonitor(object):
+    def __init__(self, paths):
+        mask = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE |
+                pyinotify.IN_DELETE | pyinotify.IN_MOVED_FROM |
+                pyinotify.IN_MOVED_TO)
+
+        self._manager = pyinotify.WatchManager()
+        self._notifier = pyinotify.Notifier(
+            self._manager, pyinotify.ProcessEvent())
+
+        for directory, recursive in _directories(paths):
+            self._manager.add_watch(directory, mask, rec=recursive,
+                                    auto_add=recursive)
+
+    def wait(self, timeout=None):
+        if timeout is not None:
+            timeout = int(timeout * 1000)
+
+        if not self._notifier.check_events(timeout):
+            return False
+
+        self._notifier.read_events()
+        self._notifier.process_events()
+        return True
+
+    def close(self):
+        self._notifier.stop()
+
+
+def open_monitor(paths, interval=POLL_INTERVAL):
+    if pyinotify is None:
+        logger.warning("pyinotify is not installed, polling for changes "
+                       "(install openstack-env[watch] to avoid it)")
+        return PollingMonitor(paths, interval)
+    return InotifyMonitor(paths)
+
+
+def changes(monitor, debounce=DEBOUNCE):
+    while True:
+        monitor.wait()
+        while monitor.wait(debounce):
+            pass
+        yield
+
+
+class ManifestWatcher(object):
+    def __init__(self, paths, apply, monitor=None, debounce=DEBOUNCE):
+        self._paths = paths
+        self._apply = apply
+        self._monitor = monitor
+        self._debounce = debounce
+        self._resources = {}
+
+    @property
+    def digests(self):
+        return dict((key, resource.digest)
+                    for key, resource in self._resources.items())
+
+    def reload(self):
+        try:
+            # Parsed in this process: forking a pool once the clients have
+            # started their threads is not safe.
+            resources = list(manifests.load(self._paths, 1))
+        except e.OpenStackEnvException as ex:
+            logger.error(ex.message)
+            return None
+        except Exception as ex:
+            # Most likely a file saved halfway, it is read again on the next
+            # change.
+            logger.error("Cannot read manifests: %s", ex)
+            return None
+
+        delta = diff(self.digests, resources)
+        previous = self._resources
+        self._resources = dict(
+            (resource.key, resource) for resource in resources)
+
+        if not delta.added and not delta.changed:
+            if delta.removed:
+                logger.info("%d resources removed from the manifests, "
+                            "leaving them in place", len(delta.removed))
+            return []
+
+        logger.info("%d resources added, %d changed, %d removed",
+                    len(delta.added), len(delta.changed), len(delta.removed))
+        # The previous definitions are what is in the cloud, they are the
+        # ones to replace.
+        return self._apply(resources, previous)
+
+    def run(self):
+        monitor = self._monitor or open_monitor(self._paths)
+
+        try:
+            self.reload()
+            for __ in changes(monitor, self._debounce):
+                self.reload()
+        finally:
+            monitor.close()
+
+
+def stale(resources, state, previous=None):
+    # Applied before with other values the cloud keeps, a new dependency or
+    # a new place to read an image from is no reason to replace anything.
+    # Deleted by the definition they were applied with when it is known,
+    # otherwise by the new one, which has the same key. Resources recorded
+    # without a cloud digest cannot be compared and are left alone.
+    previous = previous or {}
+    resources_to_replace = []
+
+    for resource in resources:
+        applied = state.get(resource.key)
+        if (applied is not None and applied.cloud_digest is not None and
+                applied.cloud_digest != resource.cloud_digest):
+            resources_to_replace.append(previous.get(resource.key, resource))
+
+    return resources_to_replace
+
+
+def dependents(resources, keys):
+    keys = set(keys)
+    found = []
+
+    while True:
+        added = [
+            resource for resource in resources
+            if resource.key not in keys and any(
+                key in keys for key in
+                tuple(resource.depends_on) + tuple(resource.requires))
+        ]
+        if not added:
+            return found
+
+        for resource in added:
+            keys.add(resource.key)
+            found.append(resource)
+
+
+def replace(credentials, resources, previous, state, limits=None,
+            openstack=None, recreate=False):
+    from openstack_env import main
+
+    replaced = stale(resources, state, previous)
+    if not replaced:
+        return
+
+    if not recreate:
+        logger.warning(
+            "%d resources changed and cannot be updated in place, their "
+            "changes are not applied unless they are deleted and created "
+            "again with --replace: %s", len(replaced),
+            ", ".join(str(resource) for resource in replaced))
+        return
+
+    # The managers cannot update resources in place, changed ones are
+    # deleted and then created again with the upload.
+    deleted = []
+    for result in main.destroy(credentials, replaced, limits, state=state,
+                               openstack=openstack):
+        if result.succeeded:
+            deleted.append(result.resource.key)
+        else:
+            logger.warning(
+                "Cannot replace \"%s\", its changes are not applied: %s",
+                result.resource,
+                getattr(result.error, "message", None) or result.error)
+
+    # Whatever depends on a replaced resource is applied again, to follow
+    # it (e.g. a dp_image registering the new image).
+    for resource in dependents(resources, deleted):
+        state.remove(resource.key)
+
+
+def watch(credentials, paths, limits=None, auth_cache=None,
+          pool_size=openstack.POOL_SIZE, state_path=None, refresh=False,
+          rates=None, compact_rules=False, debounce=DEBOUNCE,
+          recreate=False):
+    from openstack_env import main
+
+    name = fanout.cloud_name(credentials)
+    # One client for the whole session, tokens and inventory stay warm.
+    client = main.connect(credentials, auth_cache, pool_size, rates=rates)
+    # Resources applied before are skipped by their digest, whether they
+    # are only remembered for this session or kept in a state database.
+    state = st.StateStore(state_path or ":memory:")
+
+    def apply(resources, previous):
+        if compact_rules:
+            resources = list(compaction.compact_security_rules(resources))
+
+        start = time.time()
+        replace(credentials, resources, previous, state, limits, client,
+                recreate)
+        results = main.upload(credentials, resources, limits, state=state,
+                              refresh=refresh, openstack=client)
+        fanout.log_summary(
+            fanout.summarize(name, results, time.time() - start))
+        return results
+
+    try:
+        ManifestWatcher(paths, apply, debounce=debounce).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state.close()
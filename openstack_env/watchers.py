@@ -0,0 +1,198 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import logging
+import threading
+import time
+
+from concurrent import futures
+
+from openstack_env import exceptions as e
+from openstack_env import tracing
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+DELETED = "deleted"
+FAILED_STATUSES = ("killed", "deleted", "pending_delete")
+# With delayed delete, Glance keeps deleted images around for a while.
+DELETED_STATUSES = (DELETED, "pending_delete")
+
+
+def reached(status, target):
+    return status == target or (
+        target == DELETED and status in DELETED_STATUSES)
+
+
+class Watch(object):
+    def __init__(self, status, deadline, resource=None):
+        self.status = status
+        self.deadline = deadline
+        self.resource = resource
+        self.started = time.time()
+        self.future = futures.Future()
+
+
+class ImageStatusWatcher(object):
+    def __init__(self, client, timeout=3600, min_period=2, max_period=30,
+                 backoff=1.5, page_size=100, tracer=None):
+        self._client = client
+        self._tracer = tracer or tracing.NULL_TRACER
+        self._timeout = timeout
+        self._min_period = min_period
+        self._max_period = max_period
+        self._backoff = backoff
+        self._page_size = page_size
+        self._period = min_period
+        self._watches = {}
+        self._statuses = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, image, status=ACTIVE, timeout=None):
+        deadline = time.time() + (timeout or self._timeout)
+        watch = Watch(status, deadline, self._tracer.current_resource)
+
+        with self._condition:
+            self._watches.setdefault(image.id, []).append(watch)
+            self._period = self._min_period
+
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._condition.notify()
+
+        return watch.future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._watches:
+                    self._thread = None
+                    return
+                deleting = set()
+                creating = set()
+                for image_id, watches in self._watches.items():
+                    if all(watch.status == DELETED for watch in watches):
+                        deleting.add(image_id)
+                    else:
+                        creating.add(image_id)
+
+            try:
+                images = self._poll(creating, deleting)
+            except Exception as ex:
+                logger.warning("Failed to poll image statuses: %s", ex)
+                images = {}
+
+            with self._condition:
+                changed = self._resolve(images)
+
+                if changed:
+                    self._period = self._min_period
+                else:
+                    self._period = min(self._period * self._backoff,
+                                       self._max_period)
+
+                if self._watches:
+                    self._condition.wait(self._period)
+
+    def _poll(self, creating, deleting):
+        images = {}
+
+        # Glance v1 listings leave deleted images out, so images being
+        # deleted are checked one by one instead of listing everything.
+        for image_id in deleting:
+            images[image_id] = self._get(image_id)
+
+        if creating:
+            images.update(self._list(creating))
+
+        return images
+
+    def _list(self, image_ids):
+        images = {}
+
+        # Glance lists the newest images first, so the pending ones are
+        # usually found on the first page and the listing stops early.
+        for image in self._client.images.images.list(
+                page_size=self._page_size):
+            if image.id in image_ids:
+                images[image.id] = image
+                if len(images) == len(image_ids):
+                    return images
+
+        # The listing was read to the end, so the missing images are gone.
+        for image_id in image_ids.difference(images):
+            images[image_id] = None
+
+        return images
+
+    def _get(self, image_id):
+        try:
+            return self._client.images.images.get(image_id)
+        except Exception as ex:
+            if getattr(ex, "code", None) == 404:
+                return None
+            raise
+
+    def _resolve(self, images):
+        changed = False
+        now = time.time()
+
+        for image_id, watches in list(self._watches.items()):
+            status = None
+            if image_id in images:
+                image = images[image_id]
+                status = image.status if image else DELETED
+
+                if self._statuses.get(image_id) != status:
+                    self._statuses[image_id] = status
+                    changed = True
+
+            pending = []
+            for watch in watches:
+                if (not reached(status, watch.status) and
+                        status not in FAILED_STATUSES and
+                        now <= watch.deadline):
+                    pending.append(watch)
+                    continue
+
+                self._tracer.record(
+                    tracing.WAIT, "wait for %s" % watch.status,
+                    watch.started, now - watch.started,
+                    resource=watch.resource, image=image_id, status=status)
+
+                if reached(status, watch.status):
+                    watch.future.set_result(image)
+                elif status in FAILED_STATUSES:
+                    watch.future.set_exception(
+                        e.ImageStatusException(image_id, status))
+                else:
+                    watch.future.set_exception(e.TimeoutException())
+
+            if pending:
+                self._watches[image_id] = pending
+            else:
+                del self._watches[image_id]
+                self._statuses.pop(image_id, None)
+
+        return changed
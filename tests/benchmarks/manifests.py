@@ -0,0 +1,76 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Compares serial and parallel parsing of a tree of manifests.
+
+Run with ``python -m tests.benchmarks.manifests [FILES [RESOURCES]]``.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from openstack_env import manifests
+
+DEFAULT_FILES = 500
+DEFAULT_RESOURCES = 200
+
+
+def _write_tree(directory, files, resources):
+    for index in range(files):
+        subdirectory = os.path.join(directory, "group-%02d" % (index % 20))
+        if not os.path.isdir(subdirectory):
+            os.makedirs(subdirectory)
+
+        with open(os.path.join(subdirectory, "%04d.json" % index),
+                  "w") as manifest:
+            json.dump({"resources": [
+                {"type": "security_rule", "protocol": "tcp",
+                 "from": port, "to": port,
+                 "cidr": "10.%d.%d.0/24" % (index % 256, port % 256)}
+                for port in range(resources)
+            ]}, manifest)
+
+
+def main(files=DEFAULT_FILES, resources=DEFAULT_RESOURCES):
+    directory = tempfile.mkdtemp()
+    try:
+        _write_tree(directory, files, resources)
+
+        processes = 1
+        while True:
+            start = time.time()
+            count = sum(1 for __ in manifests.load([directory], processes))
+            duration = time.time() - start
+            print("%2d processes: %8d resources from %d files in %6.3f s" % (
+                processes, count, files, duration))
+
+            if processes >= multiprocessing.cpu_count():
+                break
+            processes = min(processes * 2, multiprocessing.cpu_count())
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
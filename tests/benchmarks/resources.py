@@ -0,0 +1,106 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Compares the slot-based resource definitions with the previous layout.
+
+Run with ``python -m tests.benchmarks.resources [COUNT]``.
+"""
+
+import gc
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from openstack_env import resources as r
+
+DEFAULT_COUNT = 200000
+
+
+class DictSecurityRuleResourceDefinition(object):
+    # The layout used before the declarative field spec: one instance
+    # __dict__ with underscored attributes behind read-only properties.
+    def __init__(self, protocol, from_port, to_port, cidr, depends_on=()):
+        self._protocol = protocol
+        self._from_port = from_port
+        self._to_port = to_port
+        self._cidr = cidr
+        self._depends_on = tuple(depends_on)
+
+    @property
+    def protocol(self):
+        return self._protocol
+
+
+def _items(count):
+    return [
+        {"protocol": "tcp", "from": port % 65536, "to": port % 65536,
+         "cidr": "10.%d.%d.0/24" % (port // 256 % 256, port % 256)}
+        for port in range(count)
+    ]
+
+
+def _measure(build, items):
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+
+    start = time.time()
+    definitions = [build(item) for item in items]
+    duration = time.time() - start
+
+    memory = None
+    if tracemalloc:
+        memory, __ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    del definitions
+    return duration, memory
+
+
+def _build_dict(item):
+    return DictSecurityRuleResourceDefinition(
+        protocol=item["protocol"],
+        from_port=item["from"],
+        to_port=item["to"],
+        cidr=item["cidr"],
+    )
+
+
+def main(count=DEFAULT_COUNT):
+    items = _items(count)
+
+    for name, build in (
+        ("dict attributes", _build_dict),
+        ("slots + field spec", r.SecurityRuleResourceDefinition.from_dict),
+    ):
+        duration, memory = _measure(build, items)
+        line = "%-20s %8d definitions in %6.3f s (%6.2f us each)" % (
+            name, count, duration, duration / count * 1e6)
+        if memory is not None:
+            line += ", %6.1f MiB (%5.0f B each)" % (
+                memory / 1048576.0, float(memory) / count)
+        print(line)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
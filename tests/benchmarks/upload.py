@@ -0,0 +1,186 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Measures end-to-end upload throughput against the fake OpenStack server.
+
+Run with ``python -m tests.benchmarks.upload [COUNT ...]``. Every count runs
+in a fresh interpreter so that the peak RSS figures are comparable, and the
+fake server runs in a process of its own so that they only cover the upload.
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests import fake_openstack
+
+DEFAULT_COUNTS = (1000, 10000, 100000)
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X bytes.
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak / 1024.0
+
+
+def _resources(count, public_key):
+    # Mostly security rules, as in the generated manifests, with a share of
+    # flavors, key pairs and images.
+    for index in range(count):
+        kind = index % 10
+        if kind < 6:
+            yield {"type": "security_rule", "protocol": "tcp",
+                   "from": index % 65536, "to": index % 65536,
+                   "cidr": "10.%d.%d.0/24" % (index // 256 % 256,
+                                              index % 256)}
+        elif kind < 8:
+            yield {"type": "flavor", "name": "flavor-%d" % index,
+                   "ram": 512, "vcpus": 1, "disk": 1, "id": str(index),
+                   "ephemeral": 0, "swap": 0, "is_public": True}
+        elif kind < 9:
+            yield {"type": "key_pair", "name": "key-%d" % index,
+                   "path": public_key}
+        else:
+            yield {"type": "image", "name": "image-%d" % index,
+                   "disk_format": "qcow2", "container_format": "bare",
+                   "is_public": True,
+                   "url": "http://example.com/image-%d.img" % index}
+
+
+def _write_manifest(directory, count):
+    public_key = os.path.join(directory, "key.pub")
+    with open(public_key, "w") as key_file:
+        key_file.write("ssh-rsa AAAAB3NzaC1yc2E benchmark\n")
+
+    path = os.path.join(directory, "resources.json")
+    with open(path, "w") as manifest:
+        json.dump({"resources": list(_resources(count, public_key))},
+                  manifest)
+    return path
+
+
+def serve(latency, error_rate, activation_delay, error_status):
+    # Prints the credentials, serves until stdin is closed and then prints
+    # the recorded calls.
+    with fake_openstack.FakeOpenStack(
+            latency=latency,
+            error_rate=error_rate,
+            error_status=error_status,
+            retry_after=0 if error_status == 429 else None,
+            activation_delay=activation_delay) as fake:
+        sys.stdout.write(json.dumps(fake.credentials) + "\n")
+        sys.stdout.flush()
+        sys.stdin.read()
+        calls = list(fake.calls)
+    json.dump(calls, sys.stdout)
+    sys.stdout.flush()
+
+
+def _options(latency, error_rate, activation_delay, error_status):
+    return ["--latency", str(latency),
+            "--error-rate", str(error_rate),
+            "--error-status", str(error_status),
+            "--activation-delay", str(activation_delay)]
+
+
+def run(count, latency, error_rate, activation_delay, error_status):
+    from openstack_env import context
+    from openstack_env import main
+
+    logging.getLogger("openstack_env").setLevel(logging.ERROR)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "tests.benchmarks.upload", "--serve"] +
+        _options(latency, error_rate, activation_delay, error_status),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    directory = tempfile.mkdtemp()
+    try:
+        credentials = json.loads(server.stdout.readline().decode("utf-8"))
+        path = _write_manifest(directory, count)
+
+        start = time.time()
+        resources = context.get_resource_loader(path).load(path)
+        results = main.upload(credentials, resources)
+        duration = time.time() - start
+    finally:
+        shutil.rmtree(directory)
+        output = server.communicate()[0]
+    calls = json.loads(output.decode("utf-8"))
+
+    failed = len([result for result in results if not result.succeeded])
+    latencies = [call[3] * 1000 for call in calls]
+
+    print("%7d resources in %7.2f s: %8.1f resources/s, %6d calls, "
+          "p50 %6.1f ms, p99 %6.1f ms, %d failed, peak RSS %6.1f MiB" % (
+              count, duration, count / duration, len(calls),
+              _percentile(latencies, 50), _percentile(latencies, 99),
+              failed, _peak_rss()))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("counts", nargs="*", type=int,
+                        default=DEFAULT_COUNTS)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--activation-delay", type=float, default=0.5)
+    parser.add_argument("--single", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.serve:
+        serve(args.latency, args.error_rate, args.activation_delay,
+              args.error_status)
+        return
+
+    if args.single:
+        for count in args.counts:
+            run(count, args.latency, args.error_rate, args.activation_delay,
+                args.error_status)
+        return
+
+    for count in args.counts:
+        subprocess.check_call(
+            [sys.executable, "-m", "tests.benchmarks.upload", "--single"] +
+            _options(args.latency, args.error_rate, args.activation_delay,
+                     args.error_status) +
+            [str(count)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,574 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""A stand-in for the OpenStack APIs openstack-env talks to.
+
+Emulates Keystone v2 tokens and service catalog, the Nova flavors, key pairs
+and default security group rules and the Glance v1 images API closely enough
+for the real clients, with configurable latency, error rate and image
+activation delay.
+"""
+
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse
+
+USER_NAME = "admin"
+PASSWORD = "secret"
+TENANT = "demo"
+
+SAHARA_USERNAME = "_sahara_username"
+SAHARA_DESCRIPTION = "_sahara_description"
+SAHARA_TAG = "_sahara_tag_"
+
+IMAGE_FIELDS = ("name", "disk_format", "container_format", "checksum",
+                "is_public", "min_disk", "min_ram", "owner", "protected")
+
+
+def _timestamp(seconds):
+    return datetime.datetime.utcfromtimestamp(seconds).strftime(
+        "%Y-%m-%dT%H:%M:%SZ")
+
+
+def _page(items, query):
+    # Nova and Glance v1 share marker/limit pagination.
+    marker = query.get("marker")
+    if marker:
+        ids = [item["id"] for item in items]
+        items = items[ids.index(marker) + 1:] if marker in ids else []
+
+    limit = query.get("limit")
+    if limit:
+        items = items[:int(limit)]
+    return items
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super(HttpError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request(object):
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body.decode("utf-8"))
+        except ValueError:
+            raise HttpError(400, "Malformed request body")
+
+
+class FakeOpenStack(object):
+    def __init__(self, latency=0.0, error_rate=0.0, activation_delay=0.0,
+                 token_ttl=3600, seed=None, host="127.0.0.1", port=0,
+                 error_status=503, retry_after=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.activation_delay = activation_delay
+        self.token_ttl = token_ttl
+
+        self.tenant_id = uuid.uuid4().hex
+        self.flavors = []
+        self.key_pairs = []
+        self.security_rules = []
+        self.images = []
+        self.calls = []
+
+        self._tokens = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+        self._routes = [
+            (method, re.compile("^%s$" % pattern), name, handler)
+            for method, pattern, name, handler in (
+                ("POST", "/identity/v2.0/tokens", "tokens",
+                 self._create_token),
+                ("GET", "/compute/v2/[^/]+/flavors/detail", "flavors",
+                 self._list_flavors),
+                ("POST", "/compute/v2/[^/]+/flavors", "flavors",
+                 self._create_flavor),
+                ("DELETE", "/compute/v2/[^/]+/flavors/(?P<id>[^/]+)",
+                 "flavors/{id}", self._delete_flavor),
+                ("GET", "/compute/v2/[^/]+/os-keypairs", "os-keypairs",
+                 self._list_key_pairs),
+                ("POST", "/compute/v2/[^/]+/os-keypairs", "os-keypairs",
+                 self._create_key_pair),
+                ("DELETE", "/compute/v2/[^/]+/os-keypairs/(?P<id>[^/]+)",
+                 "os-keypairs/{id}", self._delete_key_pair),
+                ("GET", "/compute/v2/[^/]+/os-security-group-default-rules",
+                 "os-security-group-default-rules",
+                 self._list_security_rules),
+                ("POST", "/compute/v2/[^/]+/os-security-group-default-rules",
+                 "os-security-group-default-rules",
+                 self._create_security_rule),
+                ("DELETE", "/compute/v2/[^/]+/os-security-group-default-rules"
+                 "/(?P<id>[^/]+)", "os-security-group-default-rules/{id}",
+                 self._delete_security_rule),
+                ("GET", "/image/v1/images/detail", "images",
+                 self._list_images),
+                ("POST", "/image/v1/images", "images", self._create_image),
+                ("HEAD", "/image/v1/images/(?P<id>[^/]+)", "images/{id}",
+                 self._head_image),
+                ("DELETE", "/image/v1/images/(?P<id>[^/]+)", "images/{id}",
+                 self._delete_image),
+                ("GET", "/data-processing/v1.1/[^/]+/images",
+                 "data-processing/images", self._list_registered_images),
+                ("GET", "/data-processing/v1.1/[^/]+/images/(?P<id>[^/]+)",
+                 "data-processing/images/{id}", self._get_registered_image),
+                ("POST", "/data-processing/v1.1/[^/]+/images/(?P<id>[^/]+)",
+                 "data-processing/images/{id}", self._register_image),
+                ("DELETE", "/data-processing/v1.1/[^/]+/images/(?P<id>[^/]+)",
+                 "data-processing/images/{id}", self._unregister_image),
+                ("POST", "/data-processing/v1.1/[^/]+/images/(?P<id>[^/]+)/"
+                 "(?P<action>tag|untag)", "data-processing/images/{id}/tag",
+                 self._tag_image),
+            )
+        ]
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    @property
+    def auth_url(self):
+        return self.url + "/identity/v2.0"
+
+    @property
+    def credentials(self):
+        return {
+            "user_name": USER_NAME,
+            "password": PASSWORD,
+            "tenant": TENANT,
+            "auth_url": self.auth_url,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def expire_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def handle(self, request):
+        start = time.time()
+        name = None
+
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+
+            for method, pattern, name, handler in self._routes:
+                match = pattern.match(request.path)
+                if match and method == request.method:
+                    break
+            else:
+                name = None
+                raise HttpError(404, "Not found: %s" % request.path)
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise HttpError(self.error_status, "Injected error")
+
+            if handler != self._create_token:
+                self._authorize(request)
+
+            with self._lock:
+                response = handler(request, **match.groupdict())
+        except HttpError as ex:
+            headers = {}
+            if self.retry_after is not None and ex.status in (413, 429, 503):
+                headers["Retry-After"] = str(self.retry_after)
+            response = ex.status, {"error": {
+                "code": ex.status,
+                "message": ex.message,
+            }}, headers
+
+        status = response[0]
+        with self._lock:
+            self.calls.append((request.method, name, status,
+                               time.time() - start))
+        return response
+
+    def _authorize(self, request):
+        token = request.headers.get("X-Auth-Token")
+        with self._lock:
+            expires = self._tokens.get(token)
+        if expires is None or expires < time.time():
+            raise HttpError(401, "Authentication required")
+
+    def _create_token(self, request):
+        credentials = request.json().get("auth", {})
+        password = credentials.get("passwordCredentials", {})
+
+        if (password.get("username") != USER_NAME or
+                password.get("password") != PASSWORD or
+                credentials.get("tenantName") != TENANT):
+            raise HttpError(401, "Invalid credentials")
+
+        now = time.time()
+        token = uuid.uuid4().hex
+        self._tokens[token] = now + self.token_ttl
+
+        return 200, {"access": {
+            "token": {
+                "id": token,
+                "issued_at": _timestamp(now),
+                "expires": _timestamp(now + self.token_ttl),
+                "tenant": {"id": self.tenant_id, "name": TENANT,
+                           "enabled": True},
+            },
+            "serviceCatalog": [
+                self._catalog_entry("identity", "/identity/v2.0"),
+                self._catalog_entry(
+                    "compute", "/compute/v2/%s" % self.tenant_id),
+                self._catalog_entry("image", "/image"),
+                self._catalog_entry(
+                    "data-processing",
+                    "/data-processing/v1.1/%s" % self.tenant_id),
+            ],
+            "user": {"id": USER_NAME, "name": USER_NAME,
+                     "username": USER_NAME, "roles": [{"name": "admin"}]},
+            "metadata": {"is_admin": 0, "roles": []},
+        }}, {}
+
+    def _catalog_entry(self, service_type, path):
+        url = self.url + path
+        return {
+            "type": service_type,
+            "name": service_type,
+            "endpoints": [{
+                "region": "RegionOne",
+                "publicURL": url,
+                "internalURL": url,
+                "adminURL": url,
+            }],
+            "endpoints_links": [],
+        }
+
+    def _list_flavors(self, request):
+        return 200, {"flavors": _page(self.flavors, request.query)}, {}
+
+    def _create_flavor(self, request):
+        flavor = request.json()["flavor"]
+        flavor_id = flavor.get("id") or uuid.uuid4().hex
+
+        for existing in self.flavors:
+            if flavor_id in (existing["id"], existing["name"]):
+                raise HttpError(409, "Flavor already exists")
+            if flavor["name"] == existing["name"]:
+                raise HttpError(409, "Flavor already exists")
+
+        flavor = {
+            "id": str(flavor_id),
+            "name": flavor["name"],
+            "ram": flavor["ram"],
+            "vcpus": flavor["vcpus"],
+            "disk": flavor["disk"],
+            "swap": flavor.get("swap") or "",
+            "rxtx_factor": flavor.get("rxtx_factor", 1.0),
+            "OS-FLV-EXT-DATA:ephemeral": flavor.get(
+                "OS-FLV-EXT-DATA:ephemeral", 0),
+            "os-flavor-access:is_public": flavor.get(
+                "os-flavor-access:is_public", True),
+            "links": [],
+        }
+        self.flavors.append(flavor)
+        return 200, {"flavor": flavor}, {}
+
+    def _delete_flavor(self, request, id):
+        self._remove(self.flavors, "id", id)
+        return 202, None, {}
+
+    def _list_key_pairs(self, request):
+        return 200, {"keypairs": [
+            {"keypair": key_pair} for key_pair in self.key_pairs
+        ]}, {}
+
+    def _create_key_pair(self, request):
+        key_pair = request.json()["keypair"]
+
+        if any(existing["name"] == key_pair["name"]
+               for existing in self.key_pairs):
+            raise HttpError(409, "Key pair already exists")
+
+        public_key = key_pair.get("public_key", "")
+        key_pair = {
+            "name": key_pair["name"],
+            "public_key": public_key,
+            "fingerprint": hashlib.md5(
+                public_key.encode("utf-8")).hexdigest(),
+            "user_id": USER_NAME,
+        }
+        self.key_pairs.append(key_pair)
+        return 200, {"keypair": key_pair}, {}
+
+    def _delete_key_pair(self, request, id):
+        self._remove(self.key_pairs, "name", parse.unquote(id))
+        return 202, None, {}
+
+    def _list_security_rules(self, request):
+        return 200, {"security_group_default_rules": self.security_rules}, {}
+
+    def _create_security_rule(self, request):
+        rule = request.json()["security_group_default_rule"]
+        rule = {
+            "id": len(self.security_rules) + 1,
+            "ip_protocol": rule["ip_protocol"],
+            "from_port": int(rule["from_port"]),
+            "to_port": int(rule["to_port"]),
+            "ip_range": {"cidr": rule["cidr"]},
+        }
+
+        for existing in self.security_rules:
+            if all(existing[field] == rule[field] for field in
+                   ("ip_protocol", "from_port", "to_port", "ip_range")):
+                raise HttpError(409, "Security group default rule exists")
+
+        self.security_rules.append(rule)
+        return 200, {"security_group_default_rule": rule}, {}
+
+    def _delete_security_rule(self, request, id):
+        self._remove(self.security_rules, "id", int(id))
+        return 204, None, {}
+
+    def _list_images(self, request):
+        images = sorted(
+            self.images,
+            key=lambda image: (image["created_at"], image["sequence"]),
+            reverse=request.query.get("sort_dir", "desc") == "desc",
+        )
+        return 200, {"images": [
+            self._image(image) for image in _page(images, request.query)
+        ]}, {}
+
+    def _create_image(self, request):
+        headers = dict(
+            (name.lower(), value) for name, value in request.headers.items())
+
+        image = {
+            "id": str(uuid.uuid4()),
+            "size": len(request.body),
+            "checksum": None,
+            "properties": {},
+            "is_public": False,
+            "protected": False,
+            "min_disk": 0,
+            "min_ram": 0,
+            "owner": self.tenant_id,
+            "deleted": False,
+            "deleted_at": None,
+            "activated_at": time.time() + self.activation_delay,
+        }
+        for name, value in headers.items():
+            if name.startswith("x-image-meta-property-"):
+                image["properties"][name[22:]] = value
+            elif (name.startswith("x-image-meta-") and
+                    name[13:] in IMAGE_FIELDS):
+                image[name[13:]] = value
+        image["is_public"] = str(image["is_public"]).lower() == "true"
+
+        if request.body:
+            checksum = hashlib.md5(request.body).hexdigest()
+            if image["checksum"] not in (None, checksum):
+                raise HttpError(400, "Checksum verification failed")
+            image["checksum"] = checksum
+        elif "x-glance-api-copy-from" not in headers:
+            image["activated_at"] = None
+
+        image["created_at"] = image["updated_at"] = _timestamp(time.time())
+        image["sequence"] = len(self.images)
+        self.images.append(image)
+        return 201, {"image": self._image(image)}, {}
+
+    def _head_image(self, request, id):
+        image = self._find(self.images, "id", id)
+
+        headers = {}
+        for name, value in self._image(image).items():
+            if name == "properties":
+                for key, value in value.items():
+                    headers["x-image-meta-property-%s" % key] = value
+            elif value is not None:
+                headers["x-image-meta-%s" % name] = str(value)
+        return 200, None, headers
+
+    def _delete_image(self, request, id):
+        self._remove(self.images, "id", id)
+        return 200, None, {}
+
+    # Sahara keeps its registry in Glance image properties.
+    def _list_registered_images(self, request):
+        return 200, {"images": [
+            self._registered_image(image) for image in self.images
+            if SAHARA_USERNAME in image["properties"]
+        ]}, {}
+
+    def _get_registered_image(self, request, id):
+        image = self._find(self.images, "id", id)
+        return 200, {"image": self._registered_image(image)}, {}
+
+    def _register_image(self, request, id):
+        image = self._find(self.images, "id", id)
+        body = request.json()
+        image["properties"][SAHARA_USERNAME] = body["username"]
+        image["properties"][SAHARA_DESCRIPTION] = body.get("description", "")
+        return 202, {"image": self._registered_image(image)}, {}
+
+    def _unregister_image(self, request, id):
+        image = self._find(self.images, "id", id)
+        for name in list(image["properties"]):
+            if name.startswith("_sahara_"):
+                del image["properties"][name]
+        return 204, None, {}
+
+    def _tag_image(self, request, id, action):
+        image = self._find(self.images, "id", id)
+        for tag in request.json()["tags"]:
+            if action == "tag":
+                image["properties"][SAHARA_TAG + tag] = "True"
+            else:
+                image["properties"].pop(SAHARA_TAG + tag, None)
+        return 202, {"image": self._registered_image(image)}, {}
+
+    def _registered_image(self, image):
+        image = self._image(image)
+        properties = image["properties"]
+        image.update(
+            username=properties.get(SAHARA_USERNAME),
+            description=properties.get(SAHARA_DESCRIPTION),
+            tags=sorted(name[len(SAHARA_TAG):] for name in properties
+                        if name.startswith(SAHARA_TAG)),
+            metadata=properties,
+        )
+        return image
+
+    def _image(self, image):
+        image = dict(image)
+        activated_at = image.pop("activated_at")
+        image.pop("sequence")
+
+        if activated_at is None:
+            image["status"] = "queued"
+        elif activated_at > time.time():
+            image["status"] = "saving"
+        else:
+            image["status"] = "active"
+        return image
+
+    def _find(self, items, field, value):
+        for item in items:
+            if item[field] == value:
+                return item
+        raise HttpError(404, "%s not found" % value)
+
+    def _remove(self, items, field, value):
+        items.remove(self._find(items, field, value))
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep-alive, so that pooled client connections are actually reused.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle()
+
+    do_POST = do_PUT = do_DELETE = do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        url = parse.urlsplit(self.path)
+        query = dict(parse.parse_qsl(url.query, keep_blank_values=True))
+        request = Request(self.command, url.path, query, self.headers,
+                          self._read_body())
+
+        status, body, headers = self.server.fake.handle(request)
+
+        content = b""
+        if body is not None:
+            content = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if not size:
+                    # Skip the trailer section.
+                    while self.rfile.readline().strip():
+                        pass
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
@@ -0,0 +1,53 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import time
+
+import testtools as tt
+
+from openstack_env import cache
+
+
+class TestAuthCache(tt.TestCase):
+    def setUp(self):
+        super(TestAuthCache, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = cache.AuthCache(os.path.join(directory, "auth.json"))
+
+    def test_round_trip(self):
+        key = cache.AuthCache.key("http://keystone", "user", "tenant")
+        self.cache.set(key, {"access": {"token": 1}}, time.time() + 3600)
+
+        self.assertEqual({"access": {"token": 1}}, self.cache.get(key))
+        self.assertEqual(0o600, os.stat(self.cache.path).st_mode & 0o777)
+
+    def test_expiring_entries_are_ignored(self):
+        self.cache.set("key", {}, time.time() + 10)
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_invalidate(self):
+        self.cache.set("key", {}, time.time() + 3600)
+        self.cache.invalidate("key")
+
+        self.assertIsNone(self.cache.get("key"))
@@ -0,0 +1,98 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import testtools as tt
+
+import openstack_env
+from openstack_env import cli
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+
+
+class FakeMain(object):
+    def __init__(self, errors):
+        self.errors = errors
+        self.calls = []
+
+    def upload(self):
+        pass
+
+    def destroy(self):
+        pass
+
+    def apply(self, credentials, resources, *args):
+        self.calls.append(credentials)
+        return [d.Result(resource, error=self.errors.get(resource.name))
+                for resource in resources]
+
+
+class TestArguments(tt.TestCase):
+    def test_limit(self):
+        self.assertEqual(("compute", 4), cli._limit("compute=4"))
+
+    def test_invalid_limit(self):
+        for value in ("compute", "compute=four", "compute=0", "compute=-1"):
+            self.assertRaises(argparse.ArgumentTypeError, cli._limit, value)
+
+
+class TestRun(tt.TestCase):
+    def setUp(self):
+        super(TestRun, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.manifest = os.path.join(directory, "keys.json")
+        with open(self.manifest, "w") as manifest:
+            json.dump({"resources": [
+                {"type": "key_pair", "name": name, "path": "/tmp/key.pub"}
+                for name in ("a", "b")
+            ]}, manifest)
+
+        self.credentials = os.path.join(directory, "cloud.json")
+        with open(self.credentials, "w") as credentials:
+            json.dump({"name": "demo"}, credentials)
+
+    def run_cli(self, errors):
+        main = FakeMain(errors)
+        self.patch(openstack_env, "main", main)
+
+        try:
+            cli.run(["apply", "-r", self.manifest, "--no-auth-cache",
+                     "-c", self.credentials])
+        except SystemExit as ex:
+            return ex.code
+        finally:
+            self.assertEqual([{"name": "demo"}], main.calls)
+        return 0
+
+    def test_succeeded(self):
+        self.assertEqual(0, self.run_cli({}))
+
+    def test_existing_resources_succeed(self):
+        self.assertEqual(0, self.run_cli(
+            {"a": e.ResourceAlreadyExistsException("a")}))
+
+    def test_failed(self):
+        self.assertEqual(1, self.run_cli({"b": ValueError("broken")}))
@@ -0,0 +1,120 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import compaction
+from openstack_env import exceptions as e
+from openstack_env import resources as r
+from openstack_env import scheduler
+
+
+def rule(from_port, to_port, cidr, protocol="tcp", depends_on=()):
+    return r.SecurityRuleResourceDefinition(
+        protocol=protocol,
+        from_port=from_port,
+        to_port=to_port,
+        cidr=cidr,
+        depends_on=depends_on,
+    )
+
+
+def compact(*resources):
+    return [str(resource) for resource
+            in compaction.compact_security_rules(resources)]
+
+
+class TestCompactSecurityRules(tt.TestCase):
+    def test_duplicates(self):
+        self.assertEqual(
+            ["security_rule:tcp:22-22:10.0.0.0/8"],
+            compact(rule(22, 22, "10.0.0.0/8"),
+                    rule(22, 22, "10.1.2.3/8"),
+                    rule(22, 22, "10.0.0.0/8", protocol="TCP")),
+        )
+
+    def test_ports(self):
+        self.assertEqual(
+            ["security_rule:tcp:80-90:0.0.0.0/0",
+             "security_rule:tcp:443-443:0.0.0.0/0"],
+            compact(rule(80, 85, "0.0.0.0/0"),
+                    rule(86, 88, "0.0.0.0/0"),
+                    rule(87, 90, "0.0.0.0/0"),
+                    rule(443, 443, "0.0.0.0/0")),
+        )
+
+    def test_networks(self):
+        self.assertEqual(
+            ["security_rule:tcp:22-22:10.0.0.0/24",
+             "security_rule:tcp:22-22:10.0.1.0/25"],
+            compact(rule(22, 22, "10.0.0.0/25"),
+                    rule(22, 22, "10.0.0.128/25"),
+                    rule(22, 22, "10.0.1.0/25")),
+        )
+
+    def test_ipv6(self):
+        self.assertEqual(
+            ["security_rule:tcp:22-22:10.0.0.0/8",
+             "security_rule:tcp:22-22:2001:db8::/32"],
+            compact(rule(22, 22, "2001:db8::/33"),
+                    rule(22, 22, "2001:db8:8000::/33"),
+                    rule(22, 22, "10.0.0.0/8")),
+        )
+
+    def test_icmp(self):
+        self.assertEqual(
+            ["security_rule:icmp:0-0:0.0.0.0/0",
+             "security_rule:icmp:8-8:0.0.0.0/0"],
+            compact(rule(0, 0, "0.0.0.0/0", protocol="icmp"),
+                    rule(8, 8, "0.0.0.0/0", protocol="icmp")),
+        )
+
+    def test_passthrough(self):
+        key_pair = r.KeyPairResourceDefinition(name="key", path="key.pub")
+        dependent = rule(22, 22, "10.0.0.0/8", depends_on=["key_pair:key"])
+
+        self.assertEqual(
+            ["key_pair:key",
+             "security_rule:tcp:22-22:10.0.0.0/8",
+             "security_rule:tcp:22-23:10.0.0.0/8"],
+            compact(key_pair, dependent,
+                    rule(22, 22, "10.0.0.0/8"),
+                    rule(23, 23, "10.0.0.0/8")),
+        )
+
+    def test_dependencies_are_kept(self):
+        key_pair = r.KeyPairResourceDefinition(
+            name="key", path="key.pub",
+            depends_on=["security_rule:tcp:22-22:10.0.0.0/8"])
+        resources = [key_pair,
+                     rule(22, 22, "10.0.0.0/8"),
+                     rule(23, 23, "10.0.0.0/8")]
+
+        compacted = list(compaction.compact_security_rules(resources))
+
+        self.assertEqual(
+            ["key_pair:key",
+             "security_rule:tcp:22-22:10.0.0.0/8",
+             "security_rule:tcp:23-23:10.0.0.0/8"],
+            [str(resource) for resource in compacted])
+        scheduler.build_graph(compacted)
+
+    def test_invalid_cidr(self):
+        self.assertRaises(e.InvalidResourceException,
+                          compact, rule(22, 22, "10.0.0/33"))
@@ -0,0 +1,119 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+try:
+    from openstack_env import credentials as c
+except ImportError:
+    c = None
+
+AUTH_URL = "http://keystone:5000/v2.0"
+
+
+class FakeCatalog(object):
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def url_for(self, service_type, endpoint_type):
+        return self.catalog[service_type][0][endpoint_type]
+
+    def get_endpoints(self):
+        return self.catalog
+
+
+class FakeAccess(object):
+    def __init__(self, auth_token, catalog):
+        self.auth_token = auth_token
+        self.tenant_id = "tenant-id"
+        self.service_catalog = FakeCatalog(catalog)
+
+
+class FakeAuth(object):
+    def __init__(self, auth_ref):
+        self.auth_ref = auth_ref
+        self.invalidated = 0
+
+    def get_access(self, session):
+        return self.auth_ref
+
+    def invalidate(self):
+        self.invalidated += 1
+        return True
+
+
+class FakeAdapter(object):
+    pass
+
+
+@tt.skipUnless(c, "keystoneclient is not installed")
+class TestCredentials(tt.TestCase):
+    def setUp(self):
+        super(TestCredentials, self).setUp()
+        self.credentials = c.Credentials.from_dict({
+            "user_name": "demo",
+            "password": "secret",
+            "tenant": "demo",
+            "auth_url": AUTH_URL,
+        })
+        self.auth = FakeAuth(FakeAccess("token", {
+            "compute": [{"publicURL": "http://nova:8774/v2/tenant-id",
+                         "internalURL": "http://nova.internal:8774/v2"}],
+            "image": [{"publicURL": "http://glance:9292"},
+                      {"internalURL": "http://glance.internal:9292"}],
+        }))
+        self.credentials._auth = self.auth
+
+    def test_from_dict(self):
+        self.assertIs(self.credentials,
+                      c.Credentials.from_dict(self.credentials))
+        self.assertRaises(ValueError, c.Credentials.from_dict, None)
+
+    def test_endpoint(self):
+        self.assertEqual("http://glance:9292",
+                         self.credentials.endpoint("image"))
+        self.assertEqual("tenant-id", self.credentials.tenant_id)
+
+    def test_endpoints(self):
+        endpoints = self.credentials.endpoints()
+
+        # Token requests are recognised before anything in the catalog.
+        self.assertEqual((AUTH_URL, "identity"), endpoints[0])
+        self.assertEqual(sorted([
+            (AUTH_URL, "identity"),
+            ("http://glance:9292", "image"),
+            ("http://nova:8774/v2/tenant-id", "compute"),
+        ]), sorted(endpoints))
+
+    def test_mount(self):
+        adapter = FakeAdapter()
+
+        self.credentials.mount(adapter)
+
+        http_session = self.credentials._session.session
+        self.assertIs(adapter, http_session.adapters["http://"])
+        self.assertIs(adapter, http_session.adapters["https://"])
+
+    def test_invalidate(self):
+        self.assertFalse(self.credentials.invalidate("stale-token"))
+        self.assertEqual(0, self.auth.invalidated)
+
+        self.assertTrue(self.credentials.invalidate("token"))
+        self.assertTrue(self.credentials.invalidate())
+        self.assertEqual(2, self.auth.invalidated)
@@ -0,0 +1,215 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import testtools as tt
+
+from openstack_env import daemon
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+
+
+class FakeClient(object):
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.resets = 0
+
+    def reset_inventory(self):
+        self.resets += 1
+
+
+class FakeDaemon(daemon.Daemon):
+    def __init__(self, ttl=daemon.INVENTORY_TTL, fail=()):
+        super(FakeDaemon, self).__init__(ttl=ttl)
+        self.fail = fail
+        self.connected = []
+        self.runs = []
+
+    def connect(self, credentials, pool_size, rates):
+        self.connected.append(credentials["name"])
+        return FakeClient(credentials)
+
+    def run(self, credentials, resources, operation, options, client,
+            callback):
+        self.runs.append((operation, client, options))
+
+        results = []
+        for resource in resources:
+            if resource.name in self.fail:
+                result = d.Result(resource, error=ValueError("broken"))
+            else:
+                result = d.Result(resource, value=object())
+            callback(result)
+            results.append(result)
+        return results
+
+
+class TestClients(tt.TestCase):
+    def setUp(self):
+        super(TestClients, self).setUp()
+        self.now = 0
+        self.clients = daemon.Clients(
+            lambda credentials, pool_size, rates: FakeClient(credentials),
+            ttl=10, clock=lambda: self.now)
+
+    def test_reuse(self):
+        client = self.clients.get({"name": "a"}, 16, {})
+
+        self.assertIs(client, self.clients.get({"name": "a"}, 16, {}))
+        self.assertIsNot(client, self.clients.get({"name": "b"}, 16, {}))
+        self.assertIsNot(client, self.clients.get({"name": "a"}, 8, {}))
+
+    def test_inventory_expires(self):
+        client = self.clients.get({"name": "a"}, 16, {})
+
+        self.now = 5
+        self.clients.get({"name": "a"}, 16, {})
+        self.assertEqual(0, client.resets)
+
+        self.now = 11
+        self.clients.get({"name": "a"}, 16, {})
+        self.clients.get({"name": "a"}, 16, {})
+        self.assertEqual(1, client.resets)
+
+
+class TestDaemon(tt.TestCase):
+    def setUp(self):
+        super(TestDaemon, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.socket = os.path.join(self.directory, "run", "osenv.sock")
+
+        self.manifest = os.path.join(self.directory, "keys.json")
+        with open(self.manifest, "w") as manifest:
+            json.dump({"resources": [
+                {"type": "key_pair", "name": name, "path": "/tmp/key.pub"}
+                for name in ("a", "b")
+            ]}, manifest)
+
+    def serve(self, service):
+        server = daemon.Server(self.socket, service)
+        thread = threading.Thread(target=server.serve_forever,
+                                  kwargs={"poll_interval": 0.05})
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        self.addCleanup(stop)
+        return server
+
+    def request(self, operation="upload", clouds=("demo",), **options):
+        return list(daemon.request(self.socket, {
+            "operation": operation,
+            "credentials": [{"name": name} for name in clouds],
+            "resources": [self.manifest],
+            "options": options,
+        }))
+
+    def test_apply(self):
+        self.serve(FakeDaemon())
+
+        events = self.request()
+
+        self.assertEqual(["result", "result", "summary", "done"],
+                         [event["event"] for event in events])
+        self.assertEqual(
+            ["key_pair:a", "key_pair:b"],
+            [event["resource"] for event in events[:2]])
+        self.assertEqual(2, events[2]["succeeded"])
+        self.assertTrue(events[3]["succeeded"])
+        self.assertEqual(0o600, os.stat(self.socket).st_mode & 0o777)
+
+    def test_socket_permissions(self):
+        self.patch(os, "chmod", None)
+        umask = os.umask(0)
+        self.addCleanup(os.umask, umask)
+
+        self.serve(FakeDaemon())
+
+        self.assertEqual(0o600, os.stat(self.socket).st_mode & 0o777)
+        self.assertEqual(0, os.umask(0))
+
+    def test_warm_clients(self):
+        service = FakeDaemon()
+        self.serve(service)
+
+        self.request()
+        self.request("destroy")
+
+        self.assertEqual(["demo"], service.connected)
+        self.assertEqual(["upload", "destroy"],
+                         [run[0] for run in service.runs])
+        self.assertIs(service.runs[0][1], service.runs[1][1])
+
+    def test_multiple_clouds(self):
+        service = FakeDaemon()
+        self.serve(service)
+
+        events = self.request(clouds=("east", "west"), state_path="state")
+
+        summaries = [event for event in events if event["event"] == "summary"]
+        self.assertEqual(["east", "west"],
+                         sorted(summary["cloud"] for summary in summaries))
+        self.assertEqual(
+            ["state.east", "state.west"],
+            sorted(run[2]["state_path"] for run in service.runs))
+
+    def test_failures(self):
+        self.serve(FakeDaemon(fail=("b",)))
+
+        events = self.request()
+
+        self.assertEqual("broken", events[1]["error"])
+        self.assertEqual("failed", events[1]["status"])
+        self.assertFalse(events[-1]["succeeded"])
+
+    def test_invalid_request(self):
+        self.serve(FakeDaemon())
+
+        events = self.request("format")
+
+        self.assertEqual(["error", "done"],
+                         [event["event"] for event in events])
+        self.assertIn("format", events[0]["message"])
+        self.assertFalse(events[1]["succeeded"])
+
+    def test_not_running(self):
+        self.assertRaises(e.DaemonException, self.request)
+
+    def test_already_running(self):
+        self.serve(FakeDaemon())
+
+        self.assertRaises(e.DaemonException,
+                          daemon.Server, self.socket, FakeDaemon())
+
+    def test_stale_socket(self):
+        server = daemon.Server(self.socket, FakeDaemon())
+        server.socket.close()
+
+        self.serve(FakeDaemon())
+
+        self.assertEqual("done", self.request()[-1]["event"])
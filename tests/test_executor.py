@@ -0,0 +1,55 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+import time
+
+import testtools as tt
+
+from openstack_env import executor
+
+
+class TestServiceExecutor(tt.TestCase):
+    def test_limits_concurrency_per_service(self):
+        lock = threading.Lock()
+        running = {"compute": 0, "images": 0}
+        peaks = {"compute": 0, "images": 0}
+
+        def task(service):
+            with lock:
+                running[service] += 1
+                peaks[service] = max(peaks[service], running[service])
+            time.sleep(0.01)
+            with lock:
+                running[service] -= 1
+
+        limits = {"compute": 3, "images": 1}
+        with executor.ServiceExecutor(limits) as pool:
+            tasks = [pool.submit(service, task, service)
+                     for service in ["compute", "images"] * 10]
+            for t in tasks:
+                t.result()
+
+        self.assertEqual(3, peaks["compute"])
+        self.assertEqual(1, peaks["images"])
+
+    def test_unknown_service_uses_default_limit(self):
+        pool = executor.ServiceExecutor()
+        self.assertEqual(executor.DEFAULT_LIMIT, pool.limit("unknown"))
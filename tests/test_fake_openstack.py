@@ -0,0 +1,195 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import time
+
+from six.moves.urllib import error
+from six.moves.urllib import request
+import testtools as tt
+
+from tests import fake_openstack
+
+try:
+    import glanceclient  # noqa
+    import keystoneclient  # noqa
+    import novaclient  # noqa
+    CLIENTS = True
+except ImportError:
+    CLIENTS = False
+
+
+class TestFakeOpenStack(tt.TestCase):
+    def setUp(self):
+        super(TestFakeOpenStack, self).setUp()
+        self.fake = fake_openstack.FakeOpenStack(activation_delay=0.2)
+        self.fake.start()
+        self.addCleanup(self.fake.stop)
+
+    def call(self, method, path, body=None, headers=None, token=True):
+        headers = dict(headers or {})
+        if token:
+            headers["X-Auth-Token"] = self.token()
+        if isinstance(body, dict):
+            body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        http_request = request.Request(
+            self.fake.url + path, data=body, headers=headers)
+        http_request.get_method = lambda: method
+
+        try:
+            response = request.urlopen(http_request)
+        except error.HTTPError as ex:
+            return ex.code, None, ex.headers
+        content = response.read()
+        return (response.getcode(),
+                json.loads(content.decode("utf-8")) if content else None,
+                response.headers)
+
+    def token(self):
+        status, body, __ = self.call("POST", "/identity/v2.0/tokens", {
+            "auth": {
+                "passwordCredentials": {
+                    "username": fake_openstack.USER_NAME,
+                    "password": fake_openstack.PASSWORD,
+                },
+                "tenantName": fake_openstack.TENANT,
+            },
+        }, token=False)
+        self.assertEqual(200, status)
+        return body["access"]["token"]["id"]
+
+    def test_authentication(self):
+        status, body, __ = self.call("POST", "/identity/v2.0/tokens", {
+            "auth": {"passwordCredentials": {"username": "nobody"}},
+        }, token=False)
+        self.assertEqual(401, status)
+
+        self.assertEqual(401, self.call(
+            "GET", "/compute/v2/x/os-keypairs",
+            headers={"X-Auth-Token": "invalid"}, token=False)[0])
+
+    def test_flavors(self):
+        path = "/compute/v2/%s/flavors" % self.fake.tenant_id
+        for index in range(3):
+            status, body, __ = self.call("POST", path, {"flavor": {
+                "name": "m%d" % index, "ram": 512, "vcpus": 1, "disk": 1,
+                "id": str(index),
+            }})
+            self.assertEqual(200, status)
+
+        self.assertEqual(409, self.call("POST", path, {"flavor": {
+            "name": "m0", "ram": 512, "vcpus": 1, "disk": 1,
+        }})[0])
+
+        __, body, __ = self.call("GET", path + "/detail?limit=2&marker=0")
+        self.assertEqual(["1", "2"], [
+            flavor["id"] for flavor in body["flavors"]])
+
+    def test_image_activation(self):
+        status, body, __ = self.call("POST", "/image/v1/images", b"data", {
+            "x-image-meta-name": "cirros",
+            "x-image-meta-disk_format": "qcow2",
+            "x-image-meta-property-foo": "bar",
+        })
+        self.assertEqual(201, status)
+        image = body["image"]
+        self.assertEqual("saving", image["status"])
+        self.assertEqual("8d777f385d3dfec8815d20f7496026dc",
+                         image["checksum"])
+        self.assertEqual({"foo": "bar"}, image["properties"])
+
+        time.sleep(0.3)
+        status, __, headers = self.call(
+            "HEAD", "/image/v1/images/%s" % image["id"])
+        self.assertEqual("active", headers["x-image-meta-status"])
+
+        self.assertEqual(200, self.call(
+            "DELETE", "/image/v1/images/%s" % image["id"])[0])
+        self.assertEqual(404, self.call(
+            "HEAD", "/image/v1/images/%s" % image["id"])[0])
+
+    def test_data_processing_images(self):
+        __, body, __ = self.call("POST", "/image/v1/images", b"data", {
+            "x-image-meta-name": "vanilla",
+        })
+        path = "/data-processing/v1.1/%s/images" % self.fake.tenant_id
+        image_path = "%s/%s" % (path, body["image"]["id"])
+
+        self.assertEqual([], self.call("GET", path)[1]["images"])
+
+        self.call("POST", image_path, {"username": "ubuntu"})
+        self.call("POST", image_path + "/tag", {"tags": ["vanilla", "2.7"]})
+
+        image, = self.call("GET", path)[1]["images"]
+        self.assertEqual("ubuntu", image["username"])
+        self.assertEqual(["2.7", "vanilla"], image["tags"])
+
+        self.assertEqual(204, self.call("DELETE", image_path)[0])
+        self.assertEqual([], self.call("GET", path)[1]["images"])
+
+    def test_errors_and_calls(self):
+        self.fake.error_rate = 1.0
+
+        status, __, __ = self.call(
+            "GET", "/compute/v2/x/os-security-group-default-rules",
+            token=False)
+
+        self.assertEqual(503, status)
+        self.assertEqual(("GET", "os-security-group-default-rules", 503),
+                         self.fake.calls[-1][:3])
+
+
+@tt.skipUnless(CLIENTS, "OpenStack clients are not installed")
+class TestUpload(tt.TestCase):
+    def test_upload(self):
+        from openstack_env import main
+        from openstack_env import resources as r
+
+        resources = [
+            r.SecurityRuleResourceDefinition(
+                protocol="tcp", from_port=22, to_port=22, cidr="0.0.0.0/0"),
+            r.FlavorResourceDefinition(
+                name="m1.tiny", ram_size=512, cpu_count=1, disk_size=1,
+                id="1", ephemeral_disk_size=0, swap_size=0, is_public=True),
+            r.ImageResourceDefinition(
+                name="cirros", disk_format="qcow2", container_format="bare",
+                is_public=True, url="http://example.com/cirros.img"),
+            r.DataProcessingImageResourceDefinition(
+                name="cirros", disk_format="qcow2", container_format="bare",
+                is_public=True, user="cirros", tags=("vanilla", "2.7.1")),
+        ]
+
+        with fake_openstack.FakeOpenStack(activation_delay=0.1) as fake:
+            results = main.upload(fake.credentials, resources)
+
+            self.assertTrue(all(result.succeeded for result in results))
+            self.assertEqual(1, len(fake.security_rules))
+            self.assertEqual(1, len(fake.flavors))
+            self.assertEqual(1, len(fake.images))
+            self.assertEqual("cirros", fake.images[0]["properties"][
+                fake_openstack.SAHARA_USERNAME])
+
+            fake.flavors = []
+            results = main.destroy(fake.credentials, resources)
+
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual([], fake.security_rules)
+        self.assertEqual([], fake.images)
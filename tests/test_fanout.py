@@ -0,0 +1,83 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+from openstack_env import fanout
+from openstack_env import resources as r
+from openstack_env import state as st
+from tests import fake_openstack
+
+try:
+    import glanceclient  # noqa
+    import keystoneclient  # noqa
+    import novaclient  # noqa
+    CLIENTS = True
+except ImportError:
+    CLIENTS = False
+
+
+def rule(port):
+    return r.SecurityRuleResourceDefinition(
+        protocol="tcp", from_port=port, to_port=port, cidr="0.0.0.0/0")
+
+
+class TestFanOut(tt.TestCase):
+    def test_cloud_path(self):
+        self.assertIsNone(fanout.cloud_path(None, "demo"))
+        self.assertEqual(
+            "state.db.demo_http_cloud_5000",
+            fanout.cloud_path("state.db", "demo@http://cloud:5000"))
+
+    def test_summarize(self):
+        resource = rule(22)
+        summary = fanout.summarize("demo", [
+            d.Result(resource, value=object()),
+            d.Result(resource,
+                     value=st.AppliedResource(resource.key, "", None)),
+            d.Result(resource,
+                     error=e.ResourceAlreadyExistsException(resource)),
+            d.Result(resource, error=ValueError()),
+        ], 1.0)
+
+        self.assertEqual(
+            (4, 1, 1, 1, 1),
+            (summary["total"], summary["succeeded"], summary["unchanged"],
+             summary["existing"], summary["failed"]))
+        self.assertFalse(fanout.succeeded(summary))
+
+    @tt.skipUnless(CLIENTS, "OpenStack clients are not installed")
+    def test_apply(self):
+        fast = fake_openstack.FakeOpenStack().start()
+        self.addCleanup(fast.stop)
+        slow = fake_openstack.FakeOpenStack(latency=0.2).start()
+        self.addCleanup(slow.stop)
+
+        clouds = [dict(fast.credentials, name="fast"),
+                  dict(slow.credentials, name="slow")]
+        summaries = fanout.apply(clouds, (rule(port) for port in range(5)))
+
+        self.assertEqual(["fast", "slow"],
+                         [summary["cloud"] for summary in summaries])
+        self.assertTrue(all(fanout.succeeded(summary)
+                            for summary in summaries))
+        self.assertEqual([5, 5], [summary["succeeded"]
+                                  for summary in summaries])
@@ -0,0 +1,122 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+import testtools as tt
+
+from openstack_env import exceptions as e
+from openstack_env import generators
+from openstack_env import resource_loaders as rl
+
+
+class TestExpand(tt.TestCase):
+    def test_plain_items(self):
+        item = {"type": "key_pair", "name": "key", "path": "key.pub"}
+
+        self.assertEqual([item], list(generators.expand(item)))
+
+    def test_matrix(self):
+        items = list(generators.expand({
+            "type": "flavor",
+            "name": "m.{vcpus}c.{ram}",
+            "id": "flavor-{index}",
+            "matrix": {"vcpus": [1, 2], "ram": [512, 1024]},
+        }))
+
+        # Combinations follow the sorted variable names, the last one
+        # changing fastest.
+        self.assertEqual(
+            ["m.1c.512", "m.2c.512", "m.1c.1024", "m.2c.1024"],
+            [item["name"] for item in items])
+        self.assertEqual(["flavor-0", "flavor-1", "flavor-2", "flavor-3"],
+                         [item["id"] for item in items])
+        self.assertEqual((2, 1024), (items[3]["vcpus"], items[3]["ram"]))
+        self.assertNotIn("matrix", items[0])
+
+    def test_ranges(self):
+        items = list(generators.expand({
+            "type": "security_rule",
+            "from": "{port}",
+            "to": "{port}",
+            "cidr": "{cidr}",
+            "matrix": {
+                "port": {"range": [8000, 8004, 2]},
+                "cidr": ["10.0.0.0/8"],
+            },
+        }))
+
+        self.assertEqual([8000, 8002, 8004],
+                         [item["from"] for item in items])
+        self.assertEqual([8000, 8002, 8004], [item["to"] for item in items])
+
+    def test_lazy(self):
+        items = generators.expand({
+            "type": "security_rule",
+            "matrix": {"from": {"range": [1, 100000]},
+                       "to": {"range": [1, 100000]}},
+        })
+
+        self.assertEqual(
+            [(1, 1), (1, 2)],
+            [(item["from"], item["to"])
+             for item in itertools.islice(items, 2)])
+
+    def test_invalid(self):
+        for matrix in ({}, {"ram": 512}, {"ram": {"range": [1]}},
+                       {"ram": {"range": [1, 2, 0]}}):
+            self.assertRaises(e.InvalidResourceException, list,
+                              generators.expand({"name": "a",
+                                                 "matrix": matrix}))
+
+        self.assertRaises(e.InvalidResourceException, list,
+                          generators.expand({"name": "{size}",
+                                             "matrix": {"ram": [1]}}))
+
+
+class TestLoader(tt.TestCase):
+    def test_json(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "flavors.json")
+        with open(path, "w") as manifest:
+            json.dump({"resources": [{
+                "type": "flavor",
+                "name": "c{vcpus}.r{ram}.d{disk}",
+                "id": "{index}",
+                "ephemeral": 0,
+                "swap": 0,
+                "is_public": True,
+                "matrix": {
+                    "vcpus": [1, 2, 4],
+                    "ram": [512, 1024],
+                    "disk": {"range": [10, 30, 10]},
+                },
+            }]}, manifest)
+
+        flavors = list(rl.JsonFileResourceDefinitionLoader().load(path))
+
+        self.assertEqual(18, len(flavors))
+        self.assertEqual("c4.r1024.d30", flavors[-1].name)
+        self.assertEqual(4, flavors[-1].cpu_count)
+        self.assertEqual(17, flavors[-1].id)
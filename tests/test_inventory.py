@@ -0,0 +1,117 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import inventory
+
+
+class FakeItem(object):
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class TestCollection(tt.TestCase):
+    def setUp(self):
+        super(TestCollection, self).setUp()
+        self.list_calls = 0
+
+    def list_items(self):
+        self.list_calls += 1
+        return [FakeItem("1", "a"), FakeItem("2", "b")]
+
+    def test_lists_once(self):
+        collection = inventory.Collection(
+            self.list_items,
+            name=lambda item: item.name,
+            id=lambda item: item.id,
+        )
+
+        self.assertTrue(collection.contains("name", "a"))
+        self.assertTrue(collection.contains("id", "2"))
+        self.assertFalse(collection.contains("name", "c"))
+        self.assertEqual(1, self.list_calls)
+
+    def test_add_updates_indexes(self):
+        collection = inventory.Collection(
+            self.list_items, name=lambda item: item.name)
+
+        self.assertFalse(collection.contains("name", "c"))
+        collection.add(FakeItem("3", "c"))
+
+        self.assertEqual("3", collection.find("name", "c").id)
+
+    def test_remove_updates_indexes(self):
+        collection = inventory.Collection(
+            self.list_items, name=lambda item: item.name)
+
+        collection.remove(collection.find("name", "a"))
+        collection.remove(FakeItem("2", "b"))
+
+        self.assertFalse(collection.contains("name", "a"))
+        self.assertTrue(collection.contains("name", "b"))
+
+    def test_alias(self):
+        collection = inventory.Collection(
+            self.list_items, name=lambda item: item.name)
+        item = collection.find("name", "a")
+
+        collection.alias("name", "c", item)
+        collection.alias("name", "b", item)
+
+        self.assertIs(item, collection.find("name", "c"))
+        self.assertEqual("2", collection.find("name", "b").id)
+        self.assertTrue(collection.is_alias("name", "c"))
+        self.assertFalse(collection.is_alias("name", "b"))
+
+        collection.unalias("name", "c")
+        self.assertFalse(collection.contains("name", "c"))
+        self.assertIs(item, collection.find("name", "a"))
+
+    def test_remove_drops_aliases(self):
+        collection = inventory.Collection(
+            self.list_items, name=lambda item: item.name)
+        item = collection.find("name", "a")
+        collection.alias("name", "c", item)
+
+        collection.remove(item)
+
+        self.assertFalse(collection.contains("name", "c"))
+        self.assertFalse(collection.is_alias("name", "c"))
+
+    def test_missing_keys_are_not_indexed(self):
+        collection = inventory.Collection(
+            self.list_items, checksum=lambda item: getattr(item, "md5", None))
+
+        self.assertFalse(collection.contains("checksum", None))
+
+
+class TestPaginate(tt.TestCase):
+    def test_follows_markers(self):
+        items = [FakeItem(str(i), str(i)) for i in range(5)]
+        calls = []
+
+        def list_items(marker=None, limit=None):
+            calls.append(marker)
+            start = 0 if marker is None else int(marker) + 1
+            return items[start:start + limit]
+
+        self.assertEqual(items, list(inventory._paginate(list_items, 2)))
+        self.assertEqual([None, "1", "3"], calls)
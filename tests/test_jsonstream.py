@@ -0,0 +1,65 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from six import moves
+import testtools as tt
+
+from openstack_env import jsonstream
+
+DOCUMENT = {
+    "name": "manifest [with] {brackets}",
+    "meta": {"numbers": [1, 2.5, -3e10], "nested": {"resources": []}},
+    "resources": [
+        {"type": "flavor", "name": "m1.\"small\"", "ram": 123456789},
+        {"type": "security_rule", "from": 22, "to": 22, "cidr": "::/0"},
+        {},
+        12345,
+    ],
+    "trailer": True,
+}
+
+
+class TestIterArray(tt.TestCase):
+    def test_matches_json_load(self):
+        text = json.dumps(DOCUMENT, indent=2)
+
+        for chunk_size in (1, 3, 7, 1024):
+            items = jsonstream.iter_array(
+                moves.StringIO(text), "resources", chunk_size)
+            self.assertEqual(DOCUMENT["resources"], list(items))
+
+    def test_empty_array(self):
+        items = jsonstream.iter_array(
+            moves.StringIO('{"resources": [ ]}'), "resources", 2)
+
+        self.assertEqual([], list(items))
+
+    def test_missing_key(self):
+        items = jsonstream.iter_array(
+            moves.StringIO('{"other": [1]}'), "resources", 2)
+
+        self.assertRaises(KeyError, list, items)
+
+    def test_invalid_document(self):
+        items = jsonstream.iter_array(
+            moves.StringIO('{"resources": [1 2]}'), "resources", 2)
+
+        self.assertRaises(ValueError, list, items)
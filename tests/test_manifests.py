@@ -0,0 +1,158 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import testtools as tt
+
+from openstack_env import context
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+from openstack_env import manifests
+from openstack_env import resource_loaders
+from openstack_env import resources as r
+
+
+class KeyPairLoader(d.ResourceDefinitionLoader):
+    def supports(self, path):
+        return True
+
+    def load(self, path):
+        yield r.KeyPairResourceDefinition(name=path, path="/tmp/key.pub")
+
+
+YAML = """
+resources:
+  - type: key_pair
+    name: %s
+    path: /tmp/key.pub
+"""
+
+
+class TestManifests(tt.TestCase):
+    def setUp(self):
+        super(TestManifests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as manifest:
+            manifest.write(content)
+        return path
+
+    def write_json(self, name, key_name):
+        return self.write(name, json.dumps({"resources": [{
+            "type": "key_pair", "name": key_name, "path": "/tmp/key.pub",
+        }]}))
+
+    def names(self, paths, processes=1):
+        return [resource.name
+                for resource in manifests.load(paths, processes)]
+
+    def test_yaml(self):
+        path = self.write("keys.yml", YAML % "a")
+
+        self.assertEqual(["a"], self.names([path]))
+
+    def test_directories(self):
+        self.write_json("b/2.json", "b2")
+        self.write("b/1.yaml", YAML % "b1")
+        self.write_json("a.json", "a")
+        self.write_json(".hidden/c.json", "c")
+        self.write("README.rst", "Not a manifest")
+
+        self.assertEqual(["a", "b1", "b2"], self.names([self.directory]))
+
+    def test_patterns(self):
+        self.write_json("a/1.json", "a1")
+        self.write_json("b/1.json", "b1")
+        self.write("b/2.yaml", YAML % "b2")
+
+        self.assertEqual(["a1", "b1"], self.names(
+            [os.path.join(self.directory, "*", "*.json")]))
+        self.assertRaises(
+            e.UnsupportedResourceDefinitionTypeException,
+            manifests.load, [os.path.join(self.directory, "*.xml")])
+
+    def test_parallel_keeps_order(self):
+        self.patch(manifests, "PARALLEL_THRESHOLD", 2)
+        for index in range(20):
+            self.write_json("%02d.json" % index, "key-%02d" % index)
+
+        self.assertEqual(self.names([self.directory]),
+                         self.names([self.directory], processes=4))
+
+    def test_parallel_errors(self):
+        self.patch(manifests, "PARALLEL_THRESHOLD", 2)
+        self.write_json("a.json", "a")
+        self.write("b.json", json.dumps({"resources": [{"type": "volume"}]}))
+
+        error = self.assertRaises(
+            e.UnsupportedResourceTypeException,
+            self.names, [self.directory], 2)
+        self.assertEqual("volume", error.resource_type)
+
+    def test_parallel_matrix(self):
+        self.patch(manifests, "PARALLEL_THRESHOLD", 2)
+        self.write_json("a.json", "a")
+        self.write("b.json", json.dumps({"resources": [
+            {"type": "key_pair", "name": "b-{i}", "path": "/tmp/key.pub",
+             "matrix": {"i": {"range": [1, 3]}}},
+            {"type": "key_pair", "name": "c", "path": "/tmp/key.pub"},
+        ]}))
+
+        self.assertEqual(["a", "b-1", "b-2", "b-3", "c"],
+                         self.names([self.directory], processes=2))
+
+    def test_matrix_is_not_expanded_by_workers(self):
+        path = self.write("b.json", json.dumps({"resources": [
+            {"type": "key_pair", "name": "b-{i}", "path": "/tmp/key.pub",
+             "matrix": {"i": {"range": [1, 100000]}}},
+        ]}))
+
+        # What a worker sends back stays small, however large the matrix.
+        self.assertEqual(1, len(manifests.load_file(path)))
+
+    def test_loaders_without_items(self):
+        self.patch(context, "get_resource_loader",
+                   lambda path: KeyPairLoader())
+
+        self.assertEqual(["a.key"], [resource.name for resource
+                                     in manifests.load_file("a.key")])
+
+    def test_file_loaders_need_items(self):
+        class Loader(resource_loaders.FileResourceDefinitionLoader):
+            def load(self, path):
+                return []
+
+        self.assertRaises(TypeError, Loader)
+
+    def test_exceptions_pickle(self):
+        error = pickle.loads(pickle.dumps(
+            e.UnknownDependencyException("flavor:a", "key_pair:b")))
+
+        self.assertEqual("key_pair:b", error.dependency)
+        self.assertIn("key_pair:b", error.message)
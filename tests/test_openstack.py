@@ -0,0 +1,180 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import openstack as os
+
+AUTH_URL = "http://keystone:5000/v2.0"
+ENDPOINTS = {
+    "compute": "http://nova:8774/v2/tenant-id",
+    "image": "http://glance:9292",
+    "data-processing": "http://sahara:8386/v1.1/",
+}
+
+
+class FakeCredentials(object):
+    def __init__(self):
+        self.auth = object()
+        self.auth_url = AUTH_URL
+        self.auth_token = "token-1"
+        self.tenant_id = "tenant-id"
+        self.endpoints_by_type = dict(ENDPOINTS)
+        self.mounted = []
+
+    def endpoint(self, service_type):
+        return self.endpoints_by_type[service_type]
+
+    def endpoints(self):
+        endpoints = [(self.auth_url, "identity")]
+        for service_type, url in sorted(self.endpoints_by_type.items()):
+            endpoints.append((url, service_type))
+        return endpoints
+
+    def mount(self, adapter):
+        self.mounted.append(adapter)
+
+
+class FakeAdapter(object):
+    def __init__(self, pool_connections, pool_maxsize):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+    def send(self, request, **kwargs):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.adapters = {}
+
+    def mount(self, prefix, adapter):
+        self.adapters[prefix] = adapter
+
+
+class FakeKeystoneSession(object):
+    def __init__(self, auth, session):
+        self.auth = auth
+        self.session = session
+
+
+class FakeClient(object):
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.session = kwargs.get("session")
+
+
+class FakeGlanceClient(FakeClient):
+    def __init__(self, *args, **kwargs):
+        super(FakeGlanceClient, self).__init__(*args, **kwargs)
+        self.http_client = FakeClient(session=FakeSession())
+
+
+class FakeModule(object):
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class TestOpenStack(tt.TestCase):
+    def setUp(self):
+        super(TestOpenStack, self).setUp()
+        self.patch(os, "adapters", FakeModule(HTTPAdapter=FakeAdapter))
+        self.patch(os, "requests", FakeModule(Session=FakeSession))
+        self.patch(os, "keystone_session",
+                   FakeModule(Session=FakeKeystoneSession))
+        self.patch(os, "identity_client", FakeModule(Client=FakeClient))
+        self.patch(os, "compute_client", FakeModule(Client=FakeClient))
+        self.patch(os, "glance_client", FakeModule(Client=FakeGlanceClient))
+        self.patch(os, "data_processing_client",
+                   FakeModule(Client=FakeClient))
+
+        self.credentials = FakeCredentials()
+        self.client = os.client(self.credentials, pool_size=4)
+
+    def test_shared_session(self):
+        session = self.client.session
+
+        self.assertIs(self.credentials.auth, session.auth)
+        self.assertIs(session, self.client.compute.session)
+        self.assertIs(session, self.client.identity.session)
+        self.assertIs(session, self.client.data_processing.session)
+        self.assertEqual((os.NOVA_VERSION,), self.client.compute.args)
+        self.assertIs(self.client.compute, self.client.compute)
+
+    def test_adapter_is_shared(self):
+        adapter = self.client.session.session.adapters["https://"]
+        image_session = self.client.images.http_client.session
+
+        self.assertEqual((4, 4),
+                         (adapter.pool_connections, adapter.pool_maxsize))
+        self.assertIs(adapter, self.client.session.session.adapters["http://"])
+        self.assertEqual([adapter], self.credentials.mounted)
+        self.assertEqual({"http://": adapter, "https://": adapter},
+                         image_session.adapters)
+
+    def test_images_use_catalog_endpoint(self):
+        images = self.client.images
+
+        self.assertEqual(ENDPOINTS["image"], images.kwargs["endpoint"])
+        self.assertEqual("token-1", images.kwargs["token"])
+        self.assertEqual(os.GLANCE_VERSION, images.kwargs["version"])
+
+    def test_images_rebuilt_with_new_token(self):
+        images = self.client.images
+        self.assertIs(images, self.client.images)
+
+        self.credentials.auth_token = "token-2"
+
+        self.assertIsNot(images, self.client.images)
+        self.assertEqual("token-2", self.client.images.kwargs["token"])
+
+    def test_data_processing_url(self):
+        self.assertEqual("http://sahara:8386/v1.1/tenant-id",
+                         self.client.data_processing.kwargs["sahara_url"])
+
+    def test_data_processing_url_with_tenant(self):
+        self.credentials.endpoints_by_type["data-processing"] = (
+            "http://sahara:8386/v1.1/tenant-id")
+
+        self.assertEqual("http://sahara:8386/v1.1/tenant-id",
+                         self.client.data_processing.kwargs["sahara_url"])
+
+    def test_service_type(self):
+        self.assertEqual("identity",
+                         self.client.service_type(AUTH_URL + "/tokens"))
+        self.assertEqual(
+            "compute",
+            self.client.service_type(ENDPOINTS["compute"] + "/flavors"))
+        self.assertEqual(
+            "image", self.client.service_type("http://glance:9292/v1/images"))
+        self.assertIsNone(self.client.service_type("http://other/"))
+
+    def test_reset_inventory(self):
+        inventory = self.client.inventory
+        self.assertIs(inventory, self.client.inventory)
+
+        self.client.reset_inventory()
+
+        self.assertIsNot(inventory, self.client.inventory)
+
+    def test_is_unauthorized(self):
+        self.assertTrue(os.is_unauthorized(FakeModule(http_status=401)))
+        self.assertTrue(os.is_unauthorized(FakeModule(code=401)))
+        self.assertFalse(os.is_unauthorized(FakeModule(code=404)))
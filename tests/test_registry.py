@@ -0,0 +1,104 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import context
+from openstack_env import exceptions as e
+from openstack_env import registry
+from openstack_env import resources as r
+
+
+class FakeEntryPoint(object):
+    def __init__(self, name, plugin):
+        self.name = name
+        self.plugin = plugin
+        self.loaded = 0
+
+    def load(self):
+        self.loaded += 1
+        return self.plugin
+
+
+class FakePkgResources(object):
+    def __init__(self, *entry_points):
+        self.entry_points = entry_points
+        self.scanned = []
+
+    def iter_entry_points(self, group):
+        self.scanned.append(group)
+        return iter(self.entry_points)
+
+
+class TestRegistry(tt.TestCase):
+    def setUp(self):
+        super(TestRegistry, self).setUp()
+        self.entry_point = FakeEntryPoint("custom", dict)
+        self.pkg_resources = FakePkgResources(
+            self.entry_point, FakeEntryPoint("builtin", list))
+        self.patch(registry, "pkg_resources", self.pkg_resources)
+
+        self.registry = registry.Registry("group")
+        self.registry.register("builtin", "collections:OrderedDict")
+
+    def test_builtin(self):
+        self.assertIs(self.registry.get("builtin"),
+                      self.registry.get("builtin"))
+        self.assertEqual([], self.pkg_resources.scanned)
+
+    def test_entry_point(self):
+        self.assertIs(dict, self.registry.get("custom"))
+        self.assertIs(dict, self.registry.get("custom"))
+        self.assertEqual(1, self.entry_point.loaded)
+        self.assertEqual(["group"], self.pkg_resources.scanned)
+
+    def test_unknown(self):
+        self.assertIsNone(self.registry.get("unknown"))
+        self.assertIsNone(self.registry.get("other"))
+        self.assertEqual(["group"], self.pkg_resources.scanned)
+        self.assertEqual(["builtin", "custom"], self.registry.names())
+
+    def test_factory(self):
+        instances = registry.Registry("group", factory=registry.instantiate)
+        instances.register("builtin", "collections:OrderedDict")
+
+        self.assertEqual({}, instances.get("builtin"))
+        self.assertIs(instances.get("builtin"), instances.get("builtin"))
+
+
+class TestContext(tt.TestCase):
+    def test_resource_manager(self):
+        resource = r.KeyPairResourceDefinition(name="key", path="key.pub")
+
+        resource_manager = context.get_resource_manager(resource)
+
+        self.assertTrue(resource_manager.supports(resource))
+
+    def test_resource_loader(self):
+        resource_loader = context.get_resource_loader("/tmp/resources.JSON")
+
+        self.assertTrue(resource_loader.supports("/tmp/resources.json"))
+        self.assertRaises(e.UnsupportedResourceDefinitionTypeException,
+                          context.get_resource_loader, "/tmp/resources.txt")
+
+    def test_resource_definition(self):
+        self.assertIs(r.FlavorResourceDefinition,
+                      context.get_resource_definition("flavor"))
+        self.assertRaises(e.UnsupportedResourceTypeException,
+                          context.get_resource_definition, "volume")
@@ -0,0 +1,388 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+
+from concurrent import futures
+import testtools as tt
+
+from openstack_env import exceptions as e
+from openstack_env import inventory
+from openstack_env import resource_managers as rm
+from openstack_env import resources as r
+
+
+class FakeImage(object):
+    def __init__(self, id, name, status="active", username=None, tags=(),
+                 checksum=None, size=None):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.username = username
+        self.tags = list(tags)
+        self.checksum = checksum
+        self.size = size
+
+
+class FakeImages(object):
+    def __init__(self, images):
+        self.images = images
+        self.created = []
+        self.deleted = []
+        # Set to make Glance report a checksum other than the real one.
+        self.checksum = None
+
+    def list(self, page_size=None):
+        return list(self.images)
+
+    def create(self, data=None, copy_from=None, **fields):
+        content = data.read() if data is not None else None
+        self.created.append((fields, content, copy_from))
+
+        image = FakeImage(str(len(self.images) + 1), fields["name"],
+                          status="active" if data is not None else "queued")
+        if content is not None:
+            image.checksum = (self.checksum or
+                              hashlib.md5(content).hexdigest())
+            image.size = len(content)
+        self.images.append(image)
+        return image
+
+    def delete(self, image_id):
+        self.deleted.append(image_id)
+
+
+class FakeRegisteredImages(object):
+    def __init__(self, images):
+        self.images = images
+        self.calls = []
+
+    def list(self):
+        return [image for image in self.images if image.username]
+
+    def update_image(self, image_id, user_name):
+        self.calls.append(("update_image", image_id, user_name))
+
+    def update_tags(self, image_id, tags):
+        self.calls.append(("update_tags", image_id, tags))
+
+    def unregister_image(self, image_id):
+        self.calls.append(("unregister_image", image_id))
+
+
+class FakeService(object):
+    def __init__(self, images):
+        self.images = images
+
+
+class FakeWatcher(object):
+    def __init__(self):
+        self.watched = []
+        # When set, images stay pending until the test resolves them.
+        self.pending = None
+
+    def watch(self, image, status):
+        self.watched.append((image.id, status))
+        future = futures.Future()
+        if self.pending is None:
+            future.set_result(FakeImage(image.id, image.name))
+        else:
+            self.pending.append((future, FakeImage(image.id, image.name)))
+        return future
+
+
+class FakeClient(object):
+    def __init__(self, images):
+        self.images = FakeService(FakeImages(images))
+        self.data_processing = FakeService(FakeRegisteredImages(images))
+        self.image_watcher = FakeWatcher()
+        self.inventory = inventory.Inventory(self)
+
+
+def dp_image(name="vanilla", tags=("vanilla", "2.7.1"), url=None):
+    return r.DataProcessingImageResourceDefinition(
+        name=name, disk_format="qcow2", container_format="bare",
+        is_public=True, url=url, user="ubuntu", tags=tags)
+
+
+class TestDataProcessingImageResourceManager(tt.TestCase):
+    def setUp(self):
+        super(TestDataProcessingImageResourceManager, self).setUp()
+        self.manager = rm.DataProcessingImageResourceManager()
+
+    def test_registers_user_and_tags(self):
+        client = FakeClient([FakeImage("1", "vanilla", status="saving")])
+
+        image = self.manager.upload(dp_image(), client).result()
+
+        self.assertEqual("1", image.id)
+        self.assertEqual([("1", "active")], client.image_watcher.watched)
+        self.assertEqual([
+            ("update_image", "1", "ubuntu"),
+            ("update_tags", "1", ["2.7.1", "vanilla"]),
+        ], client.data_processing.images.calls)
+
+    def test_adds_only_missing_tags(self):
+        client = FakeClient([FakeImage("1", "vanilla", username="ubuntu",
+                                       tags=["vanilla", "custom"])])
+
+        self.manager.upload(dp_image(), client)
+
+        self.assertEqual([
+            ("update_tags", "1", ["2.7.1", "custom", "vanilla"]),
+        ], client.data_processing.images.calls)
+
+    def test_registers_once_image_is_active(self):
+        client = FakeClient([FakeImage("1", "vanilla", status="saving")])
+        client.image_watcher.pending = []
+
+        result = self.manager.upload(dp_image(), client)
+
+        # Returns right away, nothing is registered before the image is up.
+        self.assertFalse(result.done())
+        self.assertEqual([], client.data_processing.images.calls)
+
+        future, image = client.image_watcher.pending[0]
+        future.set_result(image)
+
+        self.assertEqual("1", result.result().id)
+        self.assertEqual(2, len(client.data_processing.images.calls))
+
+    def test_registration_errors_follow_the_image(self):
+        client = FakeClient([FakeImage("1", "vanilla", status="saving")])
+        client.image_watcher.pending = []
+        result = self.manager.upload(dp_image(), client)
+
+        future, __ = client.image_watcher.pending[0]
+        future.set_exception(e.ImageStatusException("1", "killed"))
+
+        self.assertRaises(e.ImageStatusException, result.result)
+
+    def test_apply_twice(self):
+        client = FakeClient([FakeImage("1", "vanilla", username="hadoop",
+                                       tags=["old"])])
+
+        self.manager.upload(dp_image(), client)
+
+        self.assertTrue(self.manager.exists(dp_image(), client))
+        self.assertRaises(e.ResourceAlreadyExistsException,
+                          self.manager.upload, dp_image(), client)
+        self.assertEqual([
+            ("update_image", "1", "ubuntu"),
+            ("update_tags", "1", ["2.7.1", "old", "vanilla"]),
+        ], client.data_processing.images.calls)
+
+        # A new tag is merged with the registration as it was left.
+        self.manager.upload(dp_image(tags=("vanilla", "hdfs")), client)
+        self.assertEqual(
+            ("update_tags", "1", ["2.7.1", "hdfs", "old", "vanilla"]),
+            client.data_processing.images.calls[-1])
+
+    def test_uploads_missing_image(self):
+        client = FakeClient([])
+        resource = r.DataProcessingImageResourceDefinition(
+            name="vanilla", disk_format="qcow2", container_format="bare",
+            is_public=True, url="http://images/vanilla.img", user="ubuntu")
+
+        image = self.manager.upload(resource, client).result()
+
+        self.assertEqual("vanilla", image.name)
+        self.assertEqual(1, len(client.images.images.created))
+
+    def test_upload_needs_image_fields(self):
+        client = FakeClient([])
+        resource = r.DataProcessingImageResourceDefinition(
+            name="vanilla", url="http://images/vanilla.img", user="ubuntu")
+
+        self.assertRaises(e.InvalidResourceException,
+                          self.manager.upload, resource, client)
+        self.assertEqual([], client.images.images.created)
+
+    def test_existing_image_needs_no_image_fields(self):
+        client = FakeClient([FakeImage("1", "vanilla")])
+        resource = r.DataProcessingImageResourceDefinition(
+            name="vanilla", user="ubuntu")
+
+        self.assertEqual("1", self.manager.upload(resource, client).id)
+
+    def test_already_registered(self):
+        client = FakeClient([FakeImage("1", "vanilla", username="ubuntu",
+                                       tags=["2.7.1", "vanilla"])])
+
+        self.assertTrue(self.manager.exists(dp_image(), client))
+        self.assertRaises(e.ResourceAlreadyExistsException,
+                          self.manager.upload, dp_image(), client)
+        self.assertEqual([], client.data_processing.images.calls)
+
+    def test_missing_image(self):
+        client = FakeClient([])
+
+        self.assertRaises(e.InvalidResourceException,
+                          self.manager.upload, dp_image(), client)
+
+    def test_delete(self):
+        client = FakeClient([FakeImage("1", "vanilla", username="ubuntu")])
+
+        self.manager.delete(dp_image(), client)
+
+        self.assertEqual([("unregister_image", "1")],
+                         client.data_processing.images.calls)
+        self.assertRaises(e.ResourceNotFoundException,
+                          self.manager.delete, dp_image(), client)
+
+
+def image(name="cirros", path=None, url=None, checksum=None):
+    return r.ImageResourceDefinition(
+        name=name, disk_format="qcow2", container_format="bare",
+        is_public=True, path=path, url=url, checksum=checksum)
+
+
+class TestImageResourceManager(tt.TestCase):
+    def setUp(self):
+        super(TestImageResourceManager, self).setUp()
+        self.manager = rm.ImageResourceManager()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content, compress=False):
+        path = os.path.join(self.directory, name)
+        with (gzip.open if compress else open)(path, "wb") as image_file:
+            image_file.write(content)
+        return path
+
+    def test_upload_file(self):
+        client = FakeClient([])
+        path = self.write("cirros.img", b"image data")
+
+        uploaded = self.manager.upload(image(path=path), client)
+
+        fields, content, __ = client.images.images.created[0]
+        self.assertEqual(b"image data", content)
+        self.assertEqual(len(b"image data"), fields["size"])
+        self.assertIs(uploaded, client.inventory.images.find("name", "cirros"))
+
+    def test_no_hash_ahead_without_same_size(self):
+        client = FakeClient([FakeImage("1", "other", checksum="0" * 32,
+                                       size=1024)])
+        path = self.write("cirros.img", b"image data")
+
+        def file_md5(path):
+            self.fail("The file was read ahead of the upload")
+        self.patch(rm.streams, "file_md5", file_md5)
+
+        self.manager.upload(image(path=path), client)
+
+        fields, __, __ = client.images.images.created[0]
+        self.assertNotIn("checksum", fields)
+
+    def test_same_size_other_content(self):
+        client = FakeClient([FakeImage("1", "other", checksum="0" * 32,
+                                       size=10)])
+        path = self.write("cirros.img", b"image data")
+
+        self.manager.upload(image(path=path), client)
+
+        fields, __, __ = client.images.images.created[0]
+        self.assertEqual(hashlib.md5(b"image data").hexdigest(),
+                         fields["checksum"])
+
+    def test_upload_compressed_file(self):
+        client = FakeClient([])
+        path = self.write("cirros.img.gz", b"image data", compress=True)
+
+        self.manager.upload(image(path=path), client)
+
+        fields, content, __ = client.images.images.created[0]
+        self.assertEqual(b"image data", content)
+        # Neither is known before the file has been decompressed.
+        self.assertNotIn("size", fields)
+        self.assertNotIn("checksum", fields)
+
+    def test_upload_url(self):
+        client = FakeClient([])
+
+        result = self.manager.upload(
+            image(url="http://images/cirros.img"), client)
+
+        self.assertEqual("http://images/cirros.img",
+                         client.images.images.created[0][2])
+        self.assertEqual([("1", "active")], client.image_watcher.watched)
+        self.assertIsInstance(result, futures.Future)
+
+    def test_checksum_mismatch(self):
+        client = FakeClient([])
+        client.images.images.checksum = "0" * 32
+        path = self.write("cirros.img", b"image data")
+
+        self.assertRaises(e.ChecksumMismatchException,
+                          self.manager.upload, image(path=path), client)
+
+    def test_duplicate(self):
+        checksum = hashlib.md5(b"image data").hexdigest()
+        existing = FakeImage("1", "cirros-0.3", checksum=checksum,
+                             size=10)
+        client = FakeClient([existing])
+        path = self.write("cirros.img", b"image data")
+
+        self.assertIs(existing, self.manager.upload(image(path=path), client))
+
+        self.assertEqual([], client.images.images.created)
+        self.assertTrue(self.manager.exists(image(path=path), client))
+        self.assertRaises(e.ResourceAlreadyExistsException,
+                          self.manager.upload, image(path=path), client)
+
+    def test_duplicate_by_manifest_checksum(self):
+        checksum = hashlib.md5(b"image data").hexdigest()
+        existing = FakeImage("1", "cirros-0.3", checksum=checksum,
+                             size=10)
+        client = FakeClient([existing])
+
+        # The file is never read, the manifest checksum is enough.
+        resource = image(path=os.path.join(self.directory, "missing.img"),
+                         checksum=checksum.upper())
+        self.assertIs(existing, self.manager.upload(resource, client))
+
+    def test_duplicate_satisfies_dependents(self):
+        checksum = hashlib.md5(b"image data").hexdigest()
+        client = FakeClient([FakeImage("1", "vanilla-2.7", checksum=checksum,
+                                       size=10)])
+        path = self.write("vanilla.img", b"image data")
+
+        self.manager.upload(image("vanilla", path=path), client)
+        registered = rm.DataProcessingImageResourceManager().upload(
+            dp_image(), client)
+
+        self.assertEqual("1", registered.id)
+
+    def test_delete_duplicate_keeps_image(self):
+        checksum = hashlib.md5(b"image data").hexdigest()
+        client = FakeClient([FakeImage("1", "cirros-0.3", checksum=checksum,
+                                       size=10)])
+        path = self.write("cirros.img", b"image data")
+        self.manager.upload(image(path=path), client)
+
+        self.manager.delete(image(path=path), client)
+
+        self.assertEqual([], client.images.images.deleted)
+        self.assertFalse(self.manager.exists(image(path=path), client))
+        self.assertTrue(client.inventory.images.contains("name", "cirros-0.3"))
@@ -0,0 +1,88 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import pickle
+
+import testtools as tt
+
+from openstack_env import exceptions as e
+from openstack_env import resources as r
+
+RULE = {"type": "security_rule", "protocol": "tcp", "from": 22, "to": 22,
+        "cidr": "0.0.0.0/0"}
+
+
+class TestResourceDefinition(tt.TestCase):
+    def test_from_dict_uses_field_sources(self):
+        rule = r.SecurityRuleResourceDefinition.from_dict(RULE)
+
+        self.assertEqual(22, rule.from_port)
+        self.assertEqual((), rule.depends_on)
+        self.assertEqual("security_rule:tcp:22-22:0.0.0.0/0", rule.key)
+
+    def test_missing_field(self):
+        self.assertRaises(e.InvalidResourceException,
+                          r.KeyPairResourceDefinition.from_dict,
+                          {"name": "key"})
+        self.assertRaises(TypeError, r.KeyPairResourceDefinition, "key")
+
+    def test_records_are_compact_and_immutable(self):
+        key_pair = r.KeyPairResourceDefinition("key", "/tmp/key.pub")
+
+        self.assertFalse(hasattr(key_pair, "__dict__"))
+        self.assertRaises(AttributeError, setattr, key_pair, "name", "other")
+        self.assertRaises(AttributeError, setattr, key_pair, "extra", 1)
+
+    def test_equality_hash_and_pickle(self):
+        first = r.SecurityRuleResourceDefinition.from_dict(RULE)
+        second = r.SecurityRuleResourceDefinition(
+            "tcp", 22, 22, "0.0.0.0/0", depends_on=[])
+
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(first.digest, second.digest)
+        self.assertEqual(first, pickle.loads(pickle.dumps(first)))
+        self.assertNotEqual(first, r.SecurityRuleResourceDefinition(
+            "udp", 22, 22, "0.0.0.0/0"))
+
+    def test_inherited_fields(self):
+        image = r.DataProcessingImageResourceDefinition(
+            name="image", disk_format="qcow2", container_format="bare",
+            is_public=True, user="ubuntu", tags=["vanilla", "2.6.0"])
+
+        self.assertEqual(("vanilla", "2.6.0"), image.tags)
+        self.assertEqual(("image:image",), image.requires)
+        self.assertEqual(
+            ["name", "disk_format", "container_format", "is_public", "url",
+             "path", "checksum", "user", "tags", "depends_on"],
+            [field.name for field in image.field_spec])
+
+    def test_redeclared_fields(self):
+        image = r.DataProcessingImageResourceDefinition.from_dict(
+            {"name": "image", "user": "ubuntu"})
+
+        self.assertIsNone(image.disk_format)
+        self.assertEqual(
+            ["name", "disk_format", "container_format", "is_public", "url",
+             "path", "checksum", "user", "tags", "depends_on"],
+            [field.name for field in image.field_spec])
+        self.assertRaises(e.InvalidResourceException,
+                          r.ImageResourceDefinition.from_dict,
+                          {"name": "image", "is_public": True,
+                           "container_format": "bare"})
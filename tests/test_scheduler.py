@@ -0,0 +1,181 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+
+from concurrent import futures
+import testtools as tt
+
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+from openstack_env import scheduler
+
+
+class FakeResource(object):
+    def __init__(self, key, depends_on=(), requires=(), fail=False):
+        self.key = key
+        self.depends_on = depends_on
+        self.requires = requires
+        self.fail = fail
+
+    def __str__(self):
+        return self.key
+
+
+def get_result(resource, task):
+    try:
+        return d.Result(resource, value=task.result())
+    except Exception as ex:
+        return d.Result(resource, error=ex)
+
+
+class TestScheduler(tt.TestCase):
+    def setUp(self):
+        super(TestScheduler, self).setUp()
+        self.pool = futures.ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.pool.shutdown)
+        self.lock = threading.Lock()
+        self.order = []
+        self.started = threading.Event()
+
+    def upload(self, resource):
+        self.started.set()
+        with self.lock:
+            self.order.append(resource.key)
+        if resource.fail:
+            raise RuntimeError(resource.key)
+        return resource.key
+
+    def run_scheduler(self, resources):
+        def submit(resource):
+            return self.pool.submit(self.upload, resource)
+
+        return scheduler.Scheduler(submit, get_result).run(resources)
+
+    def test_dependencies_run_first(self):
+        resources = [
+            FakeResource("dp_image:a", requires=("image:a",)),
+            FakeResource("flavor:b", depends_on=("key_pair:c",)),
+            FakeResource("image:a"),
+            FakeResource("key_pair:c"),
+        ]
+
+        results = self.run_scheduler(resources)
+
+        self.assertEqual([r.key for r in resources],
+                         [result.value for result in results])
+        self.assertLess(self.order.index("image:a"),
+                        self.order.index("dp_image:a"))
+        self.assertLess(self.order.index("key_pair:c"),
+                        self.order.index("flavor:b"))
+
+    def test_failure_skips_only_descendants(self):
+        resources = [
+            FakeResource("image:a", fail=True),
+            FakeResource("dp_image:a", requires=("image:a",)),
+            FakeResource("flavor:x", depends_on=("dp_image:a",)),
+            FakeResource("flavor:y"),
+        ]
+
+        results = self.run_scheduler(resources)
+
+        self.assertIsInstance(results[1].error, e.DependencyFailedException)
+        self.assertIsInstance(results[2].error, e.DependencyFailedException)
+        self.assertTrue(results[3].succeeded)
+        self.assertEqual(["flavor:y", "image:a"], sorted(self.order))
+
+    def test_reverse_runs_dependents_first(self):
+        resources = [
+            FakeResource("image:a"),
+            FakeResource("dp_image:a", requires=("image:a",)),
+            FakeResource("flavor:b", depends_on=("key_pair:c",)),
+            FakeResource("key_pair:c", fail=True),
+            FakeResource("flavor:d", depends_on=("flavor:b",), fail=True),
+            FakeResource("flavor:e", depends_on=("key_pair:x",)),
+        ]
+
+        def submit(resource):
+            return self.pool.submit(self.upload, resource)
+
+        results = scheduler.Scheduler(submit, get_result).run(
+            resources, reverse=True)
+
+        self.assertLess(self.order.index("dp_image:a"),
+                        self.order.index("image:a"))
+        self.assertTrue(results[0].succeeded)
+        # A failed dependent keeps what it depends on in place.
+        self.assertIsInstance(results[2].error, e.DependencyFailedException)
+        self.assertIsInstance(results[3].error, e.DependencyFailedException)
+        self.assertTrue(results[5].succeeded)
+
+    def test_missing_required_resource_is_ignored(self):
+        resources = [FakeResource("dp_image:a", requires=("image:a",))]
+
+        results = self.run_scheduler(resources)
+
+        self.assertTrue(results[0].succeeded)
+
+    def test_unknown_dependency(self):
+        resources = [
+            FakeResource("flavor:a", depends_on=("key_pair:b",)),
+            FakeResource("flavor:c", depends_on=("flavor:a",)),
+            FakeResource("flavor:d"),
+        ]
+
+        results = self.run_scheduler(resources)
+
+        self.assertIsInstance(results[0].error, e.UnknownDependencyException)
+        self.assertIsInstance(results[1].error, e.DependencyFailedException)
+        self.assertTrue(results[2].succeeded)
+        self.assertEqual(["flavor:d"], self.order)
+
+    def test_cycle(self):
+        resources = [
+            FakeResource("flavor:a", depends_on=("flavor:b",)),
+            FakeResource("flavor:b", depends_on=("flavor:a",)),
+            FakeResource("flavor:c"),
+        ]
+
+        results = self.run_scheduler(resources)
+
+        self.assertIsInstance(results[0].error, e.DependencyCycleException)
+        self.assertIsInstance(results[1].error, e.DependencyCycleException)
+        self.assertEqual(["flavor:c"], self.order)
+
+    def test_build_graph_rejects_unknown_dependencies_and_cycles(self):
+        self.assertRaises(
+            e.UnknownDependencyException, scheduler.build_graph,
+            [FakeResource("flavor:a", depends_on=("key_pair:b",))])
+        self.assertRaises(
+            e.DependencyCycleException, scheduler.build_graph,
+            [FakeResource("flavor:a", depends_on=("flavor:a",))])
+
+    def test_uploads_start_while_reading(self):
+        def resources():
+            yield FakeResource("dp_image:a", requires=("image:a",))
+            yield FakeResource("flavor:b")
+            self.assertTrue(self.started.wait(5))
+            yield FakeResource("image:a")
+
+        results = self.run_scheduler(resources())
+
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertLess(self.order.index("image:a"),
+                        self.order.index("dp_image:a"))
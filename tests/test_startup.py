@@ -0,0 +1,102 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import testtools as tt
+
+# Upper bounds in seconds, generous enough for a loaded CI machine but far
+# below what importing the OpenStack clients costs.
+HELP_TIME_LIMIT = 1.5
+VALIDATE_TIME_LIMIT = 3.0
+
+RESOURCE_COUNT = 10000
+
+CLIENT_MODULES = ("glanceclient", "keystoneclient", "novaclient",
+                  "saharaclient")
+
+SCRIPT = """
+import sys
+from openstack_env import cli
+try:
+    cli.run(sys.argv[1:])
+except SystemExit:
+    pass
+sys.stdout.write("\\nimported:" + ",".join(
+    name for name in sys.modules if name.split(".")[0] in %r))
+""" % (CLIENT_MODULES,)
+
+
+class TestStartup(tt.TestCase):
+    def setUp(self):
+        super(TestStartup, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def run_cli(self, *args):
+        start = time.time()
+        process = subprocess.Popen(
+            [sys.executable, "-c", SCRIPT] + list(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        output, __ = process.communicate()
+        duration = time.time() - start
+
+        __, marker, imported = output.decode("utf-8").rpartition("imported:")
+        self.assertEqual("imported:", marker)
+        return duration, imported
+
+    def write_manifest(self):
+        resources = []
+        for i in range(RESOURCE_COUNT // 2):
+            resources.append({
+                "type": "flavor", "name": "flavor-%d" % i, "id": str(i),
+                "ram": 512, "vcpus": 1, "disk": 1, "ephemeral": 0,
+                "swap": 0, "is_public": True,
+            })
+            resources.append({
+                "type": "security_rule", "protocol": "tcp",
+                "from": i, "to": i, "cidr": "10.0.0.0/8",
+            })
+
+        path = os.path.join(self.directory, "manifest.json")
+        with open(path, "w") as manifest:
+            json.dump({"resources": resources}, manifest)
+        return path
+
+    def test_help(self):
+        duration, imported = self.run_cli("--help")
+
+        self.assertEqual("", imported)
+        self.assertLess(duration, HELP_TIME_LIMIT)
+
+    def test_validate(self):
+        duration, imported = self.run_cli(
+            "--validate", "-r", self.write_manifest())
+
+        self.assertEqual("", imported)
+        self.assertLess(duration, VALIDATE_TIME_LIMIT)
@@ -0,0 +1,83 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import testtools as tt
+
+from openstack_env import resources as r
+from openstack_env import state
+
+
+def key_pair(path="/tmp/key.pub"):
+    return r.KeyPairResourceDefinition(name="key", path=path)
+
+
+class TestStateStore(tt.TestCase):
+    def setUp(self):
+        super(TestStateStore, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "state.db")
+
+    def test_record_survives_reopening(self):
+        with state.StateStore(self.path) as store:
+            self.assertFalse(store.is_current(key_pair()))
+            store.record(key_pair(), "remote-id")
+
+        with state.StateStore(self.path) as store:
+            self.assertTrue(store.is_current(key_pair()))
+            self.assertEqual("remote-id", store.get("key_pair:key").id)
+
+    def test_changed_definition_is_not_current(self):
+        with state.StateStore(self.path) as store:
+            store.record(key_pair())
+
+            self.assertFalse(store.is_current(key_pair("/tmp/other.pub")))
+
+    def test_remove(self):
+        with state.StateStore(self.path) as store:
+            store.record(key_pair())
+            store.remove("key_pair:key")
+
+        with state.StateStore(self.path) as store:
+            self.assertIsNone(store.get("key_pair:key"))
+
+    def test_upgrade(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE resources (key TEXT PRIMARY KEY, type TEXT NOT NULL,"
+            " digest TEXT NOT NULL, remote_id TEXT, updated_at REAL NOT NULL)")
+        connection.execute(
+            "INSERT INTO resources VALUES (?, ?, ?, ?, ?)",
+            ("key_pair:key", "key_pair", key_pair().digest, None, 0))
+        connection.commit()
+        connection.close()
+
+        with state.StateStore(self.path) as store:
+            self.assertTrue(store.is_current(key_pair()))
+            self.assertIsNone(store.get("key_pair:key").cloud_digest)
+
+            store.record(key_pair())
+
+            self.assertEqual(key_pair().cloud_digest,
+                             store.get("key_pair:key").cloud_digest)
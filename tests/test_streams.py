@@ -0,0 +1,167 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+import testtools as tt
+
+from openstack_env import exceptions as e
+from openstack_env import streams
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# A zero-filled disk of this size compresses to a fraction of a megabyte.
+ZEROS_SIZE = 128 * 1024 * 1024
+
+
+class TestChecksummingReader(tt.TestCase):
+    def test_checksums_while_reading(self):
+        data = b"x" * 1000 + b"y" * 24
+        reader = streams.ChecksummingReader(io.BytesIO(data), chunk_size=100)
+
+        chunks = list(reader)
+
+        self.assertEqual(11, len(chunks))
+        self.assertEqual(data, b"".join(chunks))
+        self.assertEqual(len(data), reader.size)
+        self.assertEqual(hashlib.md5(data).hexdigest(), reader.md5)
+        self.assertEqual(hashlib.sha256(data).hexdigest(), reader.sha256)
+
+
+class TestDecompressingReader(tt.TestCase):
+    def decompress(self, compressed, compression):
+        reader = streams.DecompressingReader(
+            io.BytesIO(compressed), compression, chunk_size=7, queue_size=2)
+        self.addCleanup(reader.close)
+
+        return b"".join(iter(lambda: reader.read(5), b"")), reader
+
+    def test_gzip(self):
+        data = b"image data " * 1000
+        compressed = gzip_compress(data) + gzip_compress(data)
+
+        decompressed, reader = self.decompress(compressed, streams.GZIP)
+
+        self.assertEqual(data + data, decompressed)
+        self.assertEqual(len(compressed), reader.compressed_size)
+        self.assertEqual(2 * len(data), reader.size)
+
+    def test_xz(self):
+        try:
+            import lzma
+        except ImportError:
+            self.skipTest("lzma is not available")
+
+        data = b"image data " * 1000
+
+        decompressed, __ = self.decompress(lzma.compress(data), streams.XZ)
+
+        self.assertEqual(data, decompressed)
+
+    def read_zeros(self, compressed, compression):
+        reader = streams.DecompressingReader(io.BytesIO(compressed),
+                                             compression)
+        self.addCleanup(reader.close)
+
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        start = time.time()
+
+        size = 0
+        for data in iter(lambda: reader.read(64 * 1024), b""):
+            size += len(data)
+
+        duration = time.time() - start
+        __, peak = tracemalloc.get_traced_memory()
+
+        self.assertEqual(ZEROS_SIZE, size)
+        # The queue and the buffer hold a few chunks at most, and reading
+        # in small pieces stays linear.
+        self.assertLess(peak, (streams.QUEUE_SIZE + 4) * streams.CHUNK_SIZE)
+        self.assertLess(duration, 20)
+
+    @tt.skipUnless(tracemalloc, "tracemalloc is not available")
+    def test_gzip_zeros_stay_bounded(self):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        chunk = b"\0" * streams.CHUNK_SIZE
+        compressed = b"".join(
+            compressor.compress(chunk)
+            for __ in range(ZEROS_SIZE // streams.CHUNK_SIZE))
+        compressed += compressor.flush()
+
+        self.read_zeros(compressed, streams.GZIP)
+
+    @tt.skipUnless(tracemalloc, "tracemalloc is not available")
+    def test_xz_zeros_stay_bounded(self):
+        try:
+            import lzma
+        except ImportError:
+            self.skipTest("lzma is not available")
+
+        compressor = lzma.LZMACompressor(preset=0)
+        chunk = b"\0" * streams.CHUNK_SIZE
+        compressed = b"".join(
+            compressor.compress(chunk)
+            for __ in range(ZEROS_SIZE // streams.CHUNK_SIZE))
+        compressed += compressor.flush()
+
+        self.read_zeros(compressed, streams.XZ)
+
+    def test_corrupt_data(self):
+        reader = streams.DecompressingReader(
+            io.BytesIO(b"\x1f\x8bnot really gzip"), streams.GZIP)
+        self.addCleanup(reader.close)
+
+        self.assertRaises(zlib.error, reader.read)
+
+    def test_unsupported_compression(self):
+        self.assertRaises(e.UnsupportedCompressionException,
+                          streams.decompressor, "lz4")
+
+
+class TestDetectCompression(tt.TestCase):
+    def test_extension_and_magic_number(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        plain = os.path.join(directory, "image.qcow2")
+        with open(plain, "wb") as image:
+            image.write(b"QFI\xfb")
+        gzipped = os.path.join(directory, "image")
+        with open(gzipped, "wb") as image:
+            image.write(gzip_compress(b"QFI\xfb"))
+
+        self.assertEqual(streams.XZ,
+                         streams.detect_compression("image.qcow2.xz"))
+        self.assertIsNone(streams.detect_compression(plain))
+        self.assertEqual(streams.GZIP, streams.detect_compression(gzipped))
+
+
+def gzip_compress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
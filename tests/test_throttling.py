@@ -0,0 +1,187 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import testtools as tt
+
+from openstack_env import throttling
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class FakeRequest(object):
+    def __init__(self, method="GET", body=None):
+        self.method = method
+        self.url = "http://cloud:8774/v2/tenant/flavors"
+        self.body = body
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSend(object):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, request, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestTokenBucket(tt.TestCase):
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = throttling.TokenBucket(10, burst=5, clock=clock,
+                                        sleep=clock.sleep)
+
+        for __ in range(25):
+            bucket.acquire()
+
+        # The burst is free, the other twenty requests take two seconds.
+        self.assertAlmostEqual(2.0, clock.now - 1000.0, places=6)
+
+
+class TestAdaptiveLimiter(tt.TestCase):
+    def test_aimd(self):
+        limiter = throttling.AdaptiveLimiter(8)
+
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(4, limiter.limit)
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(2, limiter.limit)
+
+        for __ in range(3):
+            limiter.acquire()
+            limiter.release()
+        self.assertEqual(3, limiter.limit)
+
+        for __ in range(5):
+            limiter.acquire()
+            limiter.release(throttled=True)
+        self.assertEqual(1, limiter.limit)
+
+
+class TestThrottle(tt.TestCase):
+    def setUp(self):
+        super(TestThrottle, self).setUp()
+        self.clock = FakeClock()
+        self.throttle = throttling.Throttle(
+            retries=3, errors=(IOError,), clock=self.clock,
+            sleep=self.clock.sleep)
+
+    def test_retry_after(self):
+        self.assertEqual(5, throttling.retry_after(
+            FakeResponse(429, {"Retry-After": "5"})))
+        self.assertEqual(30, throttling.retry_after(
+            FakeResponse(429, {"Retry-After":
+                               "Thu, 01 Jan 1970 00:00:30 GMT"}), now=0))
+        self.assertIsNone(throttling.retry_after(FakeResponse(429)))
+
+    def test_throttled_requests_are_retried(self):
+        throttled = FakeResponse(429, {"Retry-After": "2"})
+        send = FakeSend(throttled, FakeResponse(201))
+
+        response = self.throttle.send(send, FakeRequest("POST", b"{}"))
+
+        self.assertEqual(201, response.status_code)
+        self.assertTrue(throttled.closed)
+        self.assertEqual(2, send.calls)
+        self.assertEqual(2.0, self.clock.sleeps[0])
+        # Halved from the default concurrency of 16 by the throttled try.
+        self.assertEqual(
+            8, self.throttle.endpoint(FakeRequest().url).limiter.limit)
+
+    def test_unavailable_idempotent_requests_are_retried(self):
+        send = FakeSend(FakeResponse(503), FakeResponse(503),
+                        FakeResponse(200))
+
+        response = self.throttle.send(send, FakeRequest("GET"))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, send.calls)
+
+    def test_unavailable_creates_are_not_retried(self):
+        send = FakeSend(FakeResponse(503))
+
+        response = self.throttle.send(send, FakeRequest("POST", b"{}"))
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(1, send.calls)
+
+    def test_streamed_bodies_are_not_retried(self):
+        send = FakeSend(FakeResponse(429))
+
+        response = self.throttle.send(
+            send, FakeRequest("POST", iter([b"data"])))
+
+        self.assertEqual(429, response.status_code)
+
+    def test_connection_errors(self):
+        send = FakeSend(IOError("reset"), FakeResponse(200))
+        self.assertEqual(
+            200, self.throttle.send(send, FakeRequest("GET")).status_code)
+
+        send = FakeSend(IOError("reset"))
+        self.assertRaises(IOError, self.throttle.send, send,
+                          FakeRequest("POST", b"{}"))
+
+    def test_retries_are_limited(self):
+        send = FakeSend(*[FakeResponse(429) for __ in range(4)])
+
+        response = self.throttle.send(send, FakeRequest("GET"))
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual(4, send.calls)
+
+    def test_rates_per_service(self):
+        throttle = throttling.Throttle(
+            rates={"compute": (5, 1)}, clock=self.clock,
+            sleep=self.clock.sleep)
+        throttle.services = lambda url: "compute"
+        send = FakeSend(*[FakeResponse(200) for __ in range(11)])
+
+        for __ in range(11):
+            throttle.send(send, FakeRequest("GET"))
+
+        self.assertEqual("compute", throttle.endpoint(
+            FakeRequest().url).name)
+        self.assertAlmostEqual(2.0, self.clock.now - 1000.0, places=6)
@@ -0,0 +1,140 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import testtools as tt
+
+from openstack_env import tracing
+
+
+class FakeRequest(object):
+    def __init__(self, method, url, body=None):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, length):
+        self.status_code = status_code
+        self.headers = {"Content-Length": str(length)}
+
+
+class FakeAdapter(object):
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def send(self, request, **kwargs):
+        if self.status_code is None:
+            raise IOError("Connection refused")
+        return FakeResponse(self.status_code, 10)
+
+
+class TestTracer(tt.TestCase):
+    def setUp(self):
+        super(TestTracer, self).setUp()
+        self.tracer = tracing.Tracer()
+        self.tracer.services = lambda: [
+            ("http://cloud/compute/v2/abc", "compute"),
+            ("http://cloud/image", "image"),
+        ]
+
+    def test_url_template(self):
+        self.assertEqual(
+            "/compute/v2/{id}/flavors/{id}",
+            tracing.url_template(
+                "http://cloud/compute/v2/0123456789abcdef0123/flavors/42"
+                "?is_public=None"))
+        self.assertEqual(
+            "/image/v1/images/{id}",
+            tracing.url_template("http://cloud/image/v1/images/"
+                                 "8c3e0bd2-4ea3-4b5e-9a61-0e2b4c1f3d2a"))
+
+    def test_records_calls_per_resource(self):
+        adapter = self.tracer.instrument(FakeAdapter())
+
+        with self.tracer.resource("flavor:m1.tiny"):
+            adapter.send(FakeRequest(
+                "POST", "http://cloud/compute/v2/abc/flavors", b"{}"))
+        adapter.send(FakeRequest("GET", "http://cloud/image/v1/images/1"))
+
+        http, resource, other = self.tracer.spans
+        self.assertEqual("POST /compute/v2/abc/flavors", http.name)
+        self.assertEqual("flavor:m1.tiny", http.resource)
+        self.assertEqual(2, http.args["sent"])
+        self.assertEqual(10, http.args["received"])
+        self.assertEqual(tracing.RESOURCE, resource.category)
+        self.assertIsNone(other.resource)
+
+    def test_failed_calls(self):
+        adapter = self.tracer.instrument(FakeAdapter(None))
+
+        self.assertRaises(IOError, adapter.send,
+                          FakeRequest("GET", "http://cloud/image/v1/images"))
+        self.assertEqual(1, self.tracer.summary()["image"]["errors"])
+
+    def test_summary(self):
+        adapter = self.tracer.instrument(FakeAdapter(404))
+
+        for __ in range(3):
+            adapter.send(FakeRequest("GET", "http://cloud/image/v1/images"))
+        adapter.send(FakeRequest("GET", "http://other:8080/"))
+
+        summary = self.tracer.summary()
+        self.assertEqual(["image", "other:8080"], sorted(summary))
+        self.assertEqual(3, summary["image"]["calls"])
+        self.assertEqual(3, summary["image"]["errors"])
+        self.assertEqual(30, summary["image"]["received"])
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "trace.json")
+
+        adapter = self.tracer.instrument(FakeAdapter())
+        thread = threading.Thread(target=adapter.send, args=(
+            FakeRequest("GET", "http://cloud/compute/v2/abc/os-keypairs"),))
+        thread.start()
+        thread.join()
+        self.tracer.write(path)
+
+        with open(path) as trace_file:
+            trace = json.load(trace_file)
+
+        metadata, event = trace["traceEvents"]
+        self.assertEqual("M", metadata["ph"])
+        self.assertEqual(thread.name, metadata["args"]["name"])
+        self.assertEqual("X", event["ph"])
+        self.assertEqual("compute", event["cat"])
+        self.assertEqual(metadata["tid"], event["tid"])
+        self.assertIn("compute", trace["otherData"]["summary"])
+
+    def test_null_tracer(self):
+        adapter = FakeAdapter()
+
+        self.assertIs(adapter, tracing.NULL_TRACER.instrument(adapter))
+        with tracing.NULL_TRACER.resource("key_pair:key"):
+            self.assertEqual("key_pair:key",
+                             tracing.NULL_TRACER.current_resource)
+        self.assertEqual([], tracing.NULL_TRACER.spans)
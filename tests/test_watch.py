@@ -0,0 +1,319 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import testtools as tt
+
+import openstack_env
+from openstack_env import domain as d
+from openstack_env import exceptions as e
+from openstack_env import resources as r
+from openstack_env import state as st
+from openstack_env import watch
+
+
+def key_pair(name, path="/tmp/key.pub"):
+    return r.KeyPairResourceDefinition(name=name, path=path)
+
+
+class FakeMonitor(object):
+    def __init__(self, events):
+        self.events = list(events)
+        self.timeouts = []
+
+    def wait(self, timeout=None):
+        self.timeouts.append(timeout)
+        return self.events.pop(0)
+
+
+class Stop(Exception):
+    pass
+
+
+class ScriptedMonitor(object):
+    def __init__(self, edits):
+        self.edits = list(edits)
+        self.closed = False
+
+    def wait(self, timeout=None):
+        if timeout is not None:
+            return False
+        if not self.edits:
+            raise Stop()
+        self.edits.pop(0)()
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class TestDiff(tt.TestCase):
+    def test_diff(self):
+        previous = {
+            key_pair("same").key: key_pair("same").digest,
+            key_pair("changed").key: key_pair("changed").digest,
+            key_pair("removed").key: key_pair("removed").digest,
+        }
+
+        changes = watch.diff(previous, [
+            key_pair("same"),
+            key_pair("changed", "/tmp/other.pub"),
+            key_pair("added"),
+        ])
+
+        self.assertEqual(
+            (["key_pair:added"], ["key_pair:changed"], ["key_pair:removed"]),
+            changes)
+
+    def test_changes_are_debounced(self):
+        # One change, then two more within the quiet period.
+        monitor = FakeMonitor([True, True, True, False])
+
+        next(watch.changes(monitor, debounce=0.5))
+
+        self.assertEqual([None, 0.5, 0.5, 0.5], monitor.timeouts)
+
+
+def dp_image(name):
+    return r.DataProcessingImageResourceDefinition(name=name, user="ubuntu")
+
+
+def image(name, path="/tmp/image.img", is_public=True):
+    return r.ImageResourceDefinition(
+        name=name, disk_format="qcow2", container_format="bare",
+        is_public=is_public, path=path)
+
+
+class FakeLogger(object):
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, message, *args):
+        self.warnings.append(message % args)
+
+
+class FakeMain(object):
+    def __init__(self, state, errors=()):
+        self.state = state
+        self.errors = errors
+        self.destroyed = []
+
+    def destroy(self, credentials, resources, limits=None, state=None,
+                openstack=None):
+        results = []
+        for resource in resources:
+            self.destroyed.append(resource)
+            if resource.name in self.errors:
+                results.append(d.Result(
+                    resource, error=e.UnsupportedOperationException(
+                        resource, "delete")))
+            else:
+                state.remove(resource.key)
+                results.append(d.Result(resource))
+        return results
+
+
+class TestReplace(tt.TestCase):
+    def setUp(self):
+        super(TestReplace, self).setUp()
+        self.state = st.StateStore(":memory:")
+        self.addCleanup(self.state.close)
+
+    def test_stale(self):
+        self.state.record(image("a"))
+        self.state.record(image("b"))
+        old = image("b", is_public=True)
+
+        stale = watch.stale(
+            [image("a"), image("b", is_public=False), image("c")],
+            self.state, {"image:b": old})
+
+        self.assertEqual([old], stale)
+
+    def test_local_changes_are_not_stale(self):
+        self.state.record(image("a"))
+        self.state.record(key_pair("key"))
+
+        stale = watch.stale(
+            [image("a", "/tmp/new.img"),
+             r.KeyPairResourceDefinition(name="key", path="/tmp/new.pub",
+                                         depends_on=["image:a"])],
+            self.state)
+
+        self.assertEqual([], stale)
+
+    def test_dependents(self):
+        resources = [image("a"), dp_image("a"), image("b"), dp_image("b"),
+                     r.KeyPairResourceDefinition(
+                         name="key", path="/tmp/key.pub",
+                         depends_on=["dp_image:a"])]
+
+        self.assertEqual(
+            ["dp_image:a", "key_pair:key"],
+            [resource.key for resource in
+             watch.dependents(resources, ["image:a"])])
+
+    def test_replace(self):
+        self.state.record(image("a"))
+        self.state.record(dp_image("a"))
+        main = FakeMain(self.state)
+        self.patch(openstack_env, "main", main)
+
+        resources = [image("a", is_public=False), dp_image("a")]
+        watch.replace({}, resources, {}, self.state, recreate=True)
+
+        self.assertEqual(["image:a"],
+                         [resource.key for resource in main.destroyed])
+        # Both are applied again, the image and its registration.
+        self.assertIsNone(self.state.get("image:a"))
+        self.assertIsNone(self.state.get("dp_image:a"))
+
+    def test_replace_is_opt_in(self):
+        logger = FakeLogger()
+        self.patch(watch, "logger", logger)
+        self.state.record(image("a"))
+        main = FakeMain(self.state)
+        self.patch(openstack_env, "main", main)
+
+        watch.replace({}, [image("a", is_public=False)], {}, self.state)
+
+        self.assertEqual([], main.destroyed)
+        self.assertIsNotNone(self.state.get("image:a"))
+        self.assertEqual(1, len(logger.warnings))
+        self.assertIn("--replace: image:a", logger.warnings[0])
+
+    def test_replace_fails(self):
+        self.state.record(image("a"))
+        self.state.record(dp_image("a"))
+        self.patch(openstack_env, "main", FakeMain(self.state, ["a"]))
+
+        watch.replace({}, [image("a", is_public=False), dp_image("a")], {},
+                      self.state, recreate=True)
+
+        self.assertIsNotNone(self.state.get("image:a"))
+        self.assertTrue(self.state.is_current(dp_image("a")))
+
+    def test_nothing_to_replace(self):
+        main = FakeMain(self.state)
+        self.patch(openstack_env, "main", main)
+
+        watch.replace({}, [image("a")], {}, self.state, recreate=True)
+
+        self.assertEqual([], main.destroyed)
+
+
+class TestWatcher(tt.TestCase):
+    def setUp(self):
+        super(TestWatcher, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "keys.json")
+        self.applied = []
+        self.previous = []
+
+    def write(self, *key_pairs):
+        with open(self.path, "w") as manifest:
+            json.dump({"resources": [
+                {"type": "key_pair", "name": name, "path": path}
+                for name, path in key_pairs
+            ]}, manifest)
+
+    def apply(self, resources, previous):
+        self.applied.append(sorted(resource.name for resource in resources))
+        self.previous.append(previous)
+        return resources
+
+    def test_reload(self):
+        watcher = watch.ManifestWatcher([self.path], self.apply)
+
+        self.write(("a", "/tmp/a.pub"))
+        watcher.reload()
+        self.write(("a", "/tmp/a.pub"), ("b", "/tmp/b.pub"))
+        watcher.reload()
+        watcher.reload()
+        self.write(("a", "/tmp/other.pub"), ("b", "/tmp/b.pub"))
+        watcher.reload()
+        self.write(("a", "/tmp/other.pub"))
+        watcher.reload()
+
+        self.assertEqual([["a"], ["a", "b"], ["a", "b"]], self.applied)
+        self.assertEqual(["key_pair:a"], list(watcher.digests))
+        # The definition "a" was applied with, before it changed.
+        self.assertEqual("/tmp/a.pub", self.previous[2]["key_pair:a"].path)
+
+    def test_broken_manifest(self):
+        watcher = watch.ManifestWatcher([self.path], self.apply)
+
+        self.write(("a", "/tmp/a.pub"))
+        watcher.reload()
+        with open(self.path, "w") as manifest:
+            manifest.write("{\"resources\": [")
+
+        self.assertIsNone(watcher.reload())
+        self.assertEqual(["key_pair:a"], list(watcher.digests))
+
+    def test_polling(self):
+        self.write(("a", "/tmp/a.pub"))
+        monitor = watch.PollingMonitor([self.directory], interval=0.01)
+
+        self.assertFalse(monitor.wait(0.05))
+
+        self.write(("a", "/tmp/a.pub"), ("b", "/tmp/b.pub"))
+        self.assertTrue(monitor.wait(0.05))
+        self.assertFalse(monitor.wait(0.05))
+
+        self.write(("a", "/tmp/a.pub"))
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        self.assertTrue(monitor.wait(0.05))
+
+        os.remove(self.path)
+        self.assertTrue(monitor.wait(0.05))
+
+    @tt.skipUnless(watch.pyinotify, "pyinotify is not installed")
+    def test_inotify(self):
+        self.write(("a", "/tmp/a.pub"))
+        monitor = watch.InotifyMonitor([self.path])
+        self.addCleanup(monitor.close)
+
+        self.assertFalse(monitor.wait(0.05))
+
+        replacement = self.path + ".tmp"
+        with open(replacement, "w") as manifest:
+            manifest.write("{}")
+        os.rename(replacement, self.path)
+        self.assertTrue(monitor.wait(1))
+
+    def test_run(self):
+        self.write(("a", "/tmp/a.pub"))
+        edits = [
+            lambda: self.write(("a", "/tmp/a.pub"), ("b", "/tmp/b.pub")),
+            lambda: self.write(("a", "/tmp/a.pub"), ("b", "/tmp/b.pub")),
+        ]
+        monitor = ScriptedMonitor(edits)
+        watcher = watch.ManifestWatcher([self.path], self.apply, monitor)
+
+        self.assertRaises(Stop, watcher.run)
+
+        self.assertEqual([["a"], ["a", "b"]], self.applied)
+        self.assertTrue(monitor.closed)
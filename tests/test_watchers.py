@@ -0,0 +1,146 @@
+# Copyright (c) 2015, Artem Osadchyi
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import testtools as tt
+
+from openstack_env import exceptions as e
+from openstack_env import tracing
+from openstack_env import watchers
+
+
+class FakeImage(object):
+    def __init__(self, id, statuses):
+        self.id = id
+        self._statuses = list(statuses)
+
+    @property
+    def status(self):
+        return self._statuses[0]
+
+    def tick(self):
+        if len(self._statuses) > 1:
+            self._statuses.pop(0)
+
+
+class NotFound(Exception):
+    code = 404
+
+
+class FakeImages(object):
+    def __init__(self, images):
+        self._images = images
+        self.list_calls = 0
+        self.get_calls = 0
+
+    def list(self, page_size=None):
+        self.list_calls += 1
+        for image in self._images:
+            image.tick()
+        return list(self._images)
+
+    def get(self, image_id):
+        self.get_calls += 1
+        for image in self._images:
+            if image.id == image_id:
+                image.tick()
+                return image
+        raise NotFound()
+
+
+class FakeImageClient(object):
+    def __init__(self, images):
+        self.images = FakeImages(images)
+
+
+class FakeClient(object):
+    def __init__(self, images):
+        self.images = FakeImageClient(images)
+
+
+class TestImageStatusWatcher(tt.TestCase):
+    def test_resolves_all_images_with_shared_polls(self):
+        images = [
+            FakeImage("a", ["queued", "saving", "active"]),
+            FakeImage("b", ["saving", "active"]),
+            FakeImage("c", ["saving", "killed"]),
+        ]
+        client = FakeClient(images)
+        watcher = watchers.ImageStatusWatcher(client, min_period=0.001)
+
+        a, b, c = [watcher.watch(image) for image in images]
+
+        self.assertEqual("a", a.result(timeout=5).id)
+        self.assertEqual("b", b.result(timeout=5).id)
+        self.assertRaises(e.ImageStatusException, c.result, timeout=5)
+        self.assertLessEqual(client.images.images.list_calls, 4)
+
+    def test_timeout(self):
+        client = FakeClient([FakeImage("a", ["saving"])])
+        watcher = watchers.ImageStatusWatcher(client, min_period=0.001)
+
+        future = watcher.watch(FakeImage("a", ["saving"]), timeout=0.01)
+
+        self.assertRaises(e.TimeoutException, future.result, timeout=5)
+
+    def test_deleted_images(self):
+        images = [FakeImage("a", ["active", "pending_delete"])]
+        client = FakeClient(images)
+        watcher = watchers.ImageStatusWatcher(client, min_period=0.001)
+
+        future = watcher.watch(images[0], watchers.DELETED)
+
+        self.assertEqual("a", future.result(timeout=5).id)
+        self.assertEqual(0, client.images.images.list_calls)
+
+    def test_deleted_images_not_found(self):
+        client = FakeClient([])
+        watcher = watchers.ImageStatusWatcher(client, min_period=0.001)
+
+        future = watcher.watch(FakeImage("a", ["active"]), watchers.DELETED)
+
+        self.assertIsNone(future.result(timeout=5))
+        self.assertEqual(0, client.images.images.list_calls)
+        self.assertEqual(1, client.images.images.get_calls)
+
+    def test_missing_from_listing(self):
+        images = [FakeImage("a", ["saving", "active"])]
+        client = FakeClient(images)
+        watcher = watchers.ImageStatusWatcher(client, min_period=0.001)
+
+        future = watcher.watch(FakeImage("b", ["saving"]))
+
+        self.assertRaises(e.ImageStatusException, future.result, timeout=5)
+        self.assertEqual(0, client.images.images.get_calls)
+
+    def test_traces_waits(self):
+        tracer = tracing.Tracer()
+        image = FakeImage("a", ["saving", "active"])
+        watcher = watchers.ImageStatusWatcher(
+            FakeClient([image]), min_period=0.001, tracer=tracer)
+
+        with tracer.resource("image:cirros"):
+            future = watcher.watch(image)
+        future.result(timeout=5)
+
+        wait = [span for span in tracer.spans
+                if span.category == tracing.WAIT]
+        self.assertEqual(1, len(wait))
+        self.assertEqual("image:cirros", wait[0].resource)
+        self.assertEqual("active", wait[0].args["status"])